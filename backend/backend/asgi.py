@@ -14,3 +14,14 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
 application = get_asgi_application()
+
+# Runs the retention policy in-process when RETENTION_INTERVAL is set.
+from base.retention import start_scheduler  # noqa: E402
+# Builds the search index before the first search asks for it.
+from base.search import start_builder  # noqa: E402
+# Likewise for the autocomplete index.
+from base.autocomplete import start_builder as start_autocomplete_builder  # noqa: E402
+
+start_scheduler()
+start_builder()
+start_autocomplete_builder()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -49,7 +50,19 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'base.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    # Token buckets per user or IP, see base/api/throttling.py. Buckets live
+    # in the default cache, which is per process unless CACHE_DIR is set, so
+    # with N workers and no CACHE_DIR a client really gets N times these
+    # rates.
+    'DEFAULT_THROTTLE_RATES': {
+        'search': '120/min',
+        'ingest': '30/min',
+    },
 }
 
 SIMPLE_JWT = {
@@ -92,6 +105,7 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    'base.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -128,11 +142,36 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Connections are kept open between requests. Reads go to the 'replica'
+# alias, a query-only connection to the same file; in WAL mode readers and
+# the writer do not block each other. See base/db.py.
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+
+DATABASE_ROUTERS = ['base.db.ReadReplicaRouter']
+
+# Applied to every new SQLite connection, in order.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -172,9 +211,109 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Admission control. add-book/ refuses bodies and batches over these sizes
+# with 413, and at most SEARCH_MAX_CONCURRENCY fuzzy searches run at once per
+# process; others wait SEARCH_QUEUE_TIMEOUT seconds for a slot, then get 429.
+ADD_BOOK_MAX_BODY_SIZE = 2 * 1024 * 1024
+
+ADD_BOOK_MAX_BATCH = 500
+
+SEARCH_MAX_CONCURRENCY = 4
+
+SEARCH_QUEUE_TIMEOUT = 0.1
+
+# The fuzzy search index is built per process when the server starts and
+# only sees that process's writes. With several writing processes, rebuild
+# it every SEARCH_INDEX_REBUILD_INTERVAL seconds to pick up the others'.
+SEARCH_INDEX_REBUILD_INTERVAL = None
+
+# The autocomplete index is built the same way. It ranks by views and
+# ratings, which this process pushes in as it writes them; a rebuild every
+# AUTOCOMPLETE_INDEX_REBUILD_INTERVAL seconds also picks up other workers'.
+AUTOCOMPLETE_INDEX_REBUILD_INTERVAL = None
+
+
+# Request metrics are served at /api/_metrics to staff users. Requests are
+# profiled when they send METRICS_PROFILE_TOKEN in the X-Profile header, or at
+# random with probability METRICS_PROFILE_SAMPLE_RATE.
+METRICS_PROFILE_TOKEN = os.environ.get('METRICS_PROFILE_TOKEN')
+
+METRICS_PROFILE_SAMPLE_RATE = 0
+
+METRICS_PROFILE_DIR = BASE_DIR / 'profiles'
+
+
+# Uploaded book covers and their generated variants.
+MEDIA_ROOT = BASE_DIR / 'media'
+
+MEDIA_URL = 'media/'
+
+# Widths generated for every cover, each in WebP and JPEG, and the number of
+# processes that render them. 0 renders inline, without a pool.
+COVER_WIDTHS = (160, 320, 640)
+
+COVER_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-CORS_ALLOW_ALL_ORIGINS=True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS=True
+
+# Book views and user behavior events are buffered in memory and written in
+# batches every ACTIVITY_FLUSH_INTERVAL seconds, or sooner once
+# ACTIVITY_MAX_PENDING events are waiting.
+
+ACTIVITY_FLUSH_INTERVAL = 5
+
+ACTIVITY_MAX_PENDING = 1000
+
+# Retention (base/retention.py, manage.py compact_activity). UserBehavior
+# events older than RETENTION_DAYS are folded into daily summaries, and
+# History entries unread for HISTORY_RETENTION_DAYS (None keeps them) are
+# deleted, RETENTION_BATCH_SIZE rows per transaction. Deleted rows are
+# archived as gzipped JSONL under RETENTION_ARCHIVE_DIR when it is set. With
+# RETENTION_INTERVAL set, web workers also run the policy every that many
+# seconds instead of relying on cron.
+
+RETENTION_DAYS = 90
+
+HISTORY_RETENTION_DAYS = None
+
+RETENTION_BATCH_SIZE = 2000
+
+RETENTION_ARCHIVE_DIR = os.environ.get('RETENTION_ARCHIVE_DIR')
+
+RETENTION_INTERVAL = None
+
+
+# Precomputed recommendation arrays written by `manage.py build_recommendations`.
+
+RECOMMENDATIONS_PATH = BASE_DIR / 'recommendations'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Each process gets its own in-memory cache by default. Set CACHE_DIR when
+# running several workers so they share entries and invalidations on disk.
+# The file cache's add() and incr() are not atomic across processes, so its
+# rebuild locks are best effort (see base/cache.py).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'narrativenet',
+    }
+}
+
+if os.environ.get('CACHE_DIR'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ['CACHE_DIR'],
+    }
+
+# Seconds a cached catalog response is served as fresh. It is kept for as
+# long again as a stale fallback while one request rebuilds it.
+
+CATALOG_CACHE_TIMEOUT = 300
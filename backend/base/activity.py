@@ -0,0 +1,264 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from decimal import Decimal
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Avg, F, Max
+from django.utils import timezone
+from .models import Book, History, User, UserBehavior
+from .cache import invalidate
+from .autocomplete import autocomplete_index
+from .trending import record_activity
+
+logger = logging.getLogger(__name__)
+
+VIEW = 'view'
+RATE = 'rate'
+ACTION_TYPES = [VIEW, RATE, 'read', 'favorite', 'save']
+
+
+class WriteBehindBuffer:
+    """
+    Base for buffers that collect writes in memory and apply them in batches.
+
+    A daemon thread calls ``flush`` every ``ACTIVITY_FLUSH_INTERVAL`` seconds,
+    and a buffer holding ``ACTIVITY_MAX_PENDING`` entries wakes it early, so
+    the request that fills the buffer never pays for the write. With the
+    interval set to 0 there is no thread and a full buffer flushes inline.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'ACTIVITY_FLUSH_INTERVAL', 5)
+
+    @property
+    def max_pending(self):
+        return getattr(settings, 'ACTIVITY_MAX_PENDING', 1000)
+
+    def flush(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def _recorded(self, pending):
+        self._start()
+        if pending >= self.max_pending:
+            if self._thread is not None:
+                self._wake.set()
+            else:
+                self.flush()
+
+    def _start(self):
+        if self._thread is not None or not self.flush_interval:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name=f'{type(self).__name__}-flush', daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to flush %s', type(self).__name__)
+            finally:
+                close_old_connections()
+
+
+class ActivityBuffer(WriteBehindBuffer):
+    """
+    Collects view and behavior events in memory and writes them in batches.
+
+    Reads never update the Book row themselves; view counts are folded into
+    one ``F()`` update per distinct increment at flush time, and behavior
+    rows are inserted with ``bulk_create``. Both are added to the trending
+    rollups in the same transaction. After it commits, the cached detail of
+    each viewed book is invalidated; lists pick up new counts when their
+    cache entries expire.
+
+    A failed write loses nothing: events for books or users deleted since
+    they were recorded are dropped and the rest retried once, and whatever
+    still fails goes back into the buffer for the next flush.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._views = Counter()
+        self._events = []
+
+    def record_view(self, book_id, user_id=None):
+        self.record(book_id, VIEW, user_id=user_id)
+
+    def record(self, book_id, action_type, user_id=None, value=None):
+        with self._lock:
+            if action_type == VIEW:
+                self._views[book_id] += 1
+            if user_id is not None:
+                self._events.append(UserBehavior(user_id=user_id, book_id=book_id, action_type=action_type, value=value))
+            pending = len(self._views) + len(self._events)
+        self._recorded(pending)
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+            self._events.clear()
+
+    def flush(self):
+        with self._lock:
+            views, self._views = self._views, Counter()
+            events, self._events = self._events, []
+        if not views and not events:
+            return
+        try:
+            self._write(views, events)
+        except DatabaseError:
+            views, events = self._existing(views, events)
+            try:
+                self._write(views, events)
+            except DatabaseError:
+                self._restore(views, events)
+                raise
+        if views:
+            invalidate(*(f'book:{book_id}' for book_id in views))
+            autocomplete_index.update_scores(views=views)
+
+    def _write(self, views, events):
+        by_increment = {}
+        for book_id, count in views.items():
+            by_increment.setdefault(count, []).append(book_id)
+        with transaction.atomic():
+            for count, book_ids in by_increment.items():
+                Book.objects.filter(pk__in=book_ids).update(views=F('views') + count)
+            UserBehavior.objects.bulk_create(events, batch_size=500)
+            record_activity(views, events)
+
+    def _existing(self, views, events):
+        """
+        ``views`` and ``events`` without entries whose book or user is gone.
+        """
+        books = set(Book.objects.filter(pk__in={*views, *(event.book_id for event in events)}).values_list('id', flat=True))
+        users = set(User.objects.filter(pk__in={event.user_id for event in events}).values_list('id', flat=True))
+        views = Counter({book_id: count for book_id, count in views.items() if book_id in books})
+        events = [event for event in events if event.book_id in books and event.user_id in users]
+        return views, events
+
+    def _restore(self, views, events):
+        with self._lock:
+            self._views.update(views)
+            self._events[:0] = events
+
+
+class HistoryBuffer(WriteBehindBuffer):
+    """
+    Coalesces "last chapter read" updates per ``(user, book)``.
+
+    Page turns only replace the pending entry; a flush upserts the latest
+    position of each pair in one ``bulk_create(update_conflicts=True)``.
+    Reads consult the pending entries before the database.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pending = {}
+
+    def record(self, user_id, book_id, chapter_id):
+        with self._lock:
+            self._pending[(user_id, book_id)] = (chapter_id, timezone.now())
+            pending = len(self._pending)
+        self._recorded(pending)
+
+    def last_chapter(self, user_id, book_id):
+        with self._lock:
+            entry = self._pending.get((user_id, book_id))
+        if entry is not None:
+            return entry[0]
+        return History.objects.filter(user_id=user_id, book_id=book_id).values_list(
+            'last_chapter_read_id', flat=True
+        ).first()
+
+    def continue_reading(self, user_id):
+        """
+        The user's books with their last chapter, most recently read first.
+        """
+        entries = {
+            row['book']: row
+            for row in History.objects.filter(user_id=user_id).values('book', 'last_chapter_read', 'last_read_date')
+        }
+        with self._lock:
+            pending = [(key[1], entry) for key, entry in self._pending.items() if key[0] == user_id]
+        for book_id, (chapter_id, read_at) in pending:
+            entries[book_id] = {'book': book_id, 'last_chapter_read': chapter_id, 'last_read_date': read_at}
+        return sorted(entries.values(), key=lambda row: row['last_read_date'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            History.objects.bulk_create(
+                [
+                    History(user_id=user_id, book_id=book_id, last_chapter_read_id=chapter_id)
+                    for (user_id, book_id), (chapter_id, _) in pending.items()
+                ],
+                batch_size=500,
+                update_conflicts=True,
+                unique_fields=['user', 'book'],
+                update_fields=['last_chapter_read', 'last_read_date'],
+            )
+        except DatabaseError:
+            # Back for the next flush, unless a newer position was recorded
+            # in the meantime.
+            with self._lock:
+                for key, entry in pending.items():
+                    self._pending.setdefault(key, entry)
+            raise
+
+
+def recompute_ratings(batch_size=500):
+    """
+    Recompute ``Book.rating`` as the mean of each user's latest rate event.
+    Returns the number of books updated.
+    """
+    latest = UserBehavior.objects.filter(action_type=RATE, value__isnull=False).values(
+        'user', 'book'
+    ).annotate(last_id=Max('id')).values('last_id')
+    averages = UserBehavior.objects.filter(id__in=latest).values('book').annotate(average=Avg('value'))
+
+    updated, batch, ratings = 0, [], {}
+    for row in averages.iterator(chunk_size=batch_size):
+        batch.append(Book(pk=row['book'], rating=Decimal(row['average']).quantize(Decimal('0.01'))))
+        if len(batch) == batch_size:
+            updated += Book.objects.bulk_update(batch, ['rating'])
+            ratings.update((book.pk, book.rating) for book in batch)
+            batch = []
+    if batch:
+        updated += Book.objects.bulk_update(batch, ['rating'])
+        ratings.update((book.pk, book.rating) for book in batch)
+    # Lists depend on 'book'; each detail entry only on its own book.
+    invalidate('book', *(f'book:{book_id}' for book_id in ratings))
+    autocomplete_index.update_scores(ratings=ratings)
+    return updated
+
+
+activity_buffer = ActivityBuffer()
+history_buffer = HistoryBuffer()
+atexit.register(activity_buffer.flush)
+atexit.register(history_buffer.flush)
@@ -0,0 +1,159 @@
+import math
+from asgiref.sync import sync_to_async
+from django.http import Http404, StreamingHttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .serializers import GenreSerializer, AuthorSerializer
+from .pagination import KeysetPaginator, InvalidCursor
+from .fastpath import abook_dicts, abook_list, requested_fields, InvalidFields
+from .renderers import dumps, json_response
+from .throttling import SearchThrottle
+from .views import GetAllBooksView, SearchBookView
+from ..models import Author, Genre, Book
+from ..search import IndexNotReady
+from ..activity import activity_buffer
+from .. import cache
+
+# Async-native versions of the read endpoints for ASGI deployments. They use
+# the async cache API and ORM, so a slow client holds a coroutine rather
+# than a worker thread. Parameters, throttling, cache entries and responses
+# are shared with the synchronous views.
+
+
+def error_response(exc):
+    """
+    The response DRF would render for an APIException.
+    """
+    response = json_response({'detail': str(exc.detail)}, status=exc.status_code)
+    wait = getattr(exc, 'wait', None)
+    if wait is not None:
+        response['Retry-After'] = str(math.ceil(wait))
+    return response
+
+
+async def check_throttles(request, throttle_classes):
+    """
+    Apply DRF throttles outside an APIView. Clients are authenticated first,
+    as APIView does, so signed-in users draw from their own bucket. Returns
+    an error response, or None when the request may go ahead.
+    """
+    def check():
+        drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+        for throttle_class in throttle_classes:
+            throttle = throttle_class()
+            if not throttle.allow_request(drf_request, None):
+                raise Throttled(throttle.wait())
+
+    try:
+        await sync_to_async(check)()
+    except APIException as e:
+        return error_response(e)
+    return None
+
+
+class AsyncGetAllBooksView(View):
+    async def get(self, request, *args, **kwargs):
+        try:
+            fields = requested_fields(request.GET.get('fields'), request.GET.get('expand'))
+        except InvalidFields as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if request.GET.get('export') == 'true':
+            return self.export(fields)
+
+        try:
+            paginator = KeysetPaginator(sort=request.GET.get('sort', 'id'), page_size=request.GET.get('page_size'))
+            page = paginator.page_queryset(Book.objects.all(), request.GET.get('cursor'))
+        except InvalidCursor as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        books = await abook_list(page, GetAllBooksView.page_fields(paginator, fields), with_id=True)
+        results, next_cursor = paginator.page(books)
+        return json_response({'results': results, 'next': next_cursor})
+
+    def export(self, fields):
+        async def stream():
+            yield b'['
+            separator, last_id = b'', 0
+            while True:
+                chunk = Book.objects.filter(pk__gt=last_id).order_by('id')[:GetAllBooksView.export_chunk_size]
+                books = await abook_list(chunk, fields, with_id=True)
+                if not books:
+                    break
+                yield separator + dumps(books)[1:-1]
+                separator, last_id = b',', books[-1]['id']
+            yield b']'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
+
+
+class AsyncGetBookView(View):
+    async def get(self, request, pk, *args, **kwargs):
+        try:
+            fields = requested_fields(request.GET.get('fields'), request.GET.get('expand'))
+        except InvalidFields as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        async def build():
+            books = await abook_list(Book.objects.filter(pk=pk), fields)
+            if not books:
+                raise Http404
+            return books[0]
+
+        try:
+            data = await cache.acached('book', ['genre', 'publisher', f'book:{pk}'], build, key=(pk, fields))
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        await sync_to_async(activity_buffer.record_view)(pk)
+        return json_response(data)
+
+
+class AsyncSearchBookView(View):
+    throttle_classes = [SearchThrottle]
+
+    async def get(self, request, *args, **kwargs):
+        throttled = await check_throttles(request, self.throttle_classes)
+        if throttled is not None:
+            return throttled
+        try:
+            query, limit, fields = SearchBookView.parse(request.GET)
+        except ValueError as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Scoring is CPU bound, so it runs on the sync thread.
+        try:
+            matches = await sync_to_async(SearchBookView.find)(query, limit)
+        except IndexNotReady as e:
+            response = json_response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = str(SearchBookView.index_retry_after)
+            return response
+        except APIException as e:
+            return error_response(e)
+        books = await abook_dicts(Book.objects.filter(pk__in=[book_id for book_id, _ in matches]), fields)
+        results = SearchBookView.results(matches, books)
+        if not results:
+            return json_response({'message': 'No matching books found'}, status=status.HTTP_404_NOT_FOUND)
+        return json_response({'results': results})
+
+
+class AsyncGetAllGenresView(View):
+    async def get(self, request, *args, **kwargs):
+        async def build():
+            return list(GenreSerializer([genre async for genre in Genre.objects.all()], many=True).data)
+
+        genres = await cache.acached('genres', ['genre'], build)
+        if not genres:
+            return json_response({'message': 'No genres found'}, status=status.HTTP_404_NOT_FOUND)
+        return json_response({'results': genres})
+
+
+class AsyncGetAllAuthorsView(View):
+    async def get(self, request, *args, **kwargs):
+        async def build():
+            return list(AuthorSerializer([author async for author in Author.objects.all()], many=True).data)
+
+        authors = await cache.acached('authors', ['author'], build)
+        if not authors:
+            return json_response({'message': 'No authors found'}, status=status.HTTP_404_NOT_FOUND)
+        return json_response({'results': authors})
@@ -0,0 +1,161 @@
+from collections import defaultdict
+from ..models import Book, BookPublisher
+from ..covers import srcset
+from ..metrics import timed
+
+# Read-only rendering of books straight from ``values()`` rows. The output
+# matches BookSerializer field for field, without instantiating models or
+# serializer fields per row. Anything that accepts input keeps using
+# BookSerializer.
+BOOK_FIELDS = ('title', 'author', 'genre', 'synopsis', 'publishers', 'book_cover', 'srcset', 'rating', 'views')
+
+# Columns each field needs, after the book id.
+FIELD_COLUMNS = {
+    'title': ('title',),
+    'author': ('author_id', 'author__name'),
+    'genre': ('genre_id', 'genre__name'),
+    'synopsis': ('synopsis',),
+    'publishers': (),
+    'book_cover': ('book_cover',),
+    'srcset': ('cover_hash',),
+    'rating': ('rating',),
+    'views': ('views',),
+}
+EXPANDABLE = ('publishers',)
+
+PUBLISHER_COLUMNS = ('book_id', 'publisher_id', 'publisher__name', 'translation', 'edition')
+
+# Books per publisher lookup, to stay clear of SQLite's variable limit.
+LOOKUP_BATCH_SIZE = 1000
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def requested_fields(fields=None, expand=None):
+    """
+    Resolve ``?fields=`` and ``?expand=`` into the book fields to render, in
+    BookSerializer order. Without ``fields`` every field is included;
+    otherwise publishers only appear when listed or expanded.
+    """
+    if not fields:
+        return BOOK_FIELDS
+    names = {name.strip() for name in fields.split(',') if name.strip()}
+    expanded = {name.strip() for name in (expand or '').split(',') if name.strip()}
+    if names - set(BOOK_FIELDS):
+        raise InvalidFields(f"Unknown fields: {', '.join(sorted(names - set(BOOK_FIELDS)))}. Choose from: {', '.join(BOOK_FIELDS)}")
+    if expanded - set(EXPANDABLE):
+        raise InvalidFields(f"Cannot expand: {', '.join(sorted(expanded - set(EXPANDABLE)))}. Choose from: {', '.join(EXPANDABLE)}")
+    return tuple(name for name in BOOK_FIELDS if name in names | expanded)
+
+
+def decimal_string(value):
+    # BookSerializer renders decimals as strings at the field's precision,
+    # which the database converter has already applied.
+    return None if value is None else f'{value:f}'
+
+
+def _publisher_rows(book_ids):
+    for start in range(0, len(book_ids), LOOKUP_BATCH_SIZE):
+        rows = BookPublisher.objects.filter(book_id__in=book_ids[start:start + LOOKUP_BATCH_SIZE]).order_by('id')
+        yield rows.values_list(*PUBLISHER_COLUMNS)
+
+
+def _add_link(links, row):
+    book_id, publisher_id, publisher_name, translation, edition = row
+    links[book_id].append({
+        'publisher': {'id': publisher_id, 'name': publisher_name},
+        'translation': translation,
+        'edition': edition,
+    })
+
+
+def publisher_links(book_ids):
+    links = defaultdict(list)
+    for rows in _publisher_rows(book_ids):
+        for row in rows:
+            _add_link(links, row)
+    return links
+
+
+async def apublisher_links(book_ids):
+    links = defaultdict(list)
+    for rows in _publisher_rows(book_ids):
+        async for row in rows:
+            _add_link(links, row)
+    return links
+
+
+def _builders(fields):
+    """
+    Return the columns to select and a ``(name, build)`` pair per field, where
+    ``build(row, links)`` renders the field from a ``values_list`` row.
+    """
+    columns, builders = ['id'], []
+    for name in fields:
+        i = len(columns)
+        columns.extend(FIELD_COLUMNS[name])
+        if name in ('author', 'genre'):
+            build = lambda row, links, i=i: {'id': row[i], 'name': row[i + 1]}
+        elif name == 'publishers':
+            build = lambda row, links: links.get(row[0], [])
+        elif name == 'rating':
+            build = lambda row, links, i=i: decimal_string(row[i])
+        elif name == 'srcset':
+            build = lambda row, links, i=i: srcset(row[i])
+        else:
+            build = lambda row, links, i=i: row[i]
+        builders.append((name, build))
+    return columns, builders
+
+
+def book_dicts(queryset=None, fields=BOOK_FIELDS):
+    """
+    Return ``{book_id: data}`` for the books in ``queryset``, in its order,
+    where ``data`` is what ``BookSerializer(book).data`` would produce,
+    limited to ``fields``. Only the columns those fields need are selected;
+    publishers cost one query per LOOKUP_BATCH_SIZE books, and none unless
+    requested.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    columns, builders = _builders(fields)
+    rows = list(queryset.values_list(*columns))
+    links = publisher_links([row[0] for row in rows]) if 'publishers' in fields else {}
+    return _render(rows, links, builders)
+
+
+async def abook_dicts(queryset=None, fields=BOOK_FIELDS):
+    """
+    ``book_dicts`` through the async ORM, for the async views.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    columns, builders = _builders(fields)
+    rows = [row async for row in queryset.values_list(*columns)]
+    links = await apublisher_links([row[0] for row in rows]) if 'publishers' in fields else {}
+    return _render(rows, links, builders)
+
+
+def _render(rows, links, builders):
+    with timed():
+        return {row[0]: {name: build(row, links) for name, build in builders} for row in rows}
+
+
+def book_list(queryset=None, fields=BOOK_FIELDS, with_id=False):
+    """
+    ``book_dicts`` as a list; ``with_id`` puts each book's id first, for
+    endpoints whose clients page or link by id.
+    """
+    return _as_list(book_dicts(queryset, fields), with_id)
+
+
+async def abook_list(queryset=None, fields=BOOK_FIELDS, with_id=False):
+    return _as_list(await abook_dicts(queryset, fields), with_id)
+
+
+def _as_list(books, with_id):
+    if with_id:
+        return [{'id': book_id, **data} for book_id, data in books.items()]
+    return list(books.values())
@@ -0,0 +1,77 @@
+import base64
+import json
+from decimal import Decimal, InvalidOperation
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over ``(sort_field, id)``.
+
+    Each page continues from the last row of the previous one through an
+    indexed range filter, so deep pages cost the same as the first one.
+    """
+    sort_fields = {'id': int, 'rating': Decimal, 'views': int}
+    default_page_size = 50
+    max_page_size = 200
+
+    def __init__(self, sort='id', page_size=None):
+        self.descending = sort.startswith('-')
+        self.field = sort.lstrip('-')
+        if self.field not in self.sort_fields:
+            raise InvalidCursor(f"Cannot sort by '{self.field}'. Choose from: {', '.join(self.sort_fields)}")
+        if page_size is None:
+            page_size = self.default_page_size
+        try:
+            page_size = int(page_size)
+        except (TypeError, ValueError):
+            raise InvalidCursor('page_size must be an integer')
+        self.page_size = max(1, min(page_size, self.max_page_size))
+
+    def ordering(self):
+        prefix = '-' if self.descending else ''
+        if self.field == 'id':
+            return [f'{prefix}id']
+        return [f'{prefix}{self.field}', f'{prefix}id']
+
+    def encode_cursor(self, row):
+        position = [str(row[self.field]), row['id']]
+        return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            return self.sort_fields[self.field](value), int(pk)
+        except (ValueError, TypeError, InvalidOperation):
+            raise InvalidCursor('Invalid cursor')
+
+    def filter_after(self, queryset, cursor):
+        value, pk = self.decode_cursor(cursor)
+        lookup = 'lt' if self.descending else 'gt'
+        if self.field == 'id':
+            return queryset.filter(**{f'id__{lookup}': pk})
+        return queryset.filter(
+            Q(**{f'{self.field}__{lookup}': value}) | Q(**{self.field: value, f'id__{lookup}': pk})
+        )
+
+    def page_queryset(self, queryset, cursor=None):
+        queryset = queryset.order_by(*self.ordering())
+        if cursor:
+            queryset = self.filter_after(queryset, cursor)
+        return queryset[:self.page_size + 1]
+
+    def page(self, rows):
+        if len(rows) <= self.page_size:
+            return rows, None
+        rows = rows[:self.page_size]
+        return rows, self.encode_cursor(rows[-1])
+
+    def paginate(self, queryset, cursor=None):
+        """
+        Return ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+        """
+        return self.page(list(self.page_queryset(queryset, cursor)))
@@ -0,0 +1,14 @@
+from django.db.models import Prefetch
+from ..models import Book, BookPublisher
+
+
+def book_queryset(queryset=None):
+    """
+    Books with everything BookSerializer reads loaded up front, so serializing
+    any number of them costs a fixed number of queries.
+    """
+    if queryset is None:
+        queryset = Book.objects.all()
+    return queryset.select_related('author', 'genre').prefetch_related(
+        Prefetch('bookpublisher_set', queryset=BookPublisher.objects.select_related('publisher'))
+    )
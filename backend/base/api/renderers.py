@@ -0,0 +1,50 @@
+from decimal import Decimal
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from ..metrics import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+_encoder = DjangoJSONEncoder()
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    return _encoder.default(value)
+
+
+def dumps(data):
+    """
+    Encode ``data`` as compact UTF-8 JSON bytes, through orjson when it is
+    installed. Decimals, lazy strings and the like encode as DjangoJSONEncoder
+    would.
+    """
+    with timed():
+        if orjson is not None:
+            return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+        return _encoder.encode(data).encode('utf-8')
+
+
+def json_response(data, status=200):
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes through ``dumps``. Indented output, requested
+    through the Accept header, still goes through the stdlib encoder.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            with timed():
+                return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer, escape the separators JavaScript treats as newlines.
+        return dumps(data).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
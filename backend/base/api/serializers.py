@@ -1,20 +1,29 @@
+from django.db import transaction
 from rest_framework import serializers
+from ..signals import books_created
+from ..activity import ACTION_TYPES, RATE
+from ..covers import srcset
 from ..models import Author, Genre, Publisher, Book, BookPublisher, Chapter, User, FavoriteBook, FavoriteAuthor, SavedBook, History, UserBehavior
 
 class AuthorSerializer(serializers.ModelSerializer):
     class Meta:
         model = Author
         fields = ['id', 'name']
+        # Books refer to these by name and reuse existing rows, so the
+        # uniqueness check must not reject names that already exist.
+        extra_kwargs = {'name': {'validators': []}}
 
 class GenreSerializer(serializers.ModelSerializer):
     class Meta:
         model = Genre
         fields = ['id', 'name']
+        extra_kwargs = {'name': {'validators': []}}
 
 class PublisherSerializer(serializers.ModelSerializer):
     class Meta:
         model = Publisher
         fields = ['id', 'name']
+        extra_kwargs = {'name': {'validators': []}}
 
 class BookPublisherSerializer(serializers.ModelSerializer):
     publisher = PublisherSerializer()
@@ -23,17 +32,81 @@ class BookPublisherSerializer(serializers.ModelSerializer):
         model = BookPublisher
         fields = ['publisher', 'translation', 'edition']
 
+BULK_BATCH_SIZE = 500
+
+def resolve_names(model, names, batch_size=BULK_BATCH_SIZE):
+    """
+    Map each name to a ``model`` row, fetching existing rows with batched
+    ``IN`` queries and bulk-creating the rest. Names are unique, so rows a
+    concurrent import inserted first are skipped and then fetched.
+    """
+    resolved = {}
+
+    def fetch(names):
+        for start in range(0, len(names), batch_size):
+            for obj in model.objects.filter(name__in=names[start:start + batch_size]):
+                resolved[obj.name] = obj
+
+    names = list(dict.fromkeys(names))
+    fetch(names)
+    missing = [name for name in names if name not in resolved]
+    if missing:
+        model.objects.bulk_create([model(name=name) for name in missing], batch_size=batch_size, ignore_conflicts=True)
+        fetch(missing)
+    return resolved
+
+class BulkBookListSerializer(serializers.ListSerializer):
+    """
+    Saves ``many=True`` book payloads with a handful of batched queries
+    instead of several round trips per book.
+    """
+    def create(self, validated_data):
+        with transaction.atomic():
+            authors = resolve_names(Author, (item['author']['name'] for item in validated_data))
+            genres = resolve_names(Genre, (item['genre']['name'] for item in validated_data))
+            publishers = resolve_names(Publisher, (
+                publisher_data['publisher']['name']
+                for item in validated_data
+                for publisher_data in item['bookpublisher_set']
+            ))
+
+            books, book_publishers = [], []
+            for item in validated_data:
+                author_data = item.pop('author')
+                genre_data = item.pop('genre')
+                publishers_data = item.pop('bookpublisher_set')
+                book = Book(author=authors[author_data['name']], genre=genres[genre_data['name']], **item)
+                links = []
+                for publisher_data in publishers_data:
+                    publisher = publishers[publisher_data.pop('publisher')['name']]
+                    links.append(BookPublisher(book=book, publisher=publisher, **publisher_data))
+                # Seed the prefetch cache so rendering the response needs no queries.
+                book._prefetched_objects_cache = {'bookpublisher_set': links}
+                books.append(book)
+                book_publishers.extend(links)
+
+            Book.objects.bulk_create(books, batch_size=BULK_BATCH_SIZE)
+            BookPublisher.objects.bulk_create(book_publishers, batch_size=BULK_BATCH_SIZE)
+            books_created.send(sender=Book, books=books)
+
+        return books
+
 class BookSerializer(serializers.ModelSerializer):
     author = AuthorSerializer()
     genre = GenreSerializer()
     publishers = BookPublisherSerializer(source='bookpublisher_set', many=True)
     book_cover = serializers.CharField(required=False)  # Treating book_cover as a path
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Book
         fields = [
-            'title', 'author', 'genre', 'synopsis', 'publishers', 'book_cover', 'rating', 'views'
+            'title', 'author', 'genre', 'synopsis', 'publishers', 'book_cover', 'srcset', 'rating', 'views'
         ]
+        list_serializer_class = BulkBookListSerializer
+
+    def get_srcset(self, book):
+        return srcset(book.cover_hash)
 
     def create(self, validated_data):
         author_data = validated_data.pop('author')
@@ -85,4 +158,17 @@ class HistorySerializer(serializers.ModelSerializer):
 class UserBehaviorSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserBehavior
-        fields = ['id', 'user', 'book', 'action_type', 'action_date']
\ No newline at end of file
+        fields = ['id', 'user', 'book', 'action_type', 'value', 'action_date']
+
+class BookActivitySerializer(serializers.Serializer):
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    action_type = serializers.ChoiceField(choices=ACTION_TYPES)
+    value = serializers.IntegerField(min_value=1, max_value=5, required=False)
+
+    def validate(self, data):
+        if data['action_type'] == RATE and 'value' not in data:
+            raise serializers.ValidationError({'value': 'A rating value is required.'})
+        return data
+
+class ReadingProgressSerializer(serializers.Serializer):
+    chapter = serializers.PrimaryKeyRelatedField(queryset=Chapter.objects.only('id', 'book_id'))
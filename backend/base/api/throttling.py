@@ -0,0 +1,132 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.exceptions import APIException, Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    A token bucket per client and ``scope``, kept in the default cache.
+    Workers only draw from the same bucket when that cache is shared
+    (CACHE_DIR); with the default in-memory cache each process enforces the
+    rate on its own. Rates come from
+    ``DEFAULT_THROTTLE_RATES`` in DRF's ``'<requests>/<period>'`` form: the
+    bucket holds that many tokens and refills at that rate, so a client may
+    burst up to the full allowance and then continues at the average rate.
+
+    Clients are the authenticated user, or the remote address otherwise.
+    Reading and writing the bucket is not atomic; concurrent requests from
+    one client may each spend the same token, which only errs towards
+    letting requests through.
+    """
+    scope = None
+    timer = time.time
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def __init__(self):
+        self.rate = self.parse_rate(api_settings.DEFAULT_THROTTLE_RATES.get(self.scope))
+        self.wait_seconds = None
+
+    def parse_rate(self, rate):
+        if rate is None:
+            return None
+        count, period = rate.split('/')
+        duration = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}[period[0]]
+        return int(count), duration
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        capacity, duration = self.rate
+        refill = capacity / duration
+        key = self.get_cache_key(request, view)
+        now = self.timer()
+        tokens, stamp = cache.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - stamp) * refill)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) / refill
+            return False
+        # An idle bucket is full again after ``duration``; let it expire then.
+        cache.set(key, (tokens - 1, now), duration)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class SearchThrottle(TokenBucketThrottle):
+    scope = 'search'
+
+
+class IngestThrottle(TokenBucketThrottle):
+    scope = 'ingest'
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Request body too large.'
+    default_code = 'request_too_large'
+
+
+def check_body_size(request, limit):
+    """
+    Refuse a request whose declared body is over ``limit`` bytes before
+    anything reads or parses it.
+    """
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if limit is not None and length > limit:
+        raise RequestTooLarge(f'Request body is {length} bytes; the limit is {limit}.')
+
+
+class ConcurrencyLimiter:
+    """
+    Admit at most ``limit`` callers at once in this process. A caller waits
+    up to ``timeout`` seconds for a slot, then is turned away with 429 and a
+    ``Retry-After`` of ``retry_after`` seconds instead of queueing behind
+    work the process cannot keep up with.
+    """
+
+    def __init__(self, limit, timeout=0, retry_after=1):
+        self.limit = limit
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        return self._slots.acquire(timeout=self.timeout) if self.timeout else self._slots.acquire(blocking=False)
+
+    def release(self):
+        self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        if not self.acquire():
+            raise Throttled(wait=math.ceil(self.retry_after), detail='Too many searches in progress, try again shortly.')
+        try:
+            yield
+        finally:
+            self.release()
+
+
+# Fuzzy search is CPU bound, so the useful limit is per process.
+search_limiter = ConcurrencyLimiter(
+    getattr(settings, 'SEARCH_MAX_CONCURRENCY', 4),
+    timeout=getattr(settings, 'SEARCH_QUEUE_TIMEOUT', 0.1),
+)
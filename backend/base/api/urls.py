@@ -1,14 +1,34 @@
 from django.urls import path
-from .views import getRoutes, AddBookView, GetAllBooksView, GetBookView, SearchBookView, BooksByGenreView, GetAllGenresView, GetAllAuthorsView
+from .views import getRoutes, AddBookView, GetAllBooksView, GetBookView, SearchBookView, FullTextSearchView, AutocompleteView, BooksByGenreView, GetAllGenresView, GetAllAuthorsView, ChapterContentView, BookChaptersView, ChapterView, ChapterBundleView, BookActivityView, ReadingHistoryView, SimilarBooksView, UserRecommendationsView, TrendingBooksView, CacheStatsView, MetricsView, cover
+from .async_views import AsyncGetAllBooksView, AsyncGetBookView, AsyncSearchBookView, AsyncGetAllGenresView, AsyncGetAllAuthorsView
 from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('', getRoutes, name='get_routes'),
     path('add-book/', AddBookView.as_view(), name='add-book'),
     path('books/', GetAllBooksView.as_view(), name='get-all-books'),
+    path('books/trending/', TrendingBooksView.as_view(), name='trending-books'),
     path('books/<int:pk>/', GetBookView.as_view(), name='get-book'),
+    path('books/<int:pk>/activity/', BookActivityView.as_view(), name='book-activity'),
     path('search/', SearchBookView.as_view(), name='search-books'),
+    path('search/fulltext/', FullTextSearchView.as_view(), name='fulltext-search'),
+    path('autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
     path('books/genre/<str:genre_name>/', BooksByGenreView.as_view(), name='books-by-genre'),
     path('books/genre/', GetAllGenresView.as_view(), name='get-all-genres'),
     path('books/authors/', GetAllAuthorsView.as_view(), name='get-all-authors'),
+    path('books/<int:pk>/chapters/', BookChaptersView.as_view(), name='book-chapters'),
+    path('books/<int:pk>/similar/', SimilarBooksView.as_view(), name='similar-books'),
+    path('users/<int:pk>/recommendations/', UserRecommendationsView.as_view(), name='user-recommendations'),
+    path('users/<int:pk>/history/', ReadingHistoryView.as_view(), name='reading-history'),
+    path('chapters/<int:pk>/', ChapterView.as_view(), name='get-chapter'),
+    path('chapters/<int:pk>/content/', ChapterContentView.as_view(), name='chapter-content'),
+    path('chapters/<int:pk>/bundle/', ChapterBundleView.as_view(), name='chapter-bundle'),
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
+    path('covers/<path:path>', cover, name='cover'),
+    path('_metrics', MetricsView.as_view(), name='metrics'),
+    path('async/books/', AsyncGetAllBooksView.as_view(), name='async-get-all-books'),
+    path('async/books/<int:pk>/', AsyncGetBookView.as_view(), name='async-get-book'),
+    path('async/search/', AsyncSearchBookView.as_view(), name='async-search-books'),
+    path('async/books/genre/', AsyncGetAllGenresView.as_view(), name='async-get-all-genres'),
+    path('async/books/authors/', AsyncGetAllAuthorsView.as_view(), name='async-get-all-authors'),
 ]
\ No newline at end of file
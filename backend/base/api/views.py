@@ -1,19 +1,67 @@
 from rest_framework.response import Response
 from rest_framework.decorators import api_view
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAdminUser
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
-from .serializers import BookSerializer, GenreSerializer, AuthorSerializer
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.static import serve
+from django.conf import settings
+import os
+from .serializers import BookSerializer, GenreSerializer, AuthorSerializer, BookActivitySerializer, ReadingProgressSerializer
+from .pagination import KeysetPaginator, InvalidCursor
+from .fastpath import book_dicts, book_list, requested_fields, InvalidFields
+from .renderers import dumps, json_response
+from .throttling import IngestThrottle, SearchThrottle, RequestTooLarge, check_body_size, search_limiter
 from rest_framework import status
-from fuzzywuzzy import fuzz
-from django.db.models.functions import Length
+import base64
+import hashlib
 import logging
-from ..models import Author, Genre, Publisher, Book, BookPublisher, Chapter
+from ..models import Author, Genre, Publisher, Book, BookPublisher, Chapter, User
+from ..search import IndexNotReady, book_index
+from .. import fulltext, trending
+from ..autocomplete import autocomplete_index
+from ..activity import activity_buffer, history_buffer
+from ..recommendations import recommendation_index
+from .. import cache
+from ..metrics import registry
+from ..chapters import BLOCK_SIZE, chapter_blocks, decompress_blocks, page_count, read_chapter_range
+from ..covers import COVER_DIR
 
 logger = logging.getLogger(__name__)
 
+def conditional_response(request, etag, max_age, build, private=False):
+    """
+    Answer with 304 when the client already holds ``etag``, otherwise call
+    ``build`` for the full response. Both carry the ETag and Cache-Control;
+    ``private`` keeps shared caches from storing per-user responses.
+    """
+    etag = quote_etag(etag)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = build()
+    response['ETag'] = etag
+    if private:
+        patch_cache_control(response, private=True, max_age=max_age)
+    else:
+        patch_cache_control(response, public=True, max_age=max_age)
+    return response
+
+def book_fields(request):
+    """
+    The book fields selected by ``?fields=`` and ``?expand=``.
+    """
+    return requested_fields(request.query_params.get('fields'), request.query_params.get('expand'))
+
 class AddBookView(APIView):
+    throttle_classes = [IngestThrottle]
+
     def post(self, request, *args, **kwargs):
+        check_body_size(request, getattr(settings, 'ADD_BOOK_MAX_BODY_SIZE', None))
+        max_batch = getattr(settings, 'ADD_BOOK_MAX_BATCH', None)
+        if isinstance(request.data, list) and max_batch is not None and len(request.data) > max_batch:
+            raise RequestTooLarge(f'At most {max_batch} books can be added per request.')
         serializer = BookSerializer(data=request.data, many=isinstance(request.data, list))
         if serializer.is_valid():
             serializer.save()
@@ -23,68 +71,479 @@ class AddBookView(APIView):
             return Response({'status': 'error', 'rejected_books': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
 class GetAllBooksView(APIView):
+    export_chunk_size = 2000
+
     def get(self, request, *args, **kwargs):
-        books = Book.objects.all().values(
-            'id', 'title', 'synopsis', 'book_cover', 'rating', 'views', 'author__name', 'genre__name'
-        )
-        return JsonResponse(list(books), safe=False)
+        try:
+            fields = book_fields(request)
+        except InvalidFields as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('export') == 'true':
+            return self.export(fields)
+
+        try:
+            paginator = KeysetPaginator(
+                sort=request.query_params.get('sort', 'id'),
+                page_size=request.query_params.get('page_size'),
+            )
+            page = paginator.page_queryset(Book.objects.all(), request.query_params.get('cursor'))
+        except InvalidCursor as e:
+            return json_response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        results, next_cursor = paginator.page(book_list(page, self.page_fields(paginator, fields), with_id=True))
+        return json_response({'results': results, 'next': next_cursor})
+
+    @staticmethod
+    def page_fields(paginator, fields):
+        if paginator.field != 'id' and paginator.field not in fields:
+            # The next cursor is read from the last row's sort value.
+            return requested_fields(','.join((*fields, paginator.field)))
+        return fields
+
+    def export(self, fields):
+        """
+        Stream every book as one JSON array without holding the table in memory.
+        """
+        def stream():
+            yield b'['
+            separator, last_id = b'', 0
+            while True:
+                chunk = Book.objects.filter(pk__gt=last_id).order_by('id')[:self.export_chunk_size]
+                books = book_list(chunk, fields, with_id=True)
+                if not books:
+                    break
+                # Each batch encodes as one array; drop its brackets to splice it in.
+                yield separator + dumps(books)[1:-1]
+                separator, last_id = b',', books[-1]['id']
+            yield b']'
+
+        return StreamingHttpResponse(stream(), content_type='application/json')
     
 class GetBookView(APIView):
     def get(self, request, pk, *args, **kwargs):
-        book = get_object_or_404(Book, pk=pk)
-        serializer = BookSerializer(book)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        try:
+            fields = book_fields(request)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            books = book_list(Book.objects.filter(pk=pk), fields)
+            if not books:
+                raise Http404
+            return books[0]
+
+        # Author edits invalidate the author's own books (see signals.py).
+        data = cache.cached('book', ['genre', 'publisher', f'book:{pk}'], build, key=(pk, fields))
+        activity_buffer.record_view(pk)
+        return Response(data, status=status.HTTP_200_OK)
     
+class BookActivityView(APIView):
+    """
+    Accept a user's view/rate/... event for a book. Events are buffered and
+    written in batches, so this never touches the Book row directly.
+    """
+    def post(self, request, pk, *args, **kwargs):
+        if not Book.objects.filter(pk=pk).exists():
+            return Response({'message': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = BookActivitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'status': 'error', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        activity_buffer.record(pk, data['action_type'], user_id=data['user'].pk, value=data.get('value'))
+        return Response({'status': 'accepted'}, status=status.HTTP_202_ACCEPTED)
+
 class SearchBookView(APIView):
-    def get(self, request, *args, **kwargs):
-        query = request.query_params.get('q', '')
-        if not query:
-            return Response({'error': 'Query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+    throttle_classes = [SearchThrottle]
+    threshold = 60
+    default_limit = 20
+    max_limit = 100
 
-        threshold = 60
-        books = Book.objects.annotate(title_length=Length('title')).order_by('title_length')[:100]
-        matching_books = []
+    # Seconds clients are told to wait while the index is still building.
+    index_retry_after = 5
 
-        for book in books:
-            similarity = fuzz.token_set_ratio(query, book.title)
-            if similarity >= threshold:
-                serializer = BookSerializer(book)
-                matching_books.append({'book': serializer.data, 'similarity': similarity})
+    def get(self, request, *args, **kwargs):
+        try:
+            query, limit, fields = self.parse(request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            matches = self.find(query, limit)
+        except IndexNotReady as e:
+            return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            headers={'Retry-After': str(self.index_retry_after)})
+        matching_books = self.results(matches, book_dicts(Book.objects.filter(pk__in=[book_id for book_id, _ in matches]), fields))
 
         if not matching_books:
             return Response({'message': 'No matching books found'}, status=status.HTTP_404_NOT_FOUND)
 
-        matching_books = sorted(matching_books, key=lambda x: x['similarity'], reverse=True)
-
         return Response({'results': matching_books}, status=status.HTTP_200_OK)
 
+    @classmethod
+    def parse(cls, params):
+        """
+        ``(query, limit, fields)`` from the query parameters. Raises
+        ValueError with the message for a 400.
+        """
+        query = params.get('q', '')
+        if not query:
+            raise ValueError('Query parameter is required')
+        try:
+            limit = int(params.get('limit', cls.default_limit))
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        return query, max(1, min(limit, cls.max_limit)), requested_fields(params.get('fields'), params.get('expand'))
+
+    @classmethod
+    def find(cls, query, limit):
+        """
+        ``(book_id, similarity)`` matches, searched in a ``search_limiter``
+        slot. Raises Throttled when the process is saturated.
+        """
+        with search_limiter.slot():
+            return book_index.search(query, limit=limit, threshold=cls.threshold)
+
+    @staticmethod
+    def results(matches, books):
+        return [
+            {'book': books[book_id], 'similarity': similarity}
+            for book_id, similarity in matches if book_id in books
+        ]
+
+class AutocompleteView(APIView):
+    """
+    Typeahead suggestions for the search box: matching book titles, author
+    names and genre names by prefix, served from memory.
+    """
+    default_limit = 5
+    max_limit = 10
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+        return Response(autocomplete_index.complete(request.query_params.get('q', ''), limit=limit), status=status.HTTP_200_OK)
+
+class FullTextSearchView(APIView):
+    """
+    Ranked full-text search over book synopses and chapter text.
+    ``?type=book`` or ``?type=chapter`` narrows the search to one kind.
+    """
+    throttle_classes = [SearchThrottle]
+    default_page_size = 20
+    max_page_size = 50
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        if not fulltext.match_expression(query):
+            return Response({'error': 'Query parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+        kind = request.query_params.get('type')
+        if kind is not None and kind not in fulltext.KINDS:
+            return Response({'error': f"type must be one of: {', '.join(fulltext.KINDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            page_size = int(request.query_params.get('page_size', self.default_page_size))
+        except ValueError:
+            return Response({'error': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        page_size = max(1, min(page_size, self.max_page_size))
+
+        # One extra row tells whether another page follows.
+        results = fulltext.search(
+            query, kinds=[kind] if kind else fulltext.KINDS, offset=(page - 1) * page_size, limit=page_size + 1
+        )
+        next_page = page + 1 if len(results) > page_size else None
+        return Response({'results': results[:page_size], 'next': next_page}, status=status.HTTP_200_OK)
+
 class BooksByGenreView(APIView):
     def get(self, request, genre_name, *args, **kwargs):
-        genre = get_object_or_404(Genre, name=genre_name)
-        books = Book.objects.filter(genre=genre)
-        if not books.exists():
+        try:
+            fields = book_fields(request)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def build():
+            genre = get_object_or_404(Genre, name=genre_name)
+            return book_list(Book.objects.filter(genre=genre), fields)
+
+        books = cache.cached('books-by-genre', ['book', 'author', 'genre', 'publisher'], build, key=(genre_name, fields))
+        if not books:
             return Response({'message': f'No books found for genre: {genre_name}'}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = BookSerializer(books, many=True)
-        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+        return Response({'results': books}, status=status.HTTP_200_OK)
             
 class GetAllGenresView(APIView):
     def get(self, request, *args, **kwargs):
-        genres = Genre.objects.all()
-        if not genres.exists():
+        genres = cache.cached('genres', ['genre'], lambda: list(GenreSerializer(Genre.objects.all(), many=True).data))
+        if not genres:
             return Response({'message': 'No genres found'}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = GenreSerializer(genres, many=True)
-        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+        return Response({'results': genres}, status=status.HTTP_200_OK)
 
 class GetAllAuthorsView(APIView):
     def get(self, request, *args, **kwargs):
-        authors = Author.objects.all()
-        if not authors.exists():
+        authors = cache.cached('authors', ['author'], lambda: list(AuthorSerializer(Author.objects.all(), many=True).data))
+        if not authors:
             return Response({'message': 'No authors found'}, status=status.HTTP_404_NOT_FOUND)
         
-        serializer = AuthorSerializer(authors, many=True)
-        return Response({'results': serializer.data}, status=status.HTTP_200_OK)
+        return Response({'results': authors}, status=status.HTTP_200_OK)
+
+class ChapterContentView(APIView):
+    """
+    Serve one page (``?page=``) or character range (``?start=&end=``) of a
+    chapter, decompressing only the blocks that cover it.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        chapter = get_object_or_404(Chapter.objects.only('id', 'content_length'), pk=pk)
+        length = chapter.content_length
+        params = request.query_params
+        try:
+            if 'start' in params or 'end' in params:
+                start = int(params.get('start', 0))
+                end = int(params.get('end', length))
+                page = None
+            else:
+                page = int(params.get('page', 0))
+                start, end = page * BLOCK_SIZE, (page + 1) * BLOCK_SIZE
+        except ValueError:
+            return Response({'error': 'page, start and end must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if start < 0 or end < start:
+            return Response({'error': 'Invalid range'}, status=status.HTTP_400_BAD_REQUEST)
+
+        end = min(end, length)
+        return Response({
+            'chapter': chapter.id,
+            'page': page,
+            'pages': page_count(length),
+            'start': start,
+            'end': max(end, start),
+            'length': length,
+            'content': read_chapter_range(chapter.id, start, end),
+        }, status=status.HTTP_200_OK)
+
+class BookChaptersView(APIView):
+    max_age = 300
+
+    def get(self, request, pk, *args, **kwargs):
+        chapters = Chapter.objects.filter(book_id=pk)
+        publisher = request.query_params.get('publisher')
+        if publisher is not None:
+            if not publisher.isdigit():
+                return Response({'error': 'publisher must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            chapters = chapters.filter(publisher_id=publisher)
+        chapters = list(chapters.values('id', 'publisher', 'chapter_number', 'title', 'content_hash'))
+        if not chapters and not Book.objects.filter(pk=pk).exists():
+            return Response({'message': 'Book not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        digest = hashlib.sha1()
+        for chapter in chapters:
+            digest.update(f"{chapter['id']}:{chapter['chapter_number']}:{chapter['title']}:{chapter.pop('content_hash')};".encode('utf-8'))
+
+        return conditional_response(
+            request, digest.hexdigest(), self.max_age,
+            lambda: Response({'results': chapters}, status=status.HTTP_200_OK),
+        )
+
+class ChapterView(APIView):
+    max_age = 3600
+
+    def get(self, request, pk, *args, **kwargs):
+        chapter = get_object_or_404(Chapter.objects.defer('content'), pk=pk)
+        etag = hashlib.sha1(
+            f'{chapter.chapter_number}:{chapter.title}:{chapter.content_hash}'.encode('utf-8')
+        ).hexdigest()
+
+        return conditional_response(request, etag, self.max_age, lambda: Response({
+            'id': chapter.id,
+            'book': chapter.book_id,
+            'publisher': chapter.publisher_id,
+            'chapter_number': chapter.chapter_number,
+            'title': chapter.title,
+            'content': read_chapter_range(chapter.id, 0, chapter.content_length),
+        }, status=status.HTTP_200_OK))
+
+class ChapterBundleView(APIView):
+    """
+    Everything a reader needs for a chapter transition in one response: the
+    chapter's text, the next ``?ahead=`` chapters of the same edition as
+    their stored zlib blocks (base64, inflate each and concatenate), and the
+    edition's chapter index. With ``?user=`` the chapter is also recorded as
+    that user's reading position whenever a bundle is sent; a 304 records
+    nothing.
+    """
+    default_ahead = 2
+    max_ahead = 5
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            ahead = int(request.query_params.get('ahead', self.default_ahead))
+        except ValueError:
+            return Response({'error': 'ahead must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        ahead = max(0, min(ahead, self.max_ahead))
+        user = request.query_params.get('user')
+        if user is not None:
+            if not user.isdigit():
+                return Response({'error': 'user must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+            if not User.objects.filter(pk=user).exists():
+                return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        chapter = get_object_or_404(Chapter.objects.only('id', 'book_id', 'publisher_id'), pk=pk)
+        index = list(
+            Chapter.objects.filter(book_id=chapter.book_id, publisher_id=chapter.publisher_id).order_by('chapter_number')
+            .values('id', 'chapter_number', 'title', 'content_length', 'content_hash')
+        )
+        position = next(i for i, entry in enumerate(index) if entry['id'] == chapter.pk)
+        following = index[position + 1:position + 1 + ahead]
+
+        digest = hashlib.sha1(f'{chapter.pk}:{ahead}:{user}'.encode('utf-8'))
+        for entry in index:
+            digest.update(f"{entry['id']}:{entry['chapter_number']}:{entry['title']}:{entry['content_hash']};".encode('utf-8'))
+
+        def build():
+            # Only a bundle actually sent counts as a read.
+            if user is not None:
+                history_buffer.record(int(user), chapter.book_id, chapter.pk)
+            blocks = chapter_blocks([chapter.pk, *(entry['id'] for entry in following)])
+            current = index[position]
+            return Response({
+                'chapter': {
+                    'id': chapter.pk,
+                    'book': chapter.book_id,
+                    'publisher': chapter.publisher_id,
+                    'chapter_number': current['chapter_number'],
+                    'title': current['title'],
+                    'content': decompress_blocks(blocks[chapter.pk]),
+                },
+                'next': [{
+                    'id': entry['id'],
+                    'chapter_number': entry['chapter_number'],
+                    'title': entry['title'],
+                    'content_length': entry['content_length'],
+                    'encoding': 'zlib',
+                    'blocks': [base64.b64encode(data).decode('ascii') for data in blocks[entry['id']]],
+                } for entry in following],
+                'index': [
+                    {'id': entry['id'], 'chapter_number': entry['chapter_number'], 'title': entry['title']}
+                    for entry in index
+                ],
+                'previous': index[position - 1]['id'] if position else None,
+            }, status=status.HTTP_200_OK)
+
+        return conditional_response(request, digest.hexdigest(), 0, build, private=True)
+
+class ReadingHistoryView(APIView):
+    """
+    GET lists the user's books for "continue reading"; POST records the
+    chapter just read. Updates are coalesced and written behind.
+    """
+    def get(self, request, pk, *args, **kwargs):
+        if not User.objects.filter(pk=pk).exists():
+            return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'results': history_buffer.continue_reading(pk)}, status=status.HTTP_200_OK)
+
+    def post(self, request, pk, *args, **kwargs):
+        if not User.objects.filter(pk=pk).exists():
+            return Response({'message': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = ReadingProgressSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'status': 'error', 'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        chapter = serializer.validated_data['chapter']
+        history_buffer.record(pk, chapter.book_id, chapter.pk)
+        return Response({'status': 'accepted'}, status=status.HTTP_202_ACCEPTED)
+
+class RecommendationView(APIView):
+    """
+    Base for endpoints served from the precomputed recommendation index.
+    """
+    default_limit = 10
+    max_limit = 50
+    fields = ('id', 'title', 'book_cover', 'rating', 'views', 'author__name', 'genre__name')
+
+    def lookup(self, pk, limit):
+        raise NotImplementedError
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        matches = self.lookup(pk, limit)
+        books = {book['id']: book for book in Book.objects.filter(pk__in=[book_id for book_id, _ in matches]).values(*self.fields)}
+        results = [
+            {'book': books[book_id], 'score': round(score, 4)}
+            for book_id, score in matches
+            if book_id in books
+        ]
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+class SimilarBooksView(RecommendationView):
+    def lookup(self, pk, limit):
+        return recommendation_index.similar(pk, limit)
+
+class UserRecommendationsView(RecommendationView):
+    def lookup(self, pk, limit):
+        return recommendation_index.for_user(pk, limit)
+
+class TrendingBooksView(APIView):
+    """
+    Books with the most recent activity, from the trending rollups.
+    ``?window=`` is ``day``, ``week`` or ``month``; ``?genre=`` narrows the
+    leaderboard to one genre by name.
+    """
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request, *args, **kwargs):
+        window = request.query_params.get('window', trending.DEFAULT_WINDOW)
+        if window not in trending.WINDOWS:
+            return Response({'error': f"window must be one of: {', '.join(trending.WINDOWS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+        try:
+            fields = book_fields(request)
+        except InvalidFields as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        matches = trending.trending(window, genre=request.query_params.get('genre') or None, limit=limit)
+        books = book_dicts(Book.objects.filter(pk__in=[book_id for book_id, _ in matches]), fields)
+        results = [
+            {'book': books[book_id], 'score': round(score, 4)}
+            for book_id, score in matches
+            if book_id in books
+        ]
+        return Response({'window': window, 'results': results}, status=status.HTTP_200_OK)
+
+def cover(request, path):
+    """
+    Serve a generated cover variant. Names embed the content hash, so
+    browsers and proxies may keep them for a year without revalidating.
+    """
+    response = serve(request, path, document_root=os.path.join(settings.MEDIA_ROOT, COVER_DIR))
+    patch_cache_control(response, public=True, max_age=365 * 24 * 3600, immutable=True)
+    return response
+
+class CacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(cache.stats.snapshot(), status=status.HTTP_200_OK)
+
+class MetricsView(APIView):
+    """
+    Per-endpoint request metrics of this process, for Prometheus to scrape.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @api_view(['GET'])
 def getRoutes(request):
@@ -0,0 +1,344 @@
+import logging
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from operator import itemgetter
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from rapidfuzz import utils
+
+from .models import Author, Book, Genre
+
+logger = logging.getLogger(__name__)
+
+BOOK = 'book'
+AUTHOR = 'author'
+GENRE = 'genre'
+KINDS = (BOOK, AUTHOR, GENRE)
+
+
+def prefix_keys(text):
+    """
+    Normalized keys for ``text``: the whole string plus every suffix starting
+    at a word boundary, so "rings" finds "The Lord of the Rings".
+    """
+    normalized = utils.default_process(text or '')
+    words = normalized.split()
+    return {' '.join(words[i:]) for i in range(len(words))}
+
+
+class AutocompleteIndex:
+    """
+    Prefix index over book titles, author names and genre names.
+
+    Each kind keeps a sorted list of ``(key, id)`` that saves update in place
+    with ``insort``. Lookups run against a snapshot derived from it: the keys
+    as a plain list for ``bisect`` and, aligned with them, each entry's rank
+    (books by ``(views, rating)``, authors and genres by the total views of
+    their books). All keys sharing a prefix form one contiguous slice, so the
+    best ``limit`` entries are the smallest ranks in that slice, found with
+    ``np.partition`` instead of a Python loop.
+
+    After a change only the kinds it touched are rebuilt, on a background
+    thread. The lock is held just long enough to copy that kind's keys and
+    ranking inputs; ranking with ``np.lexsort`` happens outside it and the
+    new arrays are swapped in at once, so saves are never held up by a
+    rebuild and lookups keep answering from the previous snapshot. Answers
+    are memoized per snapshot and prefix.
+
+    The first build runs on a background thread started with the server
+    (``start_builder``); lookups made before it lands get no suggestions.
+    View counts and ratings written in bulk, which send no signals, are
+    pushed in with ``update_scores``. Writes by other processes only arrive
+    with the next build, every AUTOCOMPLETE_INDEX_REBUILD_INTERVAL seconds
+    when that is set.
+    """
+
+    def __init__(self, max_memo=10000):
+        self.max_memo = max_memo
+        # Writers take _lock; refreshes are serialized by _refresh_lock so
+        # snapshots are swapped in the order their inputs were copied. A
+        # thread needing both takes _refresh_lock first.
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.RLock()
+        self._worker = None
+        self._builder = None
+        self._wake = threading.Event()
+        self._built = False
+        self._epoch = 0
+        self._clear()
+
+    def _clear(self):
+        self._keys = {kind: [] for kind in KINDS}
+        self._entries = {}
+        self._books = {}
+        self._views = Counter()
+        self._snapshot = None
+        self._dirty = set()
+        # A refresh copied before a clear must not land after it.
+        self._epoch += 1
+
+    def _changed(self, *kinds):
+        self._dirty.update(kinds)
+        if self._snapshot is not None and self._worker is None:
+            self._worker = threading.Thread(target=self._run, name='autocomplete-refresh', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._dirty:
+                    self._worker = None
+                    return
+            self.refresh()
+
+    def refresh(self, kinds=None):
+        """
+        Rebuild the lookup snapshot for ``kinds``, by default those changed
+        since the last refresh. Waits for a refresh already in progress.
+        """
+        with self._refresh_lock:
+            with self._lock:
+                kinds = set(self._dirty if kinds is None else kinds)
+                self._dirty -= kinds
+                epoch = self._epoch
+                keys = {kind: list(self._keys[kind]) for kind in kinds}
+                entries, books, views = self._entries.copy(), self._books.copy(), self._views.copy()
+            parts = {kind: self._build_kind(kind, keys[kind], entries, books, views) for kind in kinds}
+            with self._lock:
+                if epoch != self._epoch:
+                    return
+                current = self._snapshot[0] if self._snapshot is not None else {}
+                self._snapshot = ({**current, **parts}, {})
+
+    @property
+    def built(self):
+        return self._built
+
+    def build(self):
+        names = (
+            (kind, pk, name)
+            for kind, model in ((AUTHOR, Author), (GENRE, Genre))
+            for pk, name in model.objects.values_list('id', 'name').iterator(chunk_size=5000)
+        )
+        books = Book.objects.values_list('id', 'title', 'author_id', 'genre_id', 'views', 'rating')
+        self.load(names, books.iterator(chunk_size=5000))
+
+    def load(self, names, books):
+        """
+        Replace the contents with ``(kind, id, name)`` and book entries. Keys
+        are appended and sorted once instead of inserted one by one.
+        """
+        with self._refresh_lock, self._lock:
+            self._clear()
+            for kind, pk, name in names:
+                self._set(kind, pk, name, sort=False)
+            for entry in books:
+                self._add_book(*entry, sort=False)
+            for keys in self._keys.values():
+                keys.sort()
+            self.refresh(KINDS)
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def start_build(self, interval=None):
+        """
+        Build on a background thread, or wake the one already running. With
+        ``interval`` seconds, the thread keeps rebuilding that often.
+        """
+        with self._lock:
+            if self._builder is None:
+                self._builder = threading.Thread(
+                    target=self._run_builds, args=(interval,), name='autocomplete-build', daemon=True
+                )
+                self._builder.start()
+            else:
+                self._wake.set()
+            return self._builder
+
+    def _run_builds(self, interval):
+        while True:
+            self._wake.clear()
+            try:
+                self.build()
+            except Exception:
+                logger.exception('Autocomplete index build failed')
+            finally:
+                close_old_connections()
+            with self._lock:
+                if not interval and not self._wake.is_set():
+                    self._builder = None
+                    return
+            self._wake.wait(interval)
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._built = False
+
+    def add_book(self, book_id, title, author_id, genre_id, views, rating):
+        self.add_books([(book_id, title, author_id, genre_id, views, rating)])
+
+    def add_books(self, entries):
+        with self._lock:
+            kinds = {BOOK}
+            for entry in entries:
+                previous = self._remove_book(entry[0])
+                self._add_book(*entry)
+                # Authors and genres rank by their books' views, so they only
+                # need re-ranking when those moved.
+                if previous is None or previous[:3] != self._books[entry[0]][:3]:
+                    kinds.update((AUTHOR, GENRE))
+            self._changed(*kinds)
+
+    def update_scores(self, views=None, ratings=None):
+        """
+        Apply view increments ``{book_id: count}`` and new ratings
+        ``{book_id: rating}`` from writes that bypass the model signals.
+        """
+        with self._lock:
+            kinds = set()
+            for book_id, count in (views or {}).items():
+                book = self._books.get(book_id)
+                if book is None:
+                    continue
+                author_id, genre_id, total, rating = book
+                self._books[book_id] = (author_id, genre_id, total + count, rating)
+                self._views[AUTHOR, author_id] += count
+                self._views[GENRE, genre_id] += count
+                kinds.update(KINDS)
+            for book_id, rating in (ratings or {}).items():
+                book = self._books.get(book_id)
+                if book is not None:
+                    self._books[book_id] = (*book[:3], float(rating))
+                    kinds.add(BOOK)
+            if kinds:
+                self._changed(*kinds)
+
+    def remove_book(self, book_id):
+        with self._lock:
+            if self._remove_book(book_id) is None:
+                self._changed(BOOK)
+            else:
+                self._changed(*KINDS)
+
+    def set_name(self, kind, pk, name):
+        with self._lock:
+            self._remove(kind, pk)
+            self._set(kind, pk, name)
+            self._changed(kind)
+
+    def remove_name(self, kind, pk):
+        with self._lock:
+            self._remove(kind, pk)
+            self._changed(kind)
+
+    def _set(self, kind, pk, label, sort=True):
+        keys = prefix_keys(label)
+        for key in keys:
+            if sort:
+                insort(self._keys[kind], (key, pk))
+            else:
+                self._keys[kind].append((key, pk))
+        self._entries[kind, pk] = (label, keys)
+
+    def _remove(self, kind, pk):
+        entry = self._entries.pop((kind, pk), None)
+        if entry is None:
+            return
+        keys = self._keys[kind]
+        for key in entry[1]:
+            position = bisect_left(keys, (key, pk))
+            if position < len(keys) and keys[position] == (key, pk):
+                del keys[position]
+
+    def _add_book(self, book_id, title, author_id, genre_id, views, rating, sort=True):
+        self._set(BOOK, book_id, title, sort)
+        self._books[book_id] = (author_id, genre_id, views or 0, float(rating or 0))
+        self._views[AUTHOR, author_id] += views or 0
+        self._views[GENRE, genre_id] += views or 0
+
+    def _remove_book(self, book_id):
+        self._remove(BOOK, book_id)
+        book = self._books.pop(book_id, None)
+        if book is not None:
+            author_id, genre_id, views, _ = book
+            self._views[AUTHOR, author_id] -= views
+            self._views[GENRE, genre_id] -= views
+        return book
+
+    @staticmethod
+    def _build_kind(kind, keys, entries, books, views):
+        """
+        ``(texts, ranks, suggestions)`` for one kind. Rank 0 is the best
+        entry: most views, then highest rating, then lowest id, so answers
+        are stable.
+        """
+        pks = np.fromiter(map(itemgetter(1), keys), dtype=np.int64, count=len(keys))
+        ids = np.unique(pks)
+        if kind == BOOK:
+            scores = [books[pk][2:] for pk in ids.tolist()]
+            totals = np.array([views for views, _ in scores], dtype=np.float64).reshape(-1)
+            ratings = np.array([rating for _, rating in scores], dtype=np.float64).reshape(-1)
+        else:
+            totals = np.array([views[kind, pk] for pk in ids.tolist()], dtype=np.float64).reshape(-1)
+            ratings = np.zeros(len(ids))
+        ordered = ids[np.lexsort((ids, -ratings, -totals))]
+        rank_of = np.empty(len(ids), dtype=np.int64)
+        rank_of[np.searchsorted(ids, ordered)] = np.arange(len(ids))
+        return (
+            list(map(itemgetter(0), keys)),
+            rank_of[np.searchsorted(ids, pks)],
+            [{'id': pk, 'label': entries[kind, pk][0]} for pk in ordered.tolist()],
+        )
+
+    @staticmethod
+    def _best(entries, prefix, limit):
+        texts, ranks, suggestions = entries
+        start = bisect_left(texts, prefix)
+        window = ranks[start:bisect_left(texts, prefix + '\U0010ffff', start)]
+        # An entry can match through several of its keys, so look a little
+        # past ``limit`` and fall back to the whole window if that is short.
+        size = min(len(window), limit * 4)
+        best = np.unique(np.partition(window, size - 1)[:size]) if 0 < size < len(window) else np.unique(window)
+        if len(best) < limit and size < len(window):
+            best = np.unique(window)
+        return [suggestions[rank] for rank in best[:limit]]
+
+    def complete(self, query, limit=5):
+        """
+        Return ``{'books': [...], 'authors': [...], 'genres': [...]}`` with up
+        to ``limit`` ``{'id', 'label'}`` suggestions each, best first. Until
+        the index is built every list is empty.
+        """
+        prefix = utils.default_process(query or '')
+        # Read once: a reset may clear the attribute at any point.
+        current = self._snapshot
+        if not prefix or current is None:
+            if prefix:
+                self.start_build()
+            return {f'{kind}s': [] for kind in KINDS}
+        snapshot, memo = current
+
+        result = memo.get((prefix, limit))
+        if result is None:
+            result = {f'{kind}s': self._best(snapshot[kind], prefix, limit) for kind in KINDS}
+            if len(memo) < self.max_memo:
+                memo[prefix, limit] = result
+        return result
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def start_builder():
+    """
+    Build ``autocomplete_index`` in the background, and keep rebuilding it
+    every AUTOCOMPLETE_INDEX_REBUILD_INTERVAL seconds when that is set.
+    """
+    autocomplete_index.start_build(getattr(settings, 'AUTOCOMPLETE_INDEX_REBUILD_INTERVAL', None))
@@ -0,0 +1,99 @@
+import random
+from itertools import islice
+
+from ..activity import RATE
+from ..models import Author, Book, BookPublisher, Genre, Publisher, User, UserBehavior
+
+# Synthetic catalogs for benchmarks. Everything is inserted with bulk_create
+# in fixed-size batches from generators, so memory stays flat however large
+# the catalog, and a seeded RNG makes two runs produce the same data.
+WORDS = (
+    'shadow', 'river', 'crown', 'glass', 'winter', 'ember', 'garden', 'silent', 'iron', 'storm',
+    'hollow', 'star', 'forgotten', 'golden', 'night', 'ocean', 'paper', 'wolf', 'city', 'last',
+    'secret', 'broken', 'summer', 'king', 'house', 'raven', 'salt', 'distant', 'lantern', 'bone',
+)
+GENRES = (
+    'Fantasy', 'Science Fiction', 'Mystery', 'Romance', 'Horror', 'Thriller', 'Historical', 'Poetry',
+    'Biography', 'Adventure', 'Drama', 'Comedy', 'Young Adult', 'Crime', 'Western', 'Classics',
+)
+# Roughly how real traffic splits between behaviors: mostly views and reads.
+ACTION_MIX = {'view': 60, 'read': 25, RATE: 6, 'favorite': 5, 'save': 4}
+
+PREFIX = 'Benchmark'
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def title(rng, i):
+    return f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {i}'
+
+
+def seed_catalog(books=10000, authors=2000, users=1000, behaviors=100000, publishers=50, batch_size=2000, seed=0, progress=None):
+    """
+    Insert a synthetic catalog and return ``{'book_ids', 'genres', 'user_ids'}``
+    for workloads to draw from. Books get two publishers each, and behaviors
+    are spread over users and books with a skew towards popular books.
+    ``progress(label, done)`` is called after each batch.
+    """
+    rng = random.Random(seed)
+    report = progress or (lambda label, done: None)
+
+    genres = Genre.objects.bulk_create([Genre(name=f'{PREFIX} {name}') for name in GENRES])
+    publisher_ids = [
+        publisher.pk for publisher in
+        Publisher.objects.bulk_create([Publisher(name=f'{PREFIX} publisher {i}') for i in range(publishers)])
+    ]
+    author_ids = []
+    for batch in batched((Author(name=f'{PREFIX} author {i}') for i in range(authors)), batch_size):
+        author_ids.extend(author.pk for author in Author.objects.bulk_create(batch))
+        report('authors', len(author_ids))
+
+    book_ids = []
+    rows = (
+        Book(
+            title=title(rng, i), author_id=rng.choice(author_ids), genre=rng.choice(genres),
+            synopsis=' '.join(rng.choices(WORDS, k=40)), book_cover=f'book_covers/{i}.jpg',
+            rating=f'{rng.uniform(1, 5):.2f}', views=int(rng.paretovariate(1.2)),
+        )
+        for i in range(books)
+    )
+    for batch in batched(rows, batch_size):
+        created = Book.objects.bulk_create(batch)
+        BookPublisher.objects.bulk_create([
+            BookPublisher(book=book, publisher_id=publisher_id, translation=rng.random() < 0.2, edition='First')
+            for book in created
+            for publisher_id in rng.sample(publisher_ids, 2)
+        ])
+        book_ids.extend(book.pk for book in created)
+        report('books', len(book_ids))
+
+    user_ids = []
+    rows = (User(firstname=PREFIX, lastname=str(i), email=f'benchmark{i}@example.com') for i in range(users))
+    for batch in batched(rows, batch_size):
+        user_ids.extend(user.pk for user in User.objects.bulk_create(batch))
+        report('users', len(user_ids))
+
+    actions, weights = zip(*ACTION_MIX.items())
+    done = 0
+    if user_ids and book_ids:
+        # Cubing a uniform draw skews picks towards the start of book_ids, so
+        # a minority of books gets most of the activity.
+        rows = (
+            UserBehavior(
+                user_id=rng.choice(user_ids),
+                book_id=book_ids[int(len(book_ids) * rng.random() ** 3)],
+                action_type=action,
+                value=rng.randint(1, 5) if action == RATE else None,
+            )
+            for action in (rng.choices(actions, weights)[0] for _ in range(behaviors))
+        )
+        for batch in batched(rows, batch_size):
+            UserBehavior.objects.bulk_create(batch)
+            done += len(batch)
+            report('behaviors', done)
+
+    return {'book_ids': book_ids, 'genres': [genre.name for genre in genres], 'user_ids': user_ids}
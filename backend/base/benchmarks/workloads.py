@@ -0,0 +1,130 @@
+import math
+import statistics
+import time
+from contextlib import ExitStack
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+
+from ..metrics import RequestStats
+from ..models import Book, Genre, User
+from .factory import WORDS, title
+
+# Scripted request mixes for the REST API. Each workload turns an RNG and
+# the seeded catalog into ``(method, path, body)``; ``run_workload`` replays
+# it through the test client and records latency and SQL queries per request.
+
+
+def existing_catalog():
+    """
+    The ids and names workloads draw from, read from whatever data is loaded.
+    """
+    return {
+        'book_ids': list(Book.objects.order_by('id').values_list('id', flat=True)),
+        'genres': list(Genre.objects.values_list('name', flat=True)),
+        'user_ids': list(User.objects.values_list('id', flat=True)),
+    }
+
+
+def list_books(rng, catalog):
+    return 'get', reverse('get-all-books'), None
+
+
+def book_detail(rng, catalog):
+    return 'get', reverse('get-book', args=[rng.choice(catalog['book_ids'])]), None
+
+
+def search(rng, catalog):
+    # One or two title words, as typed into a search box.
+    return 'get', reverse('search-books') + '?q=' + '+'.join(rng.sample(WORDS, rng.choice((1, 2)))), None
+
+
+def books_by_genre(rng, catalog):
+    return 'get', reverse('books-by-genre', args=[rng.choice(catalog['genres'])]), None
+
+
+def add_books(rng, catalog, batch=10):
+    books = [{
+        'title': title(rng, rng.randrange(10 ** 9)),
+        'author': {'name': f'Benchmark author {rng.randrange(1000)}'},
+        'genre': {'name': rng.choice(catalog['genres'])},
+        'synopsis': ' '.join(rng.choices(WORDS, k=40)),
+        'publishers': [{'publisher': {'name': 'Benchmark publisher 0'}, 'translation': False, 'edition': 'First'}],
+        'book_cover': 'book_covers/benchmark.jpg',
+        'rating': '4.00',
+        'views': 0,
+    } for _ in range(batch)]
+    return 'post', reverse('add-book'), books
+
+
+WORKLOADS = {
+    'books': list_books,
+    'book-detail': book_detail,
+    'search': search,
+    'books-by-genre': books_by_genre,
+    'add-book': add_books,
+}
+
+
+def percentile(values, q):
+    """
+    Nearest-rank percentile of sorted ``values``.
+    """
+    if not values:
+        return None
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def summarize(latencies, queries, statuses, elapsed):
+    latencies = sorted(latency * 1000 for latency in latencies)
+    queries = sorted(queries)
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for code in statuses if code >= 500),
+        'statuses': {str(code): statuses.count(code) for code in sorted(set(statuses))},
+        'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'mean': round(statistics.fmean(latencies), 3),
+            'max': round(latencies[-1], 3),
+        },
+        'queries': {
+            'p50': percentile(queries, 50),
+            'max': queries[-1],
+            'total': sum(queries),
+        },
+    }
+
+
+def send(client, method, path, body):
+    if body is None:
+        return getattr(client, method)(path)
+    return getattr(client, method)(path, body, content_type='application/json')
+
+
+def run_workload(workload, catalog, rng, requests, warmup=0):
+    """
+    Issue ``warmup`` untimed requests, then ``requests`` timed ones, one at
+    a time. Queries are counted on every database alias, so reads routed to
+    the replica are included. Returns the summary dict.
+    """
+    client = Client()
+    for _ in range(warmup):
+        send(client, *workload(rng, catalog))
+
+    latencies, queries, statuses = [], [], []
+    started = time.perf_counter()
+    for _ in range(requests):
+        request = workload(rng, catalog)
+        stats = RequestStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            start = time.perf_counter()
+            response = send(client, *request)
+            latencies.append(time.perf_counter() - start)
+        queries.append(stats.queries)
+        statuses.append(response.status_code)
+    return summarize(latencies, queries, statuses, time.perf_counter() - started)
@@ -0,0 +1,176 @@
+import hashlib
+import asyncio
+import threading
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_PREFIX = 'catalog-version'
+LOCK_PREFIX = 'catalog-lock'
+
+# Versions and rebuild locks rely on the cache's add() and incr(). They are
+# atomic in LocMemCache within one process, but FileBasedCache (CACHE_DIR)
+# implements both as a read followed by a write. Across processes the
+# rebuild lock is therefore only best effort: two workers can both take it
+# and rebuild the same entry. Two invalidations racing on one version can
+# also collapse into a single bump, which is why signals bump again after
+# commit. A backend with atomic add/incr, such as Redis or Memcached, makes
+# both exact.
+
+
+class CacheStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def incr(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts.get('hit', 0) + counts.get('stale', 0) + counts.get('miss', 0)
+        counts['hit_ratio'] = round((counts.get('hit', 0) + counts.get('stale', 0)) / lookups, 4) if lookups else None
+        return counts
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def _version_key(entity):
+    return f'{VERSION_PREFIX}:{entity}'
+
+
+def versions(entities):
+    """
+    Current version of each entity. A missing version (first use or evicted)
+    is seeded from the clock so it can never repeat an older one.
+    """
+    keys = [_version_key(entity) for entity in entities]
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            cache.add(key, value, timeout=None)
+        found.update(cache.get_many(list(missing)))
+    return [found.get(key, missing.get(key)) for key in keys]
+
+
+def invalidate(*entities):
+    """
+    Bump the version of each entity, orphaning every cached response built on it.
+    """
+    for entity in entities:
+        key = _version_key(entity)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def _timeouts():
+    return (
+        getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300),
+        getattr(settings, 'CATALOG_CACHE_LOCK_TIMEOUT', 10),
+        getattr(settings, 'CATALOG_CACHE_WAIT', 0.5),
+    )
+
+
+def _keys(name, key, entity_versions):
+    version = ':'.join(str(v) for v in entity_versions)
+    digest = hashlib.md5(f'{key}:{version}'.encode('utf-8')).hexdigest()
+    cache_key = f'catalog:{name}:{digest}'
+    return cache_key, f'{LOCK_PREFIX}:{cache_key}'
+
+
+def cached(name, entities, build, key=''):
+    """
+    Return ``build()``'s result through the cache.
+
+    Keys embed the versions of ``entities``, so invalidation is a version
+    bump. Entries outlive their freshness window by the same amount again:
+    once stale, one caller takes a short lock and rebuilds while the others
+    keep serving the stale value. On a cold key, callers that lose the lock
+    wait briefly for the winner before building themselves.
+    """
+    timeout, lock_timeout, wait = _timeouts()
+    cache_key, lock_key = _keys(name, key, versions(entities))
+
+    entry = cache.get(cache_key)
+    if entry is not None and time.time() < entry[1]:
+        stats.incr('hit')
+        return entry[0]
+
+    locked = cache.add(lock_key, 1, timeout=lock_timeout)
+    if not locked:
+        if entry is not None:
+            stats.incr('stale')
+            return entry[0]
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = cache.get(cache_key)
+            if entry is not None:
+                stats.incr('hit')
+                return entry[0]
+
+    stats.incr('miss')
+    try:
+        value = build()
+        cache.set(cache_key, (value, time.time() + timeout), timeout=timeout * 2)
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return value
+
+
+async def aversions(entities):
+    keys = [_version_key(entity) for entity in entities]
+    found = await cache.aget_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        for key, value in missing.items():
+            await cache.aadd(key, value, timeout=None)
+        found.update(await cache.aget_many(list(missing)))
+    return [found.get(key, missing.get(key)) for key in keys]
+
+
+async def acached(name, entities, build, key=''):
+    """
+    Async counterpart of ``cached``; ``build`` is a coroutine function.
+    """
+    timeout, lock_timeout, wait = _timeouts()
+    cache_key, lock_key = _keys(name, key, await aversions(entities))
+
+    entry = await cache.aget(cache_key)
+    if entry is not None and time.time() < entry[1]:
+        stats.incr('hit')
+        return entry[0]
+
+    locked = await cache.aadd(lock_key, 1, timeout=lock_timeout)
+    if not locked:
+        if entry is not None:
+            stats.incr('stale')
+            return entry[0]
+        deadline = time.monotonic() + wait
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.01)
+            entry = await cache.aget(cache_key)
+            if entry is not None:
+                stats.incr('hit')
+                return entry[0]
+
+    stats.incr('miss')
+    try:
+        value = await build()
+        await cache.aset(cache_key, (value, time.time() + timeout), timeout=timeout * 2)
+    finally:
+        if locked:
+            await cache.adelete(lock_key)
+    return value
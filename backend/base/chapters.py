@@ -0,0 +1,103 @@
+import hashlib
+import zlib
+from django.db import transaction
+from .models import Chapter, ChapterBlock
+
+# Chapter text is stored as independently compressed blocks of BLOCK_SIZE
+# characters, so a block's position doubles as its character offset index
+# and any range can be served by decompressing only the blocks it covers.
+#
+# Chapter.content keeps the plain text as well, deliberately: it is the
+# source the chapter full-text index (base/fulltext.py) reads snippets from.
+# FTS5 can only build snippets from text it can read back, so dropping the
+# column would move the same bytes into the index's own content table
+# rather than save them. Reads never load the column; they defer it and go
+# through the blocks.
+BLOCK_SIZE = 4096
+COMPRESSION_LEVEL = 6
+
+
+def compress_blocks(text):
+    return [
+        zlib.compress(text[offset:offset + BLOCK_SIZE].encode('utf-8'), COMPRESSION_LEVEL)
+        for offset in range(0, len(text), BLOCK_SIZE)
+    ]
+
+
+def content_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def store_chapter_body(chapter, text):
+    """
+    Replace the stored blocks of ``chapter`` with the compressed ``text``.
+    """
+    blocks = [
+        ChapterBlock(chapter=chapter, position=position, data=data)
+        for position, data in enumerate(compress_blocks(text))
+    ]
+    with transaction.atomic():
+        ChapterBlock.objects.filter(chapter=chapter).delete()
+        ChapterBlock.objects.bulk_create(blocks)
+        Chapter.objects.filter(pk=chapter.pk).update(content_length=len(text), content_hash=content_hash(text))
+    chapter.content_length = len(text)
+    chapter.content_hash = content_hash(text)
+
+
+def bulk_create_chapters(chapters, batch_size=500):
+    """
+    Insert new chapters together with their compressed blocks in batches.
+    ``bulk_create`` skips the save signals, so numbering must already be set.
+    """
+    for chapter in chapters:
+        chapter.content_length = len(chapter.content)
+        chapter.content_hash = content_hash(chapter.content)
+    with transaction.atomic():
+        Chapter.objects.bulk_create(chapters, batch_size=batch_size)
+        ChapterBlock.objects.bulk_create(
+            (
+                ChapterBlock(chapter=chapter, position=position, data=data)
+                for chapter in chapters
+                for position, data in enumerate(compress_blocks(chapter.content))
+            ),
+            batch_size=batch_size,
+        )
+    return chapters
+
+
+def page_count(content_length):
+    return -(-content_length // BLOCK_SIZE)
+
+
+def read_chapter_range(chapter_id, start, end):
+    """
+    Return characters ``[start, end)`` of a chapter, touching only the blocks
+    that overlap the range.
+    """
+    if end <= start:
+        return ''
+    first, last = start // BLOCK_SIZE, (end - 1) // BLOCK_SIZE
+    blocks = ChapterBlock.objects.filter(
+        chapter_id=chapter_id, position__range=(first, last)
+    ).order_by('position').values_list('data', flat=True)
+    text = decompress_blocks(blocks)
+    offset = first * BLOCK_SIZE
+    return text[start - offset:end - offset]
+
+
+def decompress_blocks(blocks):
+    return ''.join(zlib.decompress(data).decode('utf-8') for data in blocks)
+
+
+def chapter_blocks(chapter_ids):
+    """
+    ``{chapter_id: [compressed block, ...]}`` in position order for several
+    chapters, in one query.
+    """
+    blocks = {chapter_id: [] for chapter_id in chapter_ids}
+    rows = ChapterBlock.objects.filter(chapter_id__in=chapter_ids).order_by('chapter_id', 'position').values_list(
+        'chapter_id', 'data'
+    )
+    for chapter_id, data in rows:
+        blocks[chapter_id].append(bytes(data))
+    return blocks
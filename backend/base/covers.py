@@ -0,0 +1,204 @@
+import hashlib
+import io
+import logging
+import threading
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .cache import invalidate
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+# Variants are named after the SHA-1 of the original file, so identical
+# covers share them and a changed cover never reuses an old URL. That is
+# what lets the cover view mark responses immutable.
+COVER_DIR = 'covers'
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def cover_widths():
+    return getattr(settings, 'COVER_WIDTHS', (160, 320, 640))
+
+
+def cover_workers():
+    return getattr(settings, 'COVER_WORKERS', 2)
+
+
+def variant_name(cover_hash, width, fmt):
+    return f'{COVER_DIR}/{cover_hash[:2]}/{cover_hash}-{width}.{fmt}'
+
+
+@lru_cache(maxsize=None)
+def cover_url_prefix():
+    return reverse('cover', args=['-'])[:-1]
+
+
+def srcset(cover_hash):
+    """
+    ``{'webp': 'url 160w, ...', 'jpeg': ...}`` for a processed cover, ready
+    for ``<source srcset>``; None until the cover has been processed.
+    """
+    if not cover_hash:
+        return None
+    return {
+        fmt: ', '.join(
+            f'{cover_url_prefix()}{variant_name(cover_hash, width, fmt)[len(COVER_DIR) + 1:]} {width}w'
+            for width in cover_widths()
+        )
+        for fmt in FORMATS
+    }
+
+
+def render_variants(data, widths):
+    """
+    Resize the image in ``data`` to each width (never enlarging it) and encode
+    each size in every format. Runs in a worker process, so it takes and
+    returns plain bytes: ``{(width, fmt): bytes}``.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    variants = {}
+    for width in widths:
+        resized = image
+        if image.width > width:
+            resized = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+        for fmt, (pil_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            variants[width, fmt] = buffer.getvalue()
+    return variants
+
+
+# One pool per worker count, started on first use and kept for the life of
+# the process, so batches don't each pay for spawning workers.
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def cover_pool(workers):
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+
+def _discard_pool(workers, pool):
+    # A worker that died takes the whole pool down; the next batch starts a
+    # fresh one.
+    with _pools_lock:
+        if _pools.get(workers) is pool:
+            del _pools[workers]
+    pool.shutdown(wait=False)
+
+
+def _read(name):
+    try:
+        with default_storage.open(name, 'rb') as f:
+            return f.read()
+    except (FileNotFoundError, OSError):
+        logger.warning('Cover %s could not be read', name)
+        return None
+
+
+def process_covers(covers, workers=None, force=False):
+    """
+    Generate the variants for ``(book_id, cover_name)`` pairs and record each
+    book's ``cover_hash``. Resizing and encoding run in the shared pool of
+    ``workers`` processes (inline when 0); file and database I/O stay here.
+    Returns the number of books updated.
+    """
+    workers = cover_workers() if workers is None else workers
+    widths = cover_widths()
+    hashes, pending = {}, {}
+    for book_id, name in covers:
+        data = _read(name)
+        if data is None:
+            continue
+        cover_hash = hashlib.sha1(data).hexdigest()
+        hashes[book_id] = cover_hash
+        if cover_hash not in pending and (force or not default_storage.exists(variant_name(cover_hash, widths[-1], 'jpeg'))):
+            pending[cover_hash] = data
+
+    def store(cover_hash, variants):
+        for (width, fmt), content in variants.items():
+            name = variant_name(cover_hash, width, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(content))
+
+    failed = set()
+    # A single upload renders inline rather than round-tripping through the pool.
+    if workers and len(pending) > 1:
+        pool = cover_pool(workers)
+        try:
+            futures = {cover_hash: pool.submit(render_variants, data, widths) for cover_hash, data in pending.items()}
+        except BrokenProcessPool:
+            _discard_pool(workers, pool)
+            raise
+        for cover_hash, future in futures.items():
+            try:
+                store(cover_hash, future.result())
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _discard_pool(workers, pool)
+                logger.exception('Failed to process cover %s', cover_hash)
+                failed.add(cover_hash)
+    else:
+        for cover_hash, data in pending.items():
+            try:
+                store(cover_hash, render_variants(data, widths))
+            except Exception:
+                logger.exception('Failed to process cover %s', cover_hash)
+                failed.add(cover_hash)
+
+    updates = [Book(pk=book_id, cover_hash=cover_hash) for book_id, cover_hash in hashes.items() if cover_hash not in failed]
+    Book.objects.bulk_update(updates, ['cover_hash'], batch_size=500)
+    if updates:
+        invalidate('book', *(f'book:{book.pk}' for book in updates))
+    return len(updates)
+
+
+# Uploads and imports hand their covers to a single background thread, which
+# fans the work out to the process pool without holding up the request.
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def _process_in_background(covers):
+    try:
+        process_covers(covers)
+    except Exception:
+        logger.exception('Failed to process covers')
+    finally:
+        close_old_connections()
+
+
+def schedule_covers(covers):
+    """
+    Process ``(book_id, cover_name)`` pairs whose files exist: in the
+    background, or inline when ``COVER_WORKERS`` is 0.
+    """
+    global _dispatcher
+    covers = [(book_id, name) for book_id, name in covers if name and default_storage.exists(name)]
+    if not covers:
+        return
+    if not cover_workers():
+        process_covers(covers, workers=0)
+        return
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='covers')
+    _dispatcher.submit(_process_in_background, covers)
@@ -0,0 +1,91 @@
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils import timezone
+from .models import JobLock
+
+PRIMARY = 'default'
+REPLICA = 'replica'
+
+
+def apply_pragmas(cursor, pragmas):
+    for name, value in pragmas.items():
+        cursor.execute(f'PRAGMA {name} = {value}')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    Tune each new SQLite connection. The replica alias is additionally made
+    query-only, so a misrouted write fails instead of contending for the lock.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        apply_pragmas(cursor, getattr(settings, 'SQLITE_PRAGMAS', {}))
+        if connection.alias == REPLICA:
+            cursor.execute('PRAGMA query_only = ON')
+
+
+class ReadReplicaRouter:
+    """
+    Send reads to the replica and writes to the primary.
+
+    Reads made while the primary is inside a transaction stay on the primary,
+    so they see that transaction's own uncommitted writes.
+    """
+
+    def db_for_read(self, model, **hints):
+        if REPLICA not in settings.DATABASES or connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {PRIMARY, REPLICA}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+def database_bytes(using=PRIMARY):
+    """
+    Bytes of the database file in use, not counting free pages, or None
+    for backends other than SQLite.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        values = []
+        for pragma in ('page_count', 'freelist_count', 'page_size'):
+            cursor.execute(f'PRAGMA {pragma}')
+            values.append(cursor.fetchone()[0])
+    page_count, freelist_count, page_size = values
+    return (page_count - freelist_count) * page_size
+
+
+def acquire_lock(name, timeout):
+    """
+    Take the lock ``name`` for ``timeout`` seconds. Returns a token for
+    ``release_lock``, or None while another holder has it. Unlike a cache
+    lock, this holds across every process and host using the database.
+    """
+    holder = uuid.uuid4().hex
+    now = timezone.now()
+    expires = now + timedelta(seconds=timeout)
+    with transaction.atomic(using=PRIMARY):
+        # A lock its holder never released is taken over once it expires.
+        if JobLock.objects.filter(name=name, expires__lt=now).update(holder=holder, expires=expires):
+            return holder
+        _, created = JobLock.objects.get_or_create(name=name, defaults={'holder': holder, 'expires': expires})
+    return holder if created else None
+
+
+def release_lock(name, holder):
+    JobLock.objects.filter(name=name, holder=holder).delete()
@@ -0,0 +1,140 @@
+import html
+import re
+from django.db import connections, router
+from .models import Book
+
+# FTS5 indexes over book synopses and chapter text. Both are external-content
+# tables: they store only the inverted index and read snippets back from
+# base_book / base_chapter. Triggers created in migration 0025 keep them in
+# sync, including for bulk_create and queryset updates that skip signals;
+# any that a table rebuild dropped are recreated after every migrate.
+BOOK_TABLE = 'base_book_fts'
+CHAPTER_TABLE = 'base_chapter_fts'
+
+# (index, content table, body column) for each index.
+INDEXES = [
+    (BOOK_TABLE, 'base_book', 'synopsis'),
+    (CHAPTER_TABLE, 'base_chapter', 'content'),
+]
+
+# bm25 column weights for (title, body): a hit in a title counts for more.
+TITLE_WEIGHT = 5.0
+BODY_WEIGHT = 1.0
+
+# snippet() wraps matches in these control characters rather than in tags,
+# so the text can be HTML-escaped before they become <mark> elements.
+HIGHLIGHT = ('\x02', '\x03')
+MARK = ('<mark>', '</mark>')
+SNIPPET_TOKENS = 16
+
+KINDS = ('book', 'chapter')
+
+TOKEN = re.compile(r'\w+', re.UNICODE)
+
+SEARCH_SQL = {
+    'book': f"""
+        SELECT 'book', b.id, NULL, b.title, b.title,
+               snippet({BOOK_TABLE}, 1, %s, %s, '…', {SNIPPET_TOKENS}),
+               bm25({BOOK_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+        FROM {BOOK_TABLE}
+        JOIN base_book b ON b.id = {BOOK_TABLE}.rowid
+        WHERE {BOOK_TABLE} MATCH %s
+    """,
+    'chapter': f"""
+        SELECT 'chapter', c.book_id, c.id, b.title, c.title,
+               snippet({CHAPTER_TABLE}, 1, %s, %s, '…', {SNIPPET_TOKENS}),
+               bm25({CHAPTER_TABLE}, {TITLE_WEIGHT}, {BODY_WEIGHT}) AS score
+        FROM {CHAPTER_TABLE}
+        JOIN base_chapter c ON c.id = {CHAPTER_TABLE}.rowid
+        JOIN base_book b ON b.id = c.book_id
+        WHERE {CHAPTER_TABLE} MATCH %s
+    """,
+}
+
+FIELDS = ('type', 'book_id', 'chapter_id', 'book_title', 'title', 'snippet', 'score')
+
+
+def trigger_sql(fts, table, body):
+    """
+    Triggers that mirror inserts, deletes and edits of indexed columns into
+    the index. SQLite drops a table's triggers with it, so migrations that
+    rebuild ``table`` must run these again.
+    """
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, title, {body}) VALUES (new.id, new.title, new.{body});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title, {body}) VALUES ('delete', old.id, old.title, old.{body});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, {body} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title, {body}) VALUES ('delete', old.id, old.title, old.{body});
+            INSERT INTO {fts}(rowid, title, {body}) VALUES (new.id, new.title, new.{body});
+        END""",
+    ]
+
+
+def ensure_triggers(using):
+    """
+    Create any missing triggers on the ``using`` database. Runs after every
+    migrate, so a migration that rebuilds an indexed table without
+    recreating its triggers cannot leave the index silently going stale.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {name for name, in cursor.fetchall()}
+        for fts, table, body in INDEXES:
+            if fts in tables and table in tables:
+                for statement in trigger_sql(fts, table, body):
+                    cursor.execute(statement)
+
+
+def match_expression(query):
+    """
+    Turn free text into an FTS5 query: every word must appear, and the last
+    one may be a prefix so results keep up with typing. Quoting each word
+    keeps FTS5 operators and punctuation in the input from being parsed.
+    """
+    words = TOKEN.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def highlight(snippet):
+    """
+    HTML-escape a snippet and turn its match delimiters into <mark> tags, so
+    it is safe to insert as markup whatever the indexed text contains.
+    """
+    text = html.escape(snippet)
+    for delimiter, tag in zip(HIGHLIGHT, MARK):
+        text = text.replace(delimiter, tag)
+    return text
+
+
+def search(query, kinds=KINDS, offset=0, limit=20):
+    """
+    Rank books (by title and synopsis) and chapters (by title and text)
+    matching ``query`` with bm25. Returns up to ``limit`` dicts with an
+    HTML-escaped snippet of the best matching passage, matches wrapped in
+    <mark>; lower scores rank higher.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+    sql, params = [], []
+    for kind in kinds:
+        sql.append(SEARCH_SQL[kind])
+        params.extend([*HIGHLIGHT, expression])
+    statement = ' UNION ALL '.join(sql) + ' ORDER BY score, 1, 3 LIMIT %s OFFSET %s'
+    with connections[router.db_for_read(Book)].cursor() as cursor:
+        cursor.execute(statement, [*params, limit, offset])
+        results = [dict(zip(FIELDS, row)) for row in cursor.fetchall()]
+    for result in results:
+        result['snippet'] = highlight(result['snippet'])
+    return results
@@ -0,0 +1,139 @@
+import json
+import logging
+import platform
+import random
+import subprocess
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from base.activity import activity_buffer
+from base.cache import invalidate
+from base.benchmarks.factory import seed_catalog
+from base.benchmarks.workloads import WORKLOADS, existing_catalog, run_workload
+from base.search import book_index
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic catalog and replay scripted workloads against the REST API through the test client, '
+        'recording p50/p95/p99 latency, throughput and SQL queries per workload to a JSON file. '
+        'The catalog is seeded inside a transaction that is rolled back afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000, help='Books to seed, e.g. 1000000 for a large catalog.')
+        parser.add_argument('--authors', type=int, default=2000)
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--behaviors', type=int, default=100000, help='UserBehavior rows to seed.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per bulk_create.')
+        parser.add_argument('--no-seed', action='store_true', help='Run against the data already in the database.')
+        parser.add_argument('--keep', action='store_true', help='Commit the seeded catalog instead of rolling it back.')
+        parser.add_argument('--workload', action='append', dest='workloads', choices=sorted(WORKLOADS),
+                            help='Workload to run (repeatable). Defaults to all of them.')
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per workload.')
+        parser.add_argument('--warmup', type=int, default=20, help='Untimed requests per workload, to fill caches and indexes.')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the catalog and the request mix.')
+        parser.add_argument('--output', default='benchmark-results.json', help='Results file.')
+        parser.add_argument('--compare', help='Earlier results file to print changes against.')
+
+    def handle(self, *args, **options):
+        if options['no_seed'] and options['keep']:
+            raise CommandError('--keep only applies to a seeded catalog')
+        # 404s from searches without matches are expected; keep them out of the output.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        rest_framework = {**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {}}
+        # No throttling, and buffered views are flushed inline rather than by
+        # a thread that would contend for the database.
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                               REST_FRAMEWORK=rest_framework, ACTIVITY_FLUSH_INTERVAL=0):
+            with transaction.atomic():
+                results = self.run(options)
+                if not options['keep']:
+                    transaction.set_rollback(True)
+        # Benchmark traffic should not count as book views, and caches may
+        # hold rolled back books.
+        activity_buffer.clear()
+        if not options['keep']:
+            invalidate('book', 'author', 'genre', 'publisher')
+            book_index.reset()
+
+        with open(options['output'], 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), results)
+
+    def run(self, options):
+        rng = random.Random(options['seed'])
+        if options['no_seed']:
+            catalog = existing_catalog()
+            seed_seconds = None
+        else:
+            start = time.perf_counter()
+            catalog = seed_catalog(
+                books=options['books'], authors=options['authors'], users=options['users'],
+                behaviors=options['behaviors'], batch_size=options['batch_size'], seed=options['seed'],
+                progress=lambda label, done: self.stderr.write(f'\rSeeding {label}: {done}', ending=''),
+            )
+            seed_seconds = round(time.perf_counter() - start, 2)
+            self.stderr.write(f'\nSeeded in {seed_seconds} s')
+        if not catalog['book_ids'] or not catalog['genres']:
+            raise CommandError('The catalog is empty; seed one or drop --no-seed')
+        # Servers build the search index at startup; do the same here so the
+        # search workload is not turned away while it builds.
+        book_index.reset()
+        book_index.build()
+
+        results = {
+            'meta': {
+                'commit': git_commit(),
+                'date': timezone.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'database': settings.DATABASES['default']['ENGINE'].rsplit('.', 1)[-1],
+                'books': len(catalog['book_ids']),
+                'seeded': not options['no_seed'],
+                'seed_seconds': seed_seconds,
+                'requests': options['requests'],
+                'warmup': options['warmup'],
+            },
+            'workloads': {},
+        }
+        for name in options['workloads'] or WORKLOADS:
+            result = run_workload(WORKLOADS[name], catalog, rng, options['requests'], options['warmup'])
+            results['workloads'][name] = result
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{name:<16} {result['throughput_rps']:8.1f} req/s  p50 {latency['p50']:8.2f} ms  "
+                f"p95 {latency['p95']:8.2f} ms  p99 {latency['p99']:8.2f} ms  queries p50 {result['queries']['p50']}"
+            )
+        return results
+
+    def compare(self, before, after):
+        self.stdout.write(f"Compared with {before['meta'].get('commit')}:")
+        for name, result in after['workloads'].items():
+            previous = before['workloads'].get(name)
+            if previous is None:
+                continue
+            changes = []
+            for key in ('p50', 'p95', 'p99'):
+                old, new = previous['latency_ms'][key], result['latency_ms'][key]
+                changes.append(f'{key} {(new - old) / old * 100:+6.1f}%' if old else f'{key} n/a')
+            old, new = previous['throughput_rps'], result['throughput_rps']
+            changes.append(f'throughput {(new - old) / old * 100:+6.1f}%' if old else 'throughput n/a')
+            changes.append(f"queries p50 {previous['queries']['p50']} -> {result['queries']['p50']}")
+            self.stdout.write(f"{name:<16} " + '  '.join(changes))
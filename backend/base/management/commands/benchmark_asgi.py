@@ -0,0 +1,78 @@
+import asyncio
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient, Client
+from django.test.utils import setup_test_environment
+
+from base.activity import activity_buffer
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'throughput': len(latencies) / elapsed if elapsed else 0,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'mean': statistics.fmean(latencies) * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the synchronous (WSGI) read views with their async (ASGI) counterparts '
+        'under concurrent load, using the in-process test clients.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path under /api/ to request (repeatable). Defaults to the main read endpoints.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per path and mode.')
+        parser.add_argument('--concurrency', type=int, default=32, help='Requests in flight at once.')
+
+    def handle(self, *args, **options):
+        # The test clients need ALLOWED_HOSTS to accept 'testserver'.
+        setup_test_environment()
+        # 404s from empty searches are expected; keep them out of the report.
+        logging.getLogger('django.request').setLevel(logging.ERROR)
+        paths = options['paths'] or ['books/', 'books/1/', 'search/?q=the', 'books/genre/', 'books/authors/']
+        for path in paths:
+            sync_result = self.run_sync(f'/api/{path}', options['requests'], options['concurrency'])
+            async_result = asyncio.run(self.run_async(f'/api/async/{path}', options['requests'], options['concurrency']))
+            for mode, result in (('wsgi', sync_result), ('asgi', async_result)):
+                self.stdout.write(
+                    f"{path:<24} {mode}  {result['throughput']:8.1f} req/s  "
+                    f"p50 {result['p50']:7.2f} ms  p99 {result['p99']:7.2f} ms  mean {result['mean']:7.2f} ms"
+                )
+        # Benchmark traffic should not count as book views.
+        activity_buffer.clear()
+
+    def run_sync(self, url, requests, concurrency):
+        client = Client()
+
+        def timed(_):
+            start = time.perf_counter()
+            client.get(url)
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, range(requests)))
+        return summarize(latencies, time.perf_counter() - start)
+
+    async def run_async(self, url, requests, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def timed():
+            async with semaphore:
+                start = time.perf_counter()
+                await client.get(url)
+                return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = await asyncio.gather(*(timed() for _ in range(requests)))
+        return summarize(latencies, time.perf_counter() - start)
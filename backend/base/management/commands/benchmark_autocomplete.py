@@ -0,0 +1,70 @@
+import random
+import string
+import time
+from django.core.management.base import BaseCommand
+
+from base.autocomplete import KINDS, AutocompleteIndex, prefix_keys
+
+WORDS = ['shadow', 'crown', 'river', 'empire', 'silent', 'dragon', 'garden', 'winter', 'iron', 'song',
+         'last', 'city', 'glass', 'storm', 'night', 'queen', 'stone', 'hollow', 'ember', 'tide']
+
+
+class Command(BaseCommand):
+    help = 'Measure autocomplete lookup latency on a synthetic in-memory catalog.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=100000, help='Synthetic books in the index.')
+        parser.add_argument('--queries', type=int, default=20000, help='Lookups to time.')
+        parser.add_argument('--no-memo', action='store_true', help='Only time lookups with memoization disabled.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        index = AutocompleteIndex()
+        authors, genres = options['books'] // 10 + 1, 50
+        names = [('author', pk, f'{rng.choice(string.ascii_uppercase)}. {rng.choice(WORDS).title()}son') for pk in range(authors)]
+        names += [('genre', pk, f'{rng.choice(WORDS).title()} {pk}') for pk in range(genres)]
+        books = [
+            (pk, ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 5))) + f' {pk}', rng.randrange(authors),
+             rng.randrange(genres), rng.randrange(100000), rng.randint(0, 500) / 100)
+            for pk in range(options['books'])
+        ]
+        start = time.perf_counter()
+        index.load(names, books)
+        self.stdout.write(f"Built index over {options['books']} books in {time.perf_counter() - start:.2f}s")
+
+        # Keystroke traffic: prefixes of the titles and names being looked
+        # for, from the start of the label or of a later word, so most
+        # prefixes are rare and longer ones narrow to a few entries.
+        labels = [book[1] for book in books] + [name[2] for name in names]
+        prefixes = []
+        for _ in range(options['queries']):
+            key = rng.choice(sorted(prefix_keys(rng.choice(labels))))
+            prefixes.append(key[:rng.randint(1, len(key))])
+        passes = [('no memo', 0)]
+        if not options['no_memo']:
+            passes.append(('memoized', index.max_memo))
+        for label, max_memo in passes:
+            index.max_memo = max_memo
+            index.refresh(KINDS)
+            self.report(label, [self.timed(index.complete, prefix) for prefix in prefixes])
+
+        # A save re-ranks only the kinds it touched, off the lock.
+        saves = [rng.choice(books) for _ in range(20)]
+        durations = []
+        for book_id, title, author_id, genre_id, views, rating in saves:
+            start = time.perf_counter()
+            index.add_book(book_id, title, author_id, genre_id, views + 1, rating)
+            index.refresh()
+            durations.append(time.perf_counter() - start)
+        self.report('save + refresh', durations)
+
+    @staticmethod
+    def timed(function, *args):
+        start = time.perf_counter()
+        function(*args)
+        return time.perf_counter() - start
+
+    def report(self, label, latencies):
+        latencies = sorted(latencies)
+        p50, p99 = latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+        self.stdout.write(f'{label:<15} p50 {p50:.3f} ms  p99 {p99:.3f} ms  max {latencies[-1] * 1000:.3f} ms')
@@ -0,0 +1,58 @@
+import random
+import time
+from itertools import accumulate
+from django.core.management.base import BaseCommand
+
+from base.search import BookSearchIndex
+
+SYLLABLES = ['ka', 'lo', 'mir', 'den', 'sha', 'vel', 'tor', 'rin', 'bel', 'os', 'que', 'an', 'dra', 'ith', 'mor',
+             'el', 'sun', 'gar', 'fen', 'ly', 'cor', 'wyn', 'hal', 'ber', 'nor', 'ste', 'ra', 'vin', 'tha', 'um']
+
+
+class Command(BaseCommand):
+    help = 'Measure fuzzy search latency on a synthetic in-memory catalog, 1M books by default.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000000, help='Synthetic books in the index.')
+        parser.add_argument('--queries', type=int, default=500, help='Searches to time.')
+        parser.add_argument('--vocabulary', type=int, default=20000, help='Distinct words titles are drawn from.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        words = sorted({
+            ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+            for _ in range(options['vocabulary'])
+        })
+        # Zipf-like word frequencies, so some words appear in many titles.
+        weights = list(accumulate(1 / (rank + 1) for rank in range(len(words))))
+        authors = [f'{rng.choice(words).title()} {rng.choice(words).title()}' for _ in range(options['books'] // 10 + 1)]
+        rows = []
+        for pk in range(options['books']):
+            author_id = rng.randrange(len(authors))
+            title = ' '.join(rng.choices(words, cum_weights=weights, k=rng.randint(1, 5))).title()
+            rows.append((pk, title, author_id, authors[author_id]))
+
+        index = BookSearchIndex()
+        start = time.perf_counter()
+        index.load(rows)
+        self.stdout.write(f"Built index over {options['books']} books in {time.perf_counter() - start:.2f}s")
+
+        # What people type: part of a title or an author's name, often with
+        # a typo.
+        queries = []
+        for _ in range(options['queries']):
+            _, title, _, author = rng.choice(rows)
+            query = author if rng.random() < 0.3 else ' '.join(title.split()[:rng.randint(1, 3)])
+            if rng.random() < 0.5 and len(query) > 3:
+                position = rng.randrange(len(query))
+                query = query[:position] + rng.choice('aeiourst') + query[position + 1:]
+            queries.append(query)
+
+        latencies = []
+        for query in queries:
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        p50, p99 = latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+        self.stdout.write(f'p50 {p50:.3f} ms  p99 {p99:.3f} ms  max {latencies[-1] * 1000:.3f} ms')
@@ -0,0 +1,62 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from base.api.fastpath import book_list
+from base.api.querysets import book_queryset
+from base.api.renderers import FastJSONRenderer
+from base.api.serializers import BookSerializer
+from base.models import Author, Book, BookPublisher, Genre, Publisher
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare BookSerializer(many=True) with the values() fast path on a synthetic catalog. '
+        'The catalog is created inside a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=10000, help='Synthetic books to serialize.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the best is reported.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ids = self.populate(options['books'])
+            queryset = Book.objects.filter(pk__in=ids).order_by('id')
+            variants = [
+                ('BookSerializer + JSONRenderer',
+                 lambda: JSONRenderer().render(BookSerializer(book_queryset(queryset), many=True).data)),
+                ('fast path + FastJSONRenderer',
+                 lambda: FastJSONRenderer().render(book_list(queryset))),
+            ]
+            outputs = []
+            for label, run in variants:
+                best = float('inf')
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    output = run()
+                    best = min(best, time.perf_counter() - start)
+                outputs.append(output)
+                self.stdout.write(f'{label:<32} {best * 1000:9.1f} ms  {len(output) / 1024:8.0f} KiB')
+            self.stdout.write('Outputs identical' if outputs[0] == outputs[1] else self.style.ERROR('Outputs differ'))
+            transaction.set_rollback(True)
+
+    def populate(self, count):
+        genres = Genre.objects.bulk_create([Genre(name=f'Benchmark genre {i}') for i in range(20)])
+        publishers = Publisher.objects.bulk_create([Publisher(name=f'Benchmark publisher {i}') for i in range(50)])
+        authors = Author.objects.bulk_create([Author(name=f'Benchmark author {i}') for i in range(count // 5 + 1)])
+        books = Book.objects.bulk_create([
+            Book(
+                title=f'Benchmark book {i}', author=authors[i % len(authors)], genre=genres[i % len(genres)],
+                synopsis='A synopsis long enough to look like one. ' * 5, book_cover=f'book_covers/{i}.jpg',
+                rating='4.25', views=i,
+            )
+            for i in range(count)
+        ], batch_size=500)
+        BookPublisher.objects.bulk_create([
+            BookPublisher(book=book, publisher=publishers[(book.pk + offset) % len(publishers)], edition='First')
+            for book in books
+            for offset in range(2)
+        ], batch_size=500)
+        return [book.pk for book in books]
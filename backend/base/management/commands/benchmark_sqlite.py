@@ -0,0 +1,105 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from base.db import apply_pragmas
+
+# SQLite's own defaults, for comparison.
+BASELINE_PRAGMAS = {'journal_mode': 'DELETE', 'synchronous': 'FULL'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Run a concurrent read/write workload against a scratch SQLite file, once with '
+        "SQLite's default pragmas and once with SQLITE_PRAGMAS, and compare throughput."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000, help='Rows in the scratch table.')
+        parser.add_argument('--readers', type=int, default=8, help='Reader threads.')
+        parser.add_argument('--writers', type=int, default=2, help='Writer threads.')
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per run.')
+
+    def handle(self, *args, **options):
+        for label, pragmas in (('default', BASELINE_PRAGMAS), ('tuned', settings.SQLITE_PRAGMAS)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.populate(path, options['rows'])
+                result = self.run(path, pragmas, options)
+            self.stdout.write(
+                f"{label:<8} reads {result['reads'] / options['duration']:9.1f}/s  "
+                f"writes {result['writes'] / options['duration']:8.1f}/s  "
+                f"read p99 {result['read_p99']:7.2f} ms  lock errors {result['errors']}"
+            )
+
+    def populate(self, path, rows):
+        with sqlite3.connect(path) as db:
+            db.execute('CREATE TABLE book (id INTEGER PRIMARY KEY, title TEXT, views INTEGER NOT NULL)')
+            db.executemany('INSERT INTO book VALUES (?, ?, 0)', ((i, f'Book {i}') for i in range(rows)))
+        db.close()
+
+    def run(self, path, pragmas, options):
+        rows = options['rows']
+        stop = threading.Event()
+        lock = threading.Lock()
+        result = {'reads': 0, 'writes': 0, 'errors': 0}
+        read_latencies = []
+
+        def connect():
+            # A short timeout makes writer contention show up as errors
+            # unless busy_timeout is set by the pragmas.
+            db = sqlite3.connect(path, timeout=0.1, isolation_level=None, check_same_thread=False)
+            apply_pragmas(db.cursor(), pragmas)
+            return db
+
+        def reader():
+            db, reads, errors, latencies = connect(), 0, 0, []
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    db.execute('SELECT id, title, views FROM book WHERE id >= ? LIMIT 20', (random.randrange(rows),)).fetchall()
+                    reads += 1
+                    latencies.append(time.perf_counter() - start)
+                except sqlite3.OperationalError:
+                    errors += 1
+            db.close()
+            with lock:
+                result['reads'] += reads
+                result['errors'] += errors
+                read_latencies.extend(latencies)
+
+        def writer():
+            db, writes, errors = connect(), 0, 0
+            while not stop.is_set():
+                try:
+                    db.execute('BEGIN IMMEDIATE')
+                    for _ in range(10):
+                        db.execute('UPDATE book SET views = views + 1 WHERE id = ?', (random.randrange(rows),))
+                    db.execute('COMMIT')
+                    writes += 1
+                except sqlite3.OperationalError:
+                    errors += 1
+                    if db.in_transaction:
+                        db.execute('ROLLBACK')
+            db.close()
+            with lock:
+                result['writes'] += writes
+                result['errors'] += errors
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        time.sleep(options['duration'])
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        read_latencies.sort()
+        result['read_p99'] = read_latencies[int(len(read_latencies) * 0.99)] * 1000 if read_latencies else 0
+        return result
@@ -0,0 +1,31 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from base.recommendations import build_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Build item-item neighbors and per-user recommendations from favorites, saved books, '
+        'history and behavior events. Meant to run as a periodic batch job.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--neighbors', type=int, default=20, help='Similar books kept per book.')
+        parser.add_argument('--recommendations', type=int, default=20, help='Recommendations kept per user.')
+        parser.add_argument('--max-user-items', type=int, default=500, help='Cap on items considered per user.')
+        parser.add_argument('--output', default=settings.RECOMMENDATIONS_PATH, help='Symlink to the current index; versions are written beside it.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        books, users = build_index(
+            options['output'],
+            neighbors=options['neighbors'],
+            recommendations=options['recommendations'],
+            max_user_items=options['max_user_items'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {books} books and {users} users in {time.perf_counter() - started:.1f}s'
+        ))
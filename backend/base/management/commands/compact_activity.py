@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from base.retention import run_retention
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold old UserBehavior events into daily summaries, prune stale History entries and old hourly '
+        'trending rollups. Meant to run periodically; defaults come from the RETENTION_* settings.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep raw events from the last N days.')
+        parser.add_argument('--history-days', type=int, help='Delete History entries not read for N days.')
+        parser.add_argument('--batch-size', type=int, help='Rows deleted per transaction.')
+        parser.add_argument('--archive-dir', help='Append deleted rows to gzipped JSONL files in this directory.')
+        parser.add_argument('--pause', type=float, default=0, help='Seconds to sleep between batches.')
+
+    def handle(self, *args, **options):
+        report = run_retention(
+            days=options['days'], history_days=options['history_days'], size=options['batch_size'],
+            archive_to=options['archive_dir'], pause=options['pause'],
+        )
+        if report is None:
+            raise CommandError('Another retention run is in progress')
+        self.stdout.write(
+            f"Compacted {report['events']} events into {report['summaries']} daily rows, "
+            f"deleted {report['history']} history entries and {report['rollups']} hourly rollups"
+        )
+        for path in report['archives']:
+            self.stdout.write(f'Archived to {path}')
+        if report['bytes'] is not None:
+            self.stdout.write(self.style.SUCCESS(f"Reclaimed {report['bytes']} bytes"))
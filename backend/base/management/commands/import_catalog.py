@@ -0,0 +1,214 @@
+import csv
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework import serializers
+
+from base.api.serializers import BookSerializer, resolve_names
+from base.chapters import bulk_create_chapters
+from base.db import PRIMARY
+from base.models import Chapter, ImportCheckpoint, Publisher
+
+
+class ImportChapterSerializer(serializers.Serializer):
+    publisher = serializers.CharField(max_length=255)
+    title = serializers.CharField(max_length=255)
+    content = serializers.CharField(trim_whitespace=False)
+
+
+def csv_record(row):
+    """
+    Turn a flat CSV row into the nested payload BookSerializer expects.
+    A row carries at most one publisher.
+    """
+    record = {
+        'title': row.get('title'),
+        'author': {'name': row.get('author')},
+        'genre': {'name': row.get('genre')},
+        'synopsis': row.get('synopsis'),
+        'rating': row.get('rating'),
+        'views': row.get('views'),
+        'publishers': [],
+    }
+    if row.get('book_cover'):
+        record['book_cover'] = row['book_cover']
+    if row.get('publisher'):
+        record['publishers'].append({
+            'publisher': {'name': row['publisher']},
+            'translation': (row.get('translation') or '').lower() in ('1', 'true', 'yes'),
+            'edition': row.get('edition') or '',
+        })
+    return record
+
+
+def validate_batch(fmt, batch):
+    """
+    Parse and validate one batch of ``(record_number, raw)`` pairs. Runs in a
+    worker process when --workers is set, so it only returns picklable data.
+    """
+    accepted, rejected = [], []
+    for number, raw in batch:
+        try:
+            record = json.loads(raw) if fmt == 'jsonl' else csv_record(raw)
+        except ValueError as e:
+            rejected.append((number, {'record': [str(e)]}))
+            continue
+        if not isinstance(record, dict):
+            rejected.append((number, {'record': ['Expected a JSON object']}))
+            continue
+
+        chapters = ImportChapterSerializer(data=record.pop('chapters', []), many=True)
+        book = BookSerializer(data=record)
+        book_valid, chapters_valid = book.is_valid(), chapters.is_valid()
+        if book_valid and chapters_valid:
+            accepted.append((book.validated_data, chapters.validated_data))
+        else:
+            errors = dict(book.errors)
+            if not chapters_valid:
+                errors['chapters'] = chapters.errors
+            rejected.append((number, errors))
+    return accepted, rejected
+
+
+class Command(BaseCommand):
+    help = (
+        'Stream books (and optional nested chapters) from a JSONL or CSV file into the catalog, '
+        'committing in batches and checkpointing progress so an interrupted import can resume.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL or CSV file to import.')
+        parser.add_argument('--format', choices=['jsonl', 'csv'], help='Defaults to the file extension.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Records committed per transaction.')
+        parser.add_argument('--workers', type=int, default=0, help='Parse and validate in this many processes.')
+        parser.add_argument('--checkpoint', help='Checkpoint name. Defaults to the absolute path of the file.')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        batch_size = max(1, options['batch_size'])
+        self.verbosity = options['verbosity']
+        self.source = options['checkpoint'] or os.path.abspath(path)
+
+        state = {'records': 0, 'offset': 0, 'accepted': 0, 'rejected': 0}
+        checkpoints = ImportCheckpoint.objects.using(PRIMARY).filter(source=self.source)
+        if options['restart']:
+            checkpoints.delete()
+        else:
+            saved = checkpoints.values(*state).first()
+            if saved is not None:
+                state.update(saved)
+                self.stdout.write(f"Resuming after record {state['records']}")
+
+        batches = self.read_batches(path, fmt, state, batch_size)
+        if options['workers'] > 0:
+            with ProcessPoolExecutor(options['workers'], initializer=django.setup) as executor:
+                pending = deque()
+                for batch, position in batches:
+                    pending.append((executor.submit(validate_batch, fmt, batch), position))
+                    # Bound the read-ahead so memory stays flat on huge files.
+                    if len(pending) >= options['workers'] * 2:
+                        future, position = pending.popleft()
+                        self.commit(future.result(), position, state)
+                while pending:
+                    future, position = pending.popleft()
+                    self.commit(future.result(), position, state)
+        else:
+            for batch, position in batches:
+                self.commit(validate_batch(fmt, batch), position, state)
+
+        checkpoints.delete()
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {state['accepted']} books, rejected {state['rejected']} records"
+        ))
+
+    def read_batches(self, path, fmt, state, batch_size):
+        """
+        Yield ``(batch, position)`` where ``position`` is where reading resumes
+        once the batch is committed. Both formats resume from a byte offset;
+        CSV reads its header first, then seeks past the records already
+        imported.
+        """
+        number = state['records']
+        batch = []
+        if fmt == 'jsonl':
+            with open(path, 'rb') as f:
+                f.seek(state['offset'])
+                for line in iter(f.readline, b''):
+                    if not line.strip():
+                        continue
+                    number += 1
+                    batch.append((number, line))
+                    if len(batch) == batch_size:
+                        yield batch, (number, f.tell())
+                        batch = []
+                if batch:
+                    yield batch, (number, f.tell())
+        else:
+            with open(path, 'rb') as f:
+                offset = 0
+
+                def lines():
+                    # csv pulls exactly the lines of one record at a time, so
+                    # after each row ``offset`` is where the next one starts.
+                    nonlocal offset
+                    for line in iter(f.readline, b''):
+                        offset += len(line)
+                        yield line.decode('utf-8')
+
+                source = lines()
+                fieldnames = next(csv.reader(source), None)
+                if state['offset']:
+                    f.seek(state['offset'])
+                    offset = state['offset']
+                for row in csv.DictReader(source, fieldnames=fieldnames):
+                    number += 1
+                    batch.append((number, row))
+                    if len(batch) == batch_size:
+                        yield batch, (number, offset)
+                        batch = []
+                if batch:
+                    yield batch, (number, offset)
+
+    def commit(self, result, position, state):
+        accepted, rejected = result
+        progress = dict(state)
+        progress['records'], progress['offset'] = position
+        progress['accepted'] += len(accepted)
+        progress['rejected'] += len(rejected)
+        # The checkpoint commits with the batch, so a crash either keeps both
+        # or neither and a resumed import never inserts a batch twice.
+        with transaction.atomic():
+            books = BookSerializer(many=True).create([book for book, _ in accepted])
+            self.create_chapters(books, [chapters for _, chapters in accepted])
+            ImportCheckpoint.objects.update_or_create(source=self.source, defaults=progress)
+
+        for number, errors in rejected:
+            self.stderr.write(f'Record {number} rejected: {errors}')
+        state.update(progress)
+        if self.verbosity >= 2:
+            self.stdout.write(f"{state['records']} records processed")
+
+    def create_chapters(self, books, chapters_per_book):
+        publishers = resolve_names(Publisher, (
+            chapter['publisher'] for chapters in chapters_per_book for chapter in chapters
+        ))
+        new_chapters = []
+        for book, chapters in zip(books, chapters_per_book):
+            numbers = {}
+            for chapter in chapters:
+                publisher = publishers[chapter['publisher']]
+                numbers[publisher.pk] = numbers.get(publisher.pk, 0) + 1
+                new_chapters.append(Chapter(
+                    book=book, publisher=publisher, chapter_number=numbers[publisher.pk],
+                    title=chapter['title'], content=chapter['content'],
+                ))
+        bulk_create_chapters(new_chapters)
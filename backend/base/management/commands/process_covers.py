@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from base.covers import cover_workers, process_covers
+from base.models import Book
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail and WebP variants for existing book covers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Processes rendering variants; 0 renders inline. Defaults to COVER_WORKERS.')
+        parser.add_argument('--batch-size', type=int, default=200, help='Books handed to the pool at a time.')
+        parser.add_argument('--force', action='store_true',
+                            help='Regenerate variants and reprocess books that already have them.')
+
+    def handle(self, *args, **options):
+        workers = cover_workers() if options['workers'] is None else options['workers']
+        books = Book.objects.exclude(book_cover='')
+        if not options['force']:
+            books = books.filter(cover_hash='')
+
+        processed, batch = 0, []
+        for entry in books.order_by('id').values_list('id', 'book_cover').iterator(chunk_size=options['batch_size']):
+            batch.append(entry)
+            if len(batch) == options['batch_size']:
+                processed += process_covers(batch, workers=workers, force=options['force'])
+                batch = []
+        if batch:
+            processed += process_covers(batch, workers=workers, force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Processed covers for {processed} books'))
@@ -0,0 +1,21 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from base import trending
+from base.activity import activity_buffer
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trending rollups from the UserBehavior log, e.g. after first deploying them.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help='Days of events to replay.')
+
+    def handle(self, *args, **options):
+        activity_buffer.flush()
+        with transaction.atomic():
+            count = trending.rebuild(timezone.now() - timedelta(days=options['days']))
+        self.stdout.write(self.style.SUCCESS(f'Replayed {count} events into the trending rollups'))
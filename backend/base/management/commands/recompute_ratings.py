@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from base.activity import activity_buffer, recompute_ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute book ratings from the rate events in the UserBehavior log. Meant to run periodically.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Books updated per bulk_update.')
+
+    def handle(self, *args, **options):
+        activity_buffer.flush()
+        updated = recompute_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated ratings for {updated} books'))
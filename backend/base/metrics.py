@@ -0,0 +1,160 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# Per-process request metrics, rendered in the Prometheus text format.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class RequestStats:
+    """
+    What one request spent, filled in by the query wrapper and ``timed``.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - start
+
+
+current_request = ContextVar('current_request', default=None)
+
+
+def count_query(execute, sql, params, many, context):
+    """
+    Query wrapper installed on every connection. It charges the query to the
+    request in ``current_request``, which asgiref copies into the threads
+    that run sync views and ORM calls under ASGI, so both servers are
+    measured the same way.
+    """
+    stats = current_request.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_counter(sender, connection, **kwargs):
+    # Reconnecting reuses the wrapper object, which keeps its wrappers.
+    if count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_query)
+
+
+@contextmanager
+def timed(kind='serializer'):
+    """
+    Add the time spent in the block to the current request's ``kind`` total.
+    A no-op outside an instrumented request.
+    """
+    stats = current_request.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(stats, f'{kind}_time', getattr(stats, f'{kind}_time') + time.perf_counter() - start)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.responses = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.query_time = 0.0
+        self.serializer_time = 0.0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, method, status, latency, size=None, stats=None):
+        with self._lock:
+            metrics = self._endpoints.setdefault(endpoint, EndpointMetrics())
+            key = (method, status)
+            metrics.responses[key] = metrics.responses.get(key, 0) + 1
+            metrics.latency.observe(latency)
+            if size is not None:
+                metrics.size.observe(size)
+            if stats is not None:
+                metrics.queries.observe(stats.queries)
+                metrics.query_time += stats.query_time
+                metrics.serializer_time += stats.serializer_time
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        families = {
+            'http_requests_total': ('counter', 'Responses by endpoint, method and status.', []),
+            'http_request_duration_seconds': ('histogram', 'Time to produce a response.', []),
+            'http_request_db_queries': ('histogram', 'SQL queries per request.', []),
+            'http_request_db_seconds_total': ('counter', 'Time spent executing SQL.', []),
+            'http_request_serializer_seconds_total': ('counter', 'Time spent serializing and encoding responses.', []),
+            'http_response_size_bytes': ('histogram', 'Response body size.', []),
+        }
+        with self._lock:
+            for endpoint, metrics in sorted(self._endpoints.items()):
+                labels = f'endpoint="{endpoint}"'
+                for (method, status), count in sorted(metrics.responses.items()):
+                    families['http_requests_total'][2].append(
+                        f'http_requests_total{{{labels},method="{method}",status="{status}"}} {count}'
+                    )
+                families['http_request_duration_seconds'][2].extend(metrics.latency.lines('http_request_duration_seconds', labels))
+                families['http_request_db_queries'][2].extend(metrics.queries.lines('http_request_db_queries', labels))
+                families['http_request_db_seconds_total'][2].append(f'http_request_db_seconds_total{{{labels}}} {metrics.query_time}')
+                families['http_request_serializer_seconds_total'][2].append(
+                    f'http_request_serializer_seconds_total{{{labels}}} {metrics.serializer_time}'
+                )
+                families['http_response_size_bytes'][2].extend(metrics.size.lines('http_response_size_bytes', labels))
+
+        lines = []
+        for name, (kind, help_text, samples) in families.items():
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', *samples]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
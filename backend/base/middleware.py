@@ -0,0 +1,102 @@
+import cProfile
+import hmac
+import logging
+import os
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .metrics import RequestStats, current_request, registry
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name or 'unnamed'
+
+
+def response_size(response):
+    # Streaming bodies are not buffered just to measure them.
+    return None if response.streaming else len(response.content)
+
+
+class MetricsMiddleware:
+    """
+    Record latency, SQL query count and time, serializer time and response
+    size for every request, keyed by URL name. See base/metrics.py.
+
+    Under WSGI, requests are also profiled with cProfile when they carry
+    ``X-Profile`` set to ``METRICS_PROFILE_TOKEN``, or at random with
+    probability ``METRICS_PROFILE_SAMPLE_RATE``. Profiles are written to
+    ``METRICS_PROFILE_DIR`` and named in the ``X-Profile-File`` header.
+
+    Queries are counted by ``base.metrics.count_query``, which every
+    connection carries, so this works the same under WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = current_request.set(stats)
+        profiler = cProfile.Profile() if self.should_profile(request) else None
+        start = time.perf_counter()
+        try:
+            if profiler is not None:
+                response = profiler.runcall(self.get_response, request)
+            else:
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        latency = time.perf_counter() - start
+        registry.record(endpoint_name(request), request.method, response.status_code, latency, response_size(response), stats)
+        if profiler is not None:
+            self.save_profile(request, response, profiler)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_request.reset(token)
+        latency = time.perf_counter() - start
+        registry.record(endpoint_name(request), request.method, response.status_code, latency, response_size(response), stats)
+        return response
+
+    def should_profile(self, request):
+        token = getattr(settings, 'METRICS_PROFILE_TOKEN', None)
+        header = request.headers.get(PROFILE_HEADER)
+        if token and header and hmac.compare_digest(header, token):
+            return True
+        rate = getattr(settings, 'METRICS_PROFILE_SAMPLE_RATE', 0)
+        return rate > 0 and random.random() < rate
+
+    def save_profile(self, request, response, profiler):
+        directory = getattr(settings, 'METRICS_PROFILE_DIR', None)
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{endpoint_name(request)}-{time.time_ns()}.prof')
+        try:
+            profiler.dump_stats(path)
+        except OSError:
+            logger.exception('Could not write profile to %s', path)
+            return
+        response['X-Profile-File'] = os.path.basename(path)
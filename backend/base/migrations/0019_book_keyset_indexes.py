@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0018_user_bookpublisher_chapter_savedbook_history_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['rating', 'id'], name='book_rating_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['views', 'id'], name='book_views_id_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:33
+
+import zlib
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The block format as of this migration; base/chapters.py may change later.
+BLOCK_SIZE = 4096
+COMPRESSION_LEVEL = 6
+
+
+def compress_blocks(text):
+    return [
+        zlib.compress(text[offset:offset + BLOCK_SIZE].encode('utf-8'), COMPRESSION_LEVEL)
+        for offset in range(0, len(text), BLOCK_SIZE)
+    ]
+
+
+def number_and_compress_chapters(apps, schema_editor):
+    Chapter = apps.get_model('base', 'Chapter')
+    ChapterBlock = apps.get_model('base', 'ChapterBlock')
+    numbers = {}
+    for chapter in Chapter.objects.order_by('id').iterator():
+        key = (chapter.book_id, chapter.publisher_id)
+        numbers[key] = numbers.get(key, 0) + 1
+        chapter.chapter_number = numbers[key]
+        chapter.content_length = len(chapter.content)
+        chapter.save(update_fields=['chapter_number', 'content_length'])
+        ChapterBlock.objects.bulk_create(
+            ChapterBlock(chapter=chapter, position=position, data=data)
+            for position, data in enumerate(compress_blocks(chapter.content))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0019_book_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChapterBlock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AlterModelOptions(
+            name='chapter',
+            options={'ordering': ['book', 'publisher', 'chapter_number']},
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='chapter_number',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='content_length',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='chapterblock',
+            name='chapter',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocks', to='base.chapter'),
+        ),
+        migrations.RunPython(number_and_compress_chapters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='chapter',
+            constraint=models.UniqueConstraint(fields=('book', 'publisher', 'chapter_number'), name='unique_chapter_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='chapterblock',
+            constraint=models.UniqueConstraint(fields=('chapter', 'position'), name='unique_chapter_block'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:34
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def hash_chapters(apps, schema_editor):
+    Chapter = apps.get_model('base', 'Chapter')
+    for chapter in Chapter.objects.iterator():
+        chapter.content_hash = hashlib.sha1(chapter.content.encode('utf-8')).hexdigest()
+        chapter.save(update_fields=['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0020_chapter_blocks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.RunPython(hash_chapters, migrations.RunPython.noop),
+    ]
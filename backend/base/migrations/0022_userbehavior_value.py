@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_chapter_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbehavior',
+            name='value',
+            field=models.SmallIntegerField(blank=True, null=True),
+        ),
+    ]
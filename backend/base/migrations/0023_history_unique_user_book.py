@@ -0,0 +1,25 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:38
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_history(apps, schema_editor):
+    History = apps.get_model('base', 'History')
+    latest = History.objects.values('user', 'book').annotate(last_id=Max('id')).values('last_id')
+    History.objects.exclude(id__in=latest).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0022_userbehavior_value'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_history, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='history',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='unique_history_user_book'),
+        ),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:42
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+
+# (model, [(referencing model, foreign key)]) for each name column made unique.
+NAMED_MODELS = [
+    ('Author', [('Book', 'author'), ('FavoriteAuthor', 'author')]),
+    ('Genre', [('Book', 'genre')]),
+    ('Publisher', [('BookPublisher', 'publisher'), ('Chapter', 'publisher')]),
+]
+USER_LINKS = [('FavoriteBook', 'book'), ('FavoriteAuthor', 'author'), ('SavedBook', 'book')]
+
+
+def merge_duplicate_names(apps, schema_editor):
+    Chapter = apps.get_model('base', 'Chapter')
+    for model_name, references in NAMED_MODELS:
+        model = apps.get_model('base', model_name)
+        duplicates = model.objects.values('name').annotate(keep=Min('id'), total=Count('id')).filter(total__gt=1)
+        for duplicate in duplicates:
+            keep = duplicate['keep']
+            others = list(model.objects.filter(name=duplicate['name']).exclude(id=keep).values_list('id', flat=True))
+            for ref_model_name, field in references:
+                if ref_model_name == 'Chapter':
+                    # Chapter numbers are unique per (book, publisher); append
+                    # merged chapters after the surviving publisher's last one.
+                    for chapter in Chapter.objects.filter(publisher_id__in=others).order_by('chapter_number', 'id'):
+                        last = Chapter.objects.filter(book_id=chapter.book_id, publisher_id=keep).aggregate(last=Max('chapter_number'))['last']
+                        chapter.publisher_id = keep
+                        chapter.chapter_number = (last or 0) + 1
+                        chapter.save(update_fields=['publisher', 'chapter_number'])
+                    continue
+                ref_model = apps.get_model('base', ref_model_name)
+                ref_model.objects.filter(**{f'{field}_id__in': others}).update(**{f'{field}_id': keep})
+            model.objects.filter(id__in=others).delete()
+
+
+def drop_duplicate_user_links(apps, schema_editor):
+    for model_name, field in USER_LINKS:
+        model = apps.get_model('base', model_name)
+        first = model.objects.values('user', field).annotate(first_id=Min('id')).values('first_id')
+        model.objects.exclude(id__in=first).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0023_history_unique_user_book'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+        migrations.RunPython(drop_duplicate_user_links, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='author',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='genre',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='publisher',
+            name='name',
+            field=models.CharField(max_length=255, unique=True),
+        ),
+        migrations.AddConstraint(
+            model_name='favoriteauthor',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_favoriteauthor_user_author'),
+        ),
+        migrations.AddConstraint(
+            model_name='favoritebook',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='unique_favoritebook_user_book'),
+        ),
+        migrations.AddConstraint(
+            model_name='savedbook',
+            constraint=models.UniqueConstraint(fields=('user', 'book'), name='unique_savedbook_user_book'),
+        ),
+    ]
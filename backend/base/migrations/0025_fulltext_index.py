@@ -0,0 +1,60 @@
+from django.db import migrations
+
+# External-content FTS5 tables over book synopses and chapter text, kept in
+# sync by triggers. Updates only reindex when an indexed column changes.
+# The SQL is frozen here; base/fulltext.py recreates missing triggers after
+# every migrate.
+
+# (index, content table, body column) for each index.
+INDEXES = [
+    ('base_book_fts', 'base_book', 'synopsis'),
+    ('base_chapter_fts', 'base_chapter', 'content'),
+]
+
+
+def trigger_sql(fts, table, body):
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {fts}(rowid, title, {body}) VALUES (new.id, new.title, new.{body});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title, {body}) VALUES ('delete', old.id, old.title, old.{body});
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF title, {body} ON {table} BEGIN
+            INSERT INTO {fts}({fts}, rowid, title, {body}) VALUES ('delete', old.id, old.title, old.{body});
+            INSERT INTO {fts}(rowid, title, {body}) VALUES (new.id, new.title, new.{body});
+        END""",
+    ]
+
+
+def forward_sql(fts, table, body):
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5(title, {body}, content='{table}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        *trigger_sql(fts, table, body),
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def backward_sql(fts, table, body):
+    return [f'DROP TRIGGER IF EXISTS {fts}_{suffix}' for suffix in ('ai', 'ad', 'au')] + [f'DROP TABLE IF EXISTS {fts}']
+
+
+def run(build):
+    def apply(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for index in INDEXES:
+            for statement in build(*index):
+                schema_editor.execute(statement)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0024_unique_names_and_user_links'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(forward_sql), run(backward_sql)),
+    ]
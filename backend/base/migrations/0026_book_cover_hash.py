@@ -0,0 +1,40 @@
+# Generated by Django 5.0.1 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+# The base_book_fts triggers as created by 0025_fulltext_index.
+BOOK_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS base_book_fts_ai AFTER INSERT ON base_book BEGIN
+        INSERT INTO base_book_fts(rowid, title, synopsis) VALUES (new.id, new.title, new.synopsis);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS base_book_fts_ad AFTER DELETE ON base_book BEGIN
+        INSERT INTO base_book_fts(base_book_fts, rowid, title, synopsis) VALUES ('delete', old.id, old.title, old.synopsis);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS base_book_fts_au AFTER UPDATE OF title, synopsis ON base_book BEGIN
+        INSERT INTO base_book_fts(base_book_fts, rowid, title, synopsis) VALUES ('delete', old.id, old.title, old.synopsis);
+        INSERT INTO base_book_fts(rowid, title, synopsis) VALUES (new.id, new.title, new.synopsis);
+    END""",
+]
+
+def restore_fulltext_triggers(apps, schema_editor):
+    # Adding the column rebuilds base_book on SQLite, which drops its triggers.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in BOOK_TRIGGERS:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0025_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='cover_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+        migrations.RunPython(restore_fulltext_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0026_book_cover_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HourlyBookActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('activity', models.FloatField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.book')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.genre')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyBookActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('activity', models.FloatField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.book')),
+                ('genre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.genre')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['bucket'], name='daily_activity_bucket_idx'), models.Index(fields=['genre', 'bucket'], name='daily_activity_genre_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailybookactivity',
+            constraint=models.UniqueConstraint(fields=('book', 'bucket'), name='unique_daily_book_activity'),
+        ),
+        migrations.AddIndex(
+            model_name='hourlybookactivity',
+            index=models.Index(fields=['bucket'], name='hourly_activity_bucket_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='hourlybookactivity',
+            index=models.Index(fields=['genre', 'bucket'], name='hourly_activity_genre_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='hourlybookactivity',
+            constraint=models.UniqueConstraint(fields=('book', 'bucket'), name='unique_hourly_book_activity'),
+        ),
+    ]
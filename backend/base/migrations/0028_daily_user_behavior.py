@@ -0,0 +1,30 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0027_trending_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserBehavior',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action_type', models.CharField(max_length=255)),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('value_sum', models.IntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.book')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='base.user')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailyuserbehavior',
+            constraint=models.UniqueConstraint(fields=('user', 'book', 'action_type', 'day'), name='unique_daily_user_behavior'),
+        ),
+    ]
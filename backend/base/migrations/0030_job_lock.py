@@ -0,0 +1,22 @@
+# Generated by Django 5.0.1 on 2026-10-18 12:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0029_import_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('holder', models.CharField(max_length=32)),
+                ('expires', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,19 +1,19 @@
 from django.db import models
 
 class Author(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
         return self.name
     
 class Genre(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
         return self.name
 
 class Publisher(models.Model):
-    name = models.CharField(max_length=255)
+    name = models.CharField(max_length=255, unique=True)
 
     def __str__(self):
         return self.name
@@ -24,9 +24,16 @@ class Book(models.Model):
     synopsis = models.TextField()
     genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
     book_cover = models.ImageField(upload_to='book_covers/')
+    cover_hash = models.CharField(max_length=40, blank=True, editable=False)
     rating = models.DecimalField(max_digits=3, decimal_places=2)
     views = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['rating', 'id'], name='book_rating_id_idx'),
+            models.Index(fields=['views', 'id'], name='book_views_id_idx'),
+        ]
+
     def __str__(self):
         return self.title
     
@@ -42,11 +49,33 @@ class BookPublisher(models.Model):
 class Chapter(models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     publisher = models.ForeignKey(Publisher, on_delete=models.CASCADE)
+    chapter_number = models.PositiveIntegerField(default=0)
     title = models.CharField(max_length=255)
     content = models.TextField()
+    content_length = models.PositiveIntegerField(default=0, editable=False)
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+
+    class Meta:
+        ordering = ['book', 'publisher', 'chapter_number']
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'publisher', 'chapter_number'], name='unique_chapter_number'),
+        ]
 
     def __str__(self):
         return self.title
+
+class ChapterBlock(models.Model):
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, related_name='blocks')
+    position = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['chapter', 'position'], name='unique_chapter_block'),
+        ]
+
+    def __str__(self):
+        return f"{self.chapter.title} [{self.position}]"
     
 class User(models.Model):
     firstname = models.CharField(max_length=255)
@@ -60,6 +89,11 @@ class FavoriteBook(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='unique_favoritebook_user_book'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.book.title}"
 
@@ -67,6 +101,11 @@ class FavoriteAuthor(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'], name='unique_favoriteauthor_user_author'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.author.name}"
 
@@ -74,6 +113,11 @@ class SavedBook(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='unique_savedbook_user_book'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.book.title}"
     
@@ -83,6 +127,11 @@ class History(models.Model):
     last_chapter_read = models.ForeignKey(Chapter, on_delete=models.CASCADE)
     last_read_date = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book'], name='unique_history_user_book'),
+        ]
+
     def __str__(self):
         return f"{self.user} - {self.book.title} (Last read: {self.last_read_date})"
 
@@ -90,7 +139,95 @@ class UserBehavior(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     book = models.ForeignKey(Book, on_delete=models.CASCADE)
     action_type = models.CharField(max_length=255)
+    value = models.SmallIntegerField(null=True, blank=True)
     action_date = models.DateTimeField(auto_now=True)
 
     def __str__(self):
-        return f"{self.user} - {self.book.title} ({self.action_type})"
\ No newline at end of file
+        return f"{self.user} - {self.book.title} ({self.action_type})"
+
+
+class BookActivity(models.Model):
+    """
+    Activity on a book within one time bucket, maintained incrementally by
+    the activity buffer (see base/trending.py). ``activity`` is the weighted
+    sum of views and other behaviors. The book's genre is copied in so
+    per-genre leaderboards read only this table.
+    """
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    genre = models.ForeignKey(Genre, on_delete=models.CASCADE)
+    bucket = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+    activity = models.FloatField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"{self.book_id} @ {self.bucket}: {self.activity}"
+
+class HourlyBookActivity(BookActivity):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'bucket'], name='unique_hourly_book_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='hourly_activity_bucket_idx'),
+            models.Index(fields=['genre', 'bucket'], name='hourly_activity_genre_idx'),
+        ]
+
+class DailyBookActivity(BookActivity):
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'bucket'], name='unique_daily_book_activity'),
+        ]
+        indexes = [
+            models.Index(fields=['bucket'], name='daily_activity_bucket_idx'),
+            models.Index(fields=['genre', 'bucket'], name='daily_activity_genre_idx'),
+        ]
+
+class DailyUserBehavior(models.Model):
+    """
+    UserBehavior events older than the retention window, folded into one
+    row per user, book, action and day (see base/retention.py).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    action_type = models.CharField(max_length=255)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+    value_sum = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'book', 'action_type', 'day'], name='unique_daily_user_behavior'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.book_id} ({self.action_type} x{self.count} on {self.day})"
+
+class ImportCheckpoint(models.Model):
+    """
+    How far ``import_catalog`` got through ``source``. Saved in the same
+    transaction as each batch, so it never disagrees with the catalog.
+    """
+    source = models.CharField(max_length=1024, unique=True)
+    records = models.PositiveIntegerField(default=0)
+    offset = models.PositiveBigIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    updated = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.source}: {self.records} records"
+
+class JobLock(models.Model):
+    """
+    A named lock shared by every process using the database (see
+    base/db.py). A holder that dies keeps it only until ``expires``.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    holder = models.CharField(max_length=32)
+    expires = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.name} until {self.expires}"
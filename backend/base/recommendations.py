@@ -0,0 +1,267 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+import threading
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Cast, Coalesce, Greatest
+from .models import DailyUserBehavior, FavoriteBook, SavedBook, History, UserBehavior
+
+# How strongly each kind of interaction ties a user to a book. Rate events
+# are weighted by their score instead (see rating_weight).
+SOURCE_WEIGHTS = {'favorite': 5.0, 'save': 3.0, 'history': 2.0}
+ACTION_WEIGHTS = {'view': 1.0, 'read': 2.0, 'save': 3.0, 'favorite': 5.0}
+
+ARRAYS = ['book_ids', 'neighbors', 'neighbor_scores', 'user_ids', 'user_recs', 'user_scores']
+
+
+def rating_weight(score):
+    return Greatest(score - Value(2.0), Value(0.0))
+
+
+def action_weight(action_type, rating, count=Value(1.0)):
+    """
+    The weight of ``count`` events of ``action_type`` as a database
+    expression; ``rating`` is the score of a rate event.
+    """
+    return Case(
+        When(**{action_type: 'rate'}, then=rating_weight(rating) * count),
+        *[When(**{action_type: action}, then=Value(weight) * count) for action, weight in ACTION_WEIGHTS.items()],
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+
+
+def weighted(queryset, weight):
+    """
+    ``(user_ids, book_ids, weights)`` arrays for the rows of ``queryset``
+    with a positive ``weight``. Each column is streamed from its own query
+    straight into a preallocated array.
+    """
+    queryset = queryset.annotate(weight=weight).filter(weight__gt=0).order_by('id')
+    count = queryset.count()
+    return tuple(
+        np.fromiter(queryset.values_list(column, flat=True).iterator(chunk_size=10000), dtype=dtype, count=count)
+        for column, dtype in (('user_id', np.int64), ('book_id', np.int64), ('weight', np.float64))
+    )
+
+
+def interactions():
+    """
+    ``(user_ids, book_ids, weights)`` arrays covering every recorded
+    interaction, weighted by the database.
+    """
+    # One transaction, so every column query reads the same snapshot.
+    with transaction.atomic():
+        columns = [
+            weighted(model.objects.all(), Value(SOURCE_WEIGHTS[source], output_field=FloatField()))
+            for source, model in (('favorite', FavoriteBook), ('save', SavedBook), ('history', History))
+        ]
+        columns.append(weighted(UserBehavior.objects.all(), action_weight(
+            'action_type', Cast(Coalesce('value', 0), FloatField()),
+        )))
+        # Events past the retention window survive as daily counts.
+        columns.append(weighted(DailyUserBehavior.objects.all(), action_weight(
+            'action_type', Cast('value_sum', FloatField()) / F('count'), Cast('count', FloatField()),
+        )))
+    return tuple(np.concatenate(column) for column in zip(*columns))
+
+
+class SparseMatrix:
+    """
+    Minimal compressed-row matrix over NumPy arrays: ``indices[indptr[r]:indptr[r + 1]]``
+    holds the columns of row ``r`` and ``data`` the matching values.
+    """
+
+    def __init__(self, rows, cols, data, shape):
+        order = np.lexsort((cols, rows))
+        rows, self.indices, self.data = rows[order], cols[order], data[order]
+        self.indptr = np.searchsorted(rows, np.arange(shape[0] + 1))
+        self.shape = shape
+
+    def row(self, r):
+        start, end = self.indptr[r], self.indptr[r + 1]
+        return self.indices[start:end], self.data[start:end]
+
+
+def interaction_matrix(interactions):
+    """
+    Collapse ``(user_ids, book_ids, weights)`` arrays into a user x book
+    matrix. Repeated interactions add up, damped with ``log1p``.
+    """
+    user_column, book_column, weight_column = interactions
+    user_ids, users = np.unique(user_column, return_inverse=True)
+    book_ids, books = np.unique(book_column, return_inverse=True)
+
+    pairs = users.astype(np.int64) * len(book_ids) + books
+    pairs, inverse = np.unique(pairs, return_inverse=True)
+    weights = np.log1p(np.bincount(inverse, weights=weight_column))
+    users, books = pairs // max(len(book_ids), 1), pairs % max(len(book_ids), 1)
+
+    shape = (len(user_ids), len(book_ids))
+    return user_ids, book_ids, SparseMatrix(users, books, weights, shape), SparseMatrix(books, users, weights, shape[::-1])
+
+
+def top_n(candidates, scores, n):
+    if len(candidates) > n:
+        keep = np.argpartition(-scores, n - 1)[:n]
+        candidates, scores = candidates[keep], scores[keep]
+    order = np.argsort(-scores, kind='stable')
+    return candidates[order], scores[order]
+
+
+def padded(rows, n, fill, dtype):
+    array = np.full((len(rows), n), fill, dtype=dtype)
+    for i, row in enumerate(rows):
+        array[i, :len(row)] = row
+    return array
+
+
+def to_book_ids(rows, n, book_ids):
+    """
+    Translate rows of matrix column positions into book ids, padding with -1.
+    """
+    positions = padded(rows, n, -1, np.int64)
+    return np.where(positions >= 0, book_ids[positions], -1)
+
+
+def build_index(path, neighbors=20, recommendations=20, max_user_items=500):
+    """
+    Compute item-item cosine neighbors and per-user recommendations and write
+    them as ``.npy`` arrays under ``path``. Returns ``(books, users)`` counts.
+    """
+    user_ids, book_ids, by_user, by_book = interaction_matrix(interactions())
+    norms = np.zeros(len(book_ids))
+    np.add.at(norms, by_user.indices, by_user.data ** 2)
+    norms = np.sqrt(norms)
+
+    neighbor_rows, neighbor_score_rows = [], []
+    for book in range(len(book_ids)):
+        users, user_weights = by_book.row(book)
+        items, item_weights = [], []
+        for user, weight in zip(users, user_weights):
+            user_items, user_item_weights = by_user.row(user)
+            # Very active users link everything to everything; cap their fan-out.
+            items.append(user_items[:max_user_items])
+            item_weights.append(user_item_weights[:max_user_items] * weight)
+        items, inverse = np.unique(np.concatenate(items), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(item_weights)) / (norms[book] * norms[items])
+        others = items != book
+        best, best_scores = top_n(items[others], scores[others], neighbors)
+        neighbor_rows.append(best)
+        neighbor_score_rows.append(best_scores)
+
+    rec_rows, rec_score_rows = [], []
+    for user in range(len(user_ids)):
+        seen, weights = by_user.row(user)
+        candidates = np.concatenate([neighbor_rows[book] for book in seen])
+        contributions = np.concatenate([neighbor_score_rows[book] * w for book, w in zip(seen, weights)])
+        unseen = ~np.isin(candidates, seen)
+        candidates, inverse = np.unique(candidates[unseen], return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions[unseen]) if len(candidates) else np.zeros(0)
+        best, best_scores = top_n(candidates, scores, recommendations)
+        rec_rows.append(best)
+        rec_score_rows.append(best_scores)
+
+    arrays = {
+        'book_ids': book_ids,
+        'neighbors': to_book_ids(neighbor_rows, neighbors, book_ids),
+        'neighbor_scores': padded(neighbor_score_rows, neighbors, 0, np.float32),
+        'user_ids': user_ids,
+        'user_recs': to_book_ids(rec_rows, recommendations, book_ids),
+        'user_scores': padded(rec_score_rows, recommendations, 0, np.float32),
+    }
+    write_index(path, arrays)
+    return len(book_ids), len(user_ids)
+
+
+def write_index(path, arrays):
+    """
+    Write the arrays to a new ``<path>.<suffix>`` directory and point the
+    ``path`` symlink at it with a single ``os.replace``, so a serving process
+    always finds a complete index, old or new. The version being replaced
+    is kept for readers that resolved it a moment ago; older ones are
+    deleted.
+    """
+    path = os.path.abspath(str(path))
+    parent, name = os.path.split(path)
+    os.makedirs(parent, exist_ok=True)
+    version = tempfile.mkdtemp(prefix=f'{name}.', dir=parent)
+    os.chmod(version, 0o755)
+    for array in ARRAYS:
+        np.save(os.path.join(version, f'{array}.npy'), arrays[array])
+    with open(os.path.join(version, 'manifest.json'), 'w') as f:
+        json.dump({array: list(arrays[array].shape) for array in ARRAYS}, f)
+
+    if os.path.isdir(path) and not os.path.islink(path):
+        # An index written before versions were symlinked is moved aside
+        # once; it is deleted with the other old versions on the next build.
+        os.replace(path, f'{version}.legacy')
+    previous = os.path.realpath(path)
+    link = f'{version}.link'
+    os.symlink(os.path.basename(version), link)
+    os.replace(link, path)
+
+    for old in glob.glob(f'{glob.escape(path)}.*'):
+        if old not in (version, previous) and not os.path.islink(old):
+            shutil.rmtree(old, ignore_errors=True)
+
+
+class RecommendationIndex:
+    """
+    Serves precomputed neighbors from memory-mapped arrays. Lookups are a
+    binary search over the sorted id arrays followed by a row slice.
+    """
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        self._arrays = None
+        self._version = None
+
+    @property
+    def path(self):
+        return str(self._path or settings.RECOMMENDATIONS_PATH)
+
+    def _load(self):
+        # Each build publishes a new directory, so its resolved path is the
+        # version. Arrays are always read from the directory just resolved.
+        version = os.path.realpath(self.path)
+        if version != self._version:
+            with self._lock:
+                if version != self._version:
+                    if not os.path.exists(os.path.join(version, 'manifest.json')):
+                        return None
+                    self._arrays = {
+                        name: np.load(os.path.join(version, f'{name}.npy'), mmap_mode='r') for name in ARRAYS
+                    }
+                    self._version = version
+        return self._arrays
+
+    @property
+    def available(self):
+        return self._load() is not None
+
+    def _lookup(self, ids_name, rows_name, scores_name, key, limit):
+        arrays = self._load()
+        if arrays is None:
+            return []
+        ids = arrays[ids_name]
+        position = np.searchsorted(ids, key)
+        if position >= len(ids) or ids[position] != key:
+            return []
+        rows, scores = arrays[rows_name][position], arrays[scores_name][position]
+        return [(int(book_id), float(score)) for book_id, score in zip(rows[:limit], scores[:limit]) if book_id >= 0]
+
+    def similar(self, book_id, limit=10):
+        return self._lookup('book_ids', 'neighbors', 'neighbor_scores', book_id, limit)
+
+    def for_user(self, user_id, limit=10):
+        return self._lookup('user_ids', 'user_recs', 'user_scores', user_id, limit)
+
+
+recommendation_index = RecommendationIndex()
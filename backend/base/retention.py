@@ -0,0 +1,228 @@
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from .activity import RATE, activity_buffer, history_buffer
+from .db import acquire_lock, database_bytes, release_lock
+from .trending import upsert_add
+from .models import DailyUserBehavior, History, HourlyBookActivity, UserBehavior
+
+logger = logging.getLogger(__name__)
+
+# Raw UserBehavior events older than RETENTION_DAYS are folded into
+# DailyUserBehavior and deleted; History entries not touched for
+# HISTORY_RETENTION_DAYS are deleted. Work is done in batches of
+# RETENTION_BATCH_SIZE rows, each in its own short transaction, so writers
+# are never locked out for long, and each batch deletes exactly the ids it
+# read. With RETENTION_ARCHIVE_DIR set, deleted rows are first appended to
+# gzipped JSONL files there.
+LOCK_NAME = 'retention'
+
+# Hourly trending rollups only feed the one-day window.
+HOURLY_ROLLUP_RETENTION = timedelta(days=2)
+
+BEHAVIOR_FIELDS = ('id', 'user_id', 'book_id', 'action_type', 'value', 'action_date')
+HISTORY_FIELDS = ('id', 'user_id', 'book_id', 'last_chapter_read_id', 'last_read_date')
+
+
+def retention_days():
+    return getattr(settings, 'RETENTION_DAYS', 90)
+
+
+def history_retention_days():
+    return getattr(settings, 'HISTORY_RETENTION_DAYS', None)
+
+
+def batch_size():
+    return getattr(settings, 'RETENTION_BATCH_SIZE', 2000)
+
+
+def archive_dir():
+    return getattr(settings, 'RETENTION_ARCHIVE_DIR', None)
+
+
+class Archive:
+    """
+    Appends rows as JSON lines to ``<directory>/<name>-<timestamp>.jsonl.gz``,
+    creating the file on the first write.
+    """
+
+    def __init__(self, directory, name, fields):
+        self.directory = directory
+        self.name = name
+        self.fields = fields
+        self.path = None
+        self._file = None
+
+    def write(self, rows):
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            stamp = timezone.now().strftime('%Y%m%dT%H%M%S')
+            self.path = os.path.join(self.directory, f'{self.name}-{stamp}.jsonl.gz')
+            self._file = gzip.open(self.path, 'at', encoding='utf-8')
+        for row in rows:
+            self._file.write(json.dumps(dict(zip(self.fields, row)), default=str) + '\n')
+        # Rows are flushed before they are deleted, so a crash can at worst
+        # archive a batch twice, never lose one.
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def next_batch(queryset, fields, size, last_id):
+    """
+    Up to ``size`` rows of ``fields`` after ``last_id`` in id order. Walking
+    the ids as a keyset keeps each batch a short indexed scan.
+    """
+    return list(queryset.filter(id__gt=last_id).order_by('id').values_list(*fields)[:size])
+
+
+def compact_behavior(cutoff, size, archive=None, pause=0):
+    """
+    Fold UserBehavior events older than ``cutoff`` into DailyUserBehavior and
+    delete them. Each user's latest rating of a book is kept raw, since
+    ``recompute_ratings`` reads it. Returns ``(events, daily rows)``.
+    """
+    # The ratings to keep are found once, not once per batch. A rating made
+    # during the run can only supersede one of them, which then waits for
+    # the next run.
+    latest_ratings = UserBehavior.objects.filter(action_type=RATE).values('user', 'book').annotate(
+        last_id=Max('id')
+    ).values('last_id')
+    old = UserBehavior.objects.filter(action_date__lt=cutoff)
+    keep = set(old.filter(id__in=latest_ratings).values_list('id', flat=True))
+    events = last_id = 0
+    days = set()
+    while True:
+        with transaction.atomic():
+            batch = next_batch(old, BEHAVIOR_FIELDS, size, last_id)
+            if not batch:
+                break
+            rows = [row for row in batch if row[0] not in keep]
+            totals = {}
+            for _, user_id, book_id, action_type, value, action_date in rows:
+                entry = totals.setdefault((user_id, book_id, action_type, action_date.date()), [0, 0])
+                entry[0] += 1
+                entry[1] += value or 0
+            upsert_add(
+                DailyUserBehavior, ('user_id', 'book_id', 'action_type', 'day', 'count', 'value_sum'),
+                ('user_id', 'book_id', 'action_type', 'day'), ('count', 'value_sum'),
+                [(*key, count, value_sum) for key, (count, value_sum) in totals.items()],
+            )
+            if archive is not None and rows:
+                archive.write(rows)
+            UserBehavior.objects.filter(id__in=[row[0] for row in rows]).delete()
+        events += len(rows)
+        days.update(totals)
+        last_id = batch[-1][0]
+        if pause:
+            time.sleep(pause)
+    return events, len(days)
+
+
+def prune_history(cutoff, size, archive=None, pause=0):
+    """
+    Delete History entries last read before ``cutoff``. Returns the count.
+    """
+    stale = History.objects.filter(last_read_date__lt=cutoff)
+    deleted = last_id = 0
+    while True:
+        with transaction.atomic():
+            rows = next_batch(stale, HISTORY_FIELDS, size, last_id)
+            if not rows:
+                break
+            if archive is not None:
+                archive.write(rows)
+            History.objects.filter(id__in=[row[0] for row in rows]).delete()
+        deleted += len(rows)
+        last_id = rows[-1][0]
+        if pause:
+            time.sleep(pause)
+    return deleted
+
+
+def run_retention(days=None, history_days=None, size=None, archive_to=None, pause=0, now=None):
+    """
+    Apply the retention policy once. Arguments default to the settings
+    above. Returns a report dict, or None when another run holds the lock.
+    """
+    days = retention_days() if days is None else days
+    history_days = history_retention_days() if history_days is None else history_days
+    size = size or batch_size()
+    archive_to = archive_to or archive_dir()
+    now = now or timezone.now()
+    # Two overlapping runs would both fold the same batch into the summaries.
+    # The lock lives in the database, since every worker that runs the
+    # scheduler shares it but not necessarily a cache.
+    holder = acquire_lock(LOCK_NAME, timeout=3600)
+    if holder is None:
+        return None
+    behavior_archive = history_archive = None
+    if archive_to:
+        behavior_archive = Archive(archive_to, 'user_behavior', BEHAVIOR_FIELDS)
+        history_archive = Archive(archive_to, 'history', HISTORY_FIELDS)
+    try:
+        # Buffered writes land first, so they are subject to the same policy.
+        activity_buffer.flush()
+        history_buffer.flush()
+        size_before = database_bytes()
+        events, summaries = compact_behavior(now - timedelta(days=days), size, behavior_archive, pause)
+        history = 0
+        if history_days:
+            history = prune_history(now - timedelta(days=history_days), size, history_archive, pause)
+        rollups, _ = HourlyBookActivity.objects.filter(bucket__lt=now - HOURLY_ROLLUP_RETENTION).delete()
+        size_after = database_bytes()
+    finally:
+        for archive in (behavior_archive, history_archive):
+            if archive is not None:
+                archive.close()
+        release_lock(LOCK_NAME, holder)
+    return {
+        'events': events,
+        'summaries': summaries,
+        'history': history,
+        'rollups': rollups,
+        'bytes': None if size_before is None else size_before - size_after,
+        'archives': [archive.path for archive in (behavior_archive, history_archive) if archive and archive.path],
+    }
+
+
+# Optional in-process scheduling, for deployments without cron: with
+# RETENTION_INTERVAL set, the server entry points start a daemon thread that
+# runs the policy every RETENTION_INTERVAL seconds. The database lock keeps
+# multiple workers from running it at once.
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _run_periodically(interval):
+    while True:
+        time.sleep(interval)
+        try:
+            report = run_retention()
+            if report is not None:
+                logger.info('Retention: %s', report)
+        except Exception:
+            logger.exception('Retention run failed')
+        finally:
+            close_old_connections()
+
+
+def start_scheduler():
+    global _scheduler
+    interval = getattr(settings, 'RETENTION_INTERVAL', None)
+    if not interval:
+        return
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = threading.Thread(target=_run_periodically, args=(interval,), name='retention', daemon=True)
+            _scheduler.start()
@@ -0,0 +1,286 @@
+import logging
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+from django.db import close_old_connections
+from rapidfuzz import fuzz, process, utils
+
+from .models import Book
+
+logger = logging.getLogger(__name__)
+
+NGRAM_SIZE = 3
+
+# Postings at least this long are turned into arrays when the index is built.
+PREPARED_POSTINGS = 1000
+
+
+def ngrams(text):
+    """
+    Split text into the padded character trigrams used as index keys.
+    """
+    normalized = utils.default_process(text or '')
+    if not normalized:
+        return set()
+    padded = f'  {normalized} '
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+class IndexNotReady(Exception):
+    """
+    Raised by searches made before the index's first build has finished.
+    """
+
+
+class BookSearchIndex:
+    """
+    In-process trigram index over book titles and author names.
+
+    The inverted index narrows the catalog down to a candidate set, which is
+    then scored in one vectorized rapidfuzz call.
+
+    Each worker process keeps its own copy, built on a background thread when
+    the server starts (``start_builder``) and kept current through the
+    signals in ``base.signals``. Those only see writes made by this process:
+    books added by another worker, another server or raw SQL stay invisible
+    to it until the next build, so deployments with several writing
+    processes should set SEARCH_INDEX_REBUILD_INTERVAL to rebuild
+    periodically. A rebuild is assembled off to the side and swapped in, so
+    searches keep using the previous index meanwhile; searches made before
+    the first build lands raise ``IndexNotReady``.
+    """
+
+    def __init__(self, max_candidates=2000, max_postings=50000):
+        self.max_candidates = max_candidates
+        self.max_postings = max_postings
+        self._lock = threading.RLock()
+        self._built = False
+        self._builder = None
+        self._wake = threading.Event()
+        # Changes made while a build runs, replayed onto it before the swap.
+        self._journal = None
+        self._epoch = 0
+        self._clear()
+
+    def _clear(self):
+        self._postings = defaultdict(set)
+        self._entries = {}
+        self._author_books = defaultdict(set)
+        self._author_names = {}
+        # Postings as arrays, made on first use and dropped when they change.
+        self._arrays = {}
+
+    @property
+    def built(self):
+        return self._built
+
+    def build(self):
+        rows = Book.objects.values_list('id', 'title', 'author_id', 'author__name')
+        self.load(rows.iterator(chunk_size=5000))
+
+    def load(self, rows):
+        """
+        Replace the contents with ``(book_id, title, author_id, author_name)``
+        rows. The new index is filled without holding the lock, then the
+        changes made meanwhile are replayed onto it and it is swapped in.
+        """
+        with self._lock:
+            epoch = self._epoch
+            self._journal = []
+        fresh = BookSearchIndex(self.max_candidates, self.max_postings)
+        for row in rows:
+            fresh._add(*row)
+        # Converting a large posting takes milliseconds; do it here rather
+        # than in the first search that needs it.
+        for gram, posting in fresh._postings.items():
+            if len(posting) >= PREPARED_POSTINGS:
+                fresh._array(gram)
+        with self._lock:
+            journal, self._journal = self._journal, None
+            # A reset while loading discards the result.
+            if epoch != self._epoch:
+                return
+            for method, args in journal:
+                getattr(fresh, method)(*args)
+            self._postings, self._entries = fresh._postings, fresh._entries
+            self._author_books, self._author_names = fresh._author_books, fresh._author_names
+            self._arrays = fresh._arrays
+            self._built = True
+
+    def ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def start_build(self, interval=None):
+        """
+        Build on a background thread, or wake the one already running. With
+        ``interval`` seconds, the thread keeps rebuilding that often.
+        """
+        with self._lock:
+            if self._builder is None:
+                self._builder = threading.Thread(
+                    target=self._run, args=(interval,), name='search-index-build', daemon=True
+                )
+                self._builder.start()
+            else:
+                self._wake.set()
+            return self._builder
+
+    def _run(self, interval):
+        while True:
+            self._wake.clear()
+            try:
+                self.build()
+            except Exception:
+                logger.exception('Search index build failed')
+            finally:
+                close_old_connections()
+            with self._lock:
+                if not interval and not self._wake.is_set():
+                    self._builder = None
+                    return
+            self._wake.wait(interval)
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self._built = False
+            self._epoch += 1
+
+    def _record(self, method, *args):
+        if self._journal is not None:
+            self._journal.append((method, args))
+
+    def add(self, book_id, title, author_id, author_name):
+        with self._lock:
+            self._record('add', book_id, title, author_id, author_name)
+            self._remove(book_id)
+            self._add(book_id, title, author_id, author_name)
+
+    def add_many(self, entries):
+        with self._lock:
+            self._record('add_many', entries)
+            for book_id, title, author_id, author_name in entries:
+                self._remove(book_id)
+                self._add(book_id, title, author_id, author_name)
+
+    def remove(self, book_id):
+        with self._lock:
+            self._record('remove', book_id)
+            self._remove(book_id)
+
+    def rename_author(self, author_id, author_name):
+        with self._lock:
+            self._record('rename_author', author_id, author_name)
+            self._rename_author(author_id, author_name)
+
+    def _rename_author(self, author_id, author_name):
+        # Every book goes before any comes back, since removing one
+        # recomputes its grams from the author's current name.
+        books = [(book_id, self._entries[book_id][0]) for book_id in self._author_books.get(author_id, ())]
+        for book_id, _ in books:
+            self._remove(book_id)
+        for book_id, title in books:
+            self._add(book_id, title, author_id, author_name)
+
+    def _grams(self, book_id):
+        title, author_id = self._entries[book_id]
+        return ngrams(title) | ngrams(self._author_names[author_id])
+
+    def _add(self, book_id, title, author_id, author_name):
+        # Texts are kept normalized: that is how they are scored, and a
+        # book's grams are recomputed from them rather than stored per book,
+        # which would cost more memory than the postings themselves.
+        name = utils.default_process(author_name or '')
+        # A book arriving with a new name for a known author renames it, so
+        # the author's other books are regrammed rather than left with
+        # postings for a name nothing can remove any more.
+        if author_id in self._author_books and self._author_names.get(author_id) != name:
+            self._rename_author(author_id, author_name)
+        self._entries[book_id] = (utils.default_process(title or ''), author_id)
+        self._author_names[author_id] = name
+        self._author_books[author_id].add(book_id)
+        for gram in self._grams(book_id):
+            self._postings[gram].add(book_id)
+            self._arrays.pop(gram, None)
+
+    def _remove(self, book_id):
+        if book_id not in self._entries:
+            return
+        grams = self._grams(book_id)
+        _, author_id = self._entries.pop(book_id)
+        for gram in grams:
+            self._arrays.pop(gram, None)
+            postings = self._postings.get(gram)
+            if postings is not None:
+                postings.discard(book_id)
+                if not postings:
+                    del self._postings[gram]
+        author_books = self._author_books.get(author_id)
+        if author_books is not None:
+            author_books.discard(book_id)
+            if not author_books:
+                del self._author_books[author_id]
+                self._author_names.pop(author_id, None)
+
+    def _candidates(self, grams):
+        # Walk the rarest grams first; very common grams only add noise once
+        # the rarer ones have produced candidates.
+        postings = sorted((self._array(gram) for gram in grams if gram in self._postings), key=len)
+        selected = []
+        for posting in postings:
+            if len(posting) > self.max_postings and selected:
+                continue
+            selected.append(posting)
+        if not selected:
+            return []
+
+        book_ids, counts = np.unique(np.concatenate(selected), return_counts=True)
+        if len(book_ids) > self.max_candidates:
+            top = np.argpartition(-counts, self.max_candidates - 1)[:self.max_candidates]
+            book_ids, counts = book_ids[top], counts[top]
+        return book_ids[np.argsort(-counts, kind='stable')].tolist()
+
+    def _array(self, gram):
+        array = self._arrays.get(gram)
+        if array is None:
+            posting = self._postings[gram]
+            array = self._arrays[gram] = np.fromiter(posting, dtype=np.int64, count=len(posting))
+        return array
+
+    def search(self, query, limit=20, threshold=60):
+        """
+        Return up to ``limit`` ``(book_id, similarity)`` pairs, best first.
+        """
+        if not self._built:
+            self.start_build()
+            raise IndexNotReady('The search index is still being built')
+        with self._lock:
+            candidates = [book_id for book_id in self._candidates(ngrams(query)) if book_id in self._entries]
+            entries = [self._entries[book_id] for book_id in candidates]
+            titles = [entry[0] for entry in entries]
+            authors = [self._author_names.get(entry[1], '') for entry in entries]
+
+        if not candidates:
+            return []
+
+        query = [utils.default_process(query)]
+        title_scores = process.cdist(query, titles, scorer=fuzz.token_set_ratio, dtype=np.uint8)[0]
+        author_scores = process.cdist(query, authors, scorer=fuzz.token_set_ratio, dtype=np.uint8)[0]
+        scores = np.maximum(title_scores, author_scores)
+
+        ranked = np.argsort(-scores.astype(np.int16), kind='stable')[:limit]
+        return [(candidates[i], int(scores[i])) for i in ranked if scores[i] >= threshold]
+
+
+book_index = BookSearchIndex()
+
+
+def start_builder():
+    """
+    Build ``book_index`` in the background, and keep rebuilding it every
+    SEARCH_INDEX_REBUILD_INTERVAL seconds when that is set.
+    """
+    book_index.start_build(getattr(settings, 'SEARCH_INDEX_REBUILD_INTERVAL', None))
@@ -0,0 +1,199 @@
+from django.db import transaction
+from django.db.models import IntegerField, Max, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import Signal, receiver
+
+from . import fulltext
+from .chapters import content_hash, store_chapter_body
+from .covers import schedule_covers
+from .cache import invalidate
+from .models import Author, Book, BookPublisher, Chapter, Genre, Publisher
+from .search import book_index
+from .autocomplete import autocomplete_index
+
+# Sent with ``books=[...]`` after a bulk insert, which bypasses post_save.
+books_created = Signal()
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    if not book_index.built:
+        return
+    entry = (instance.pk, instance.title, instance.author_id, instance.author.name)
+    transaction.on_commit(lambda: book_index.add(*entry))
+
+
+@receiver(books_created, sender=Book)
+def index_books(sender, books, **kwargs):
+    if not book_index.built:
+        return
+    entries = [(book.pk, book.title, book.author_id, book.author.name) for book in books]
+    transaction.on_commit(lambda: book_index.add_many(entries))
+
+
+@receiver(post_delete, sender=Book)
+def unindex_book(sender, instance, **kwargs):
+    if not book_index.built:
+        return
+    book_id = instance.pk
+    transaction.on_commit(lambda: book_index.remove(book_id))
+
+
+@receiver(post_save, sender=Author)
+def reindex_author(sender, instance, created, **kwargs):
+    if created or not book_index.built:
+        return
+    entry = (instance.pk, instance.name)
+    transaction.on_commit(lambda: book_index.rename_author(*entry))
+
+
+def autocomplete_entry(book):
+    return (book.pk, book.title, book.author_id, book.genre_id, book.views, book.rating)
+
+
+@receiver(post_save, sender=Book)
+def autocomplete_book(sender, instance, **kwargs):
+    if not autocomplete_index.built:
+        return
+    entry = autocomplete_entry(instance)
+    transaction.on_commit(lambda: autocomplete_index.add_book(*entry))
+
+
+@receiver(books_created, sender=Book)
+def autocomplete_books(sender, books, **kwargs):
+    if not autocomplete_index.built:
+        return
+    names = [(kind, obj.pk, obj.name) for book in books for kind, obj in (('author', book.author), ('genre', book.genre))]
+    entries = [autocomplete_entry(book) for book in books]
+
+    def update():
+        for name in names:
+            autocomplete_index.set_name(*name)
+        autocomplete_index.add_books(entries)
+    transaction.on_commit(update)
+
+
+@receiver(post_delete, sender=Book)
+def autocomplete_remove_book(sender, instance, **kwargs):
+    if not autocomplete_index.built:
+        return
+    book_id = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove_book(book_id))
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_save, sender=Genre)
+def autocomplete_name(sender, instance, **kwargs):
+    if not autocomplete_index.built:
+        return
+    entry = (sender._meta.model_name, instance.pk, instance.name)
+    transaction.on_commit(lambda: autocomplete_index.set_name(*entry))
+
+
+@receiver(post_delete, sender=Author)
+@receiver(post_delete, sender=Genre)
+def autocomplete_remove_name(sender, instance, **kwargs):
+    if not autocomplete_index.built:
+        return
+    entry = (sender._meta.model_name, instance.pk)
+    transaction.on_commit(lambda: autocomplete_index.remove_name(*entry))
+
+
+@receiver(pre_save, sender=Book)
+def remember_cover(sender, instance, using, update_fields=None, **kwargs):
+    # Most saves (views, ratings, edits) leave the cover alone; remembering
+    # the stored one lets post_save skip re-reading and hashing the file.
+    instance._stored_cover = None
+    if instance.pk is None or (update_fields is not None and 'book_cover' not in update_fields):
+        return
+    instance._stored_cover = Book.objects.using(using).filter(pk=instance.pk).values_list('book_cover', flat=True).first()
+
+
+@receiver(post_save, sender=Book)
+def process_cover(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'book_cover' not in update_fields:
+        return
+    if instance.cover_hash and instance.book_cover.name == getattr(instance, '_stored_cover', None):
+        return
+    entry = (instance.pk, instance.book_cover.name)
+    transaction.on_commit(lambda: schedule_covers([entry]))
+
+
+@receiver(books_created, sender=Book)
+def process_covers(sender, books, **kwargs):
+    entries = [(book.pk, book.book_cover.name) for book in books if book.book_cover]
+    transaction.on_commit(lambda: schedule_covers(entries))
+
+
+@receiver(pre_save, sender=Chapter)
+def number_chapter(sender, instance, **kwargs):
+    # The next number is computed by the INSERT itself rather than read
+    # beforehand, so two chapters added at once cannot both take it. SQLite
+    # runs the statement under its single write lock.
+    if instance.chapter_number:
+        return
+    last = Chapter.objects.filter(
+        book_id=instance.book_id, publisher_id=instance.publisher_id
+    ).order_by().values('book').annotate(last=Max('chapter_number')).values('last')
+    instance.chapter_number = Coalesce(Subquery(last), Value(0), output_field=IntegerField()) + 1
+
+
+@receiver(post_save, sender=Chapter)
+def load_chapter_number(sender, instance, created, using, **kwargs):
+    if created and not isinstance(instance.chapter_number, int):
+        instance.chapter_number = Chapter.objects.using(using).filter(pk=instance.pk).values_list(
+            'chapter_number', flat=True
+        ).get()
+
+
+@receiver(post_save, sender=Chapter)
+def compress_chapter(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'content' not in update_fields:
+        return
+    # Title edits and saves of unchanged text keep their blocks.
+    if instance.content_hash and instance.content_hash == content_hash(instance.content):
+        return
+    store_chapter_body(instance, instance.content)
+
+
+def invalidate_on_commit(*entities):
+    # Bump now so this process stops serving the old data, and again after
+    # commit so nothing cached from a pre-commit read survives.
+    invalidate(*entities)
+    transaction.on_commit(lambda: invalidate(*entities))
+
+
+@receiver([post_save, post_delete], sender=Book)
+def invalidate_book(sender, instance, **kwargs):
+    invalidate_on_commit('book', f'book:{instance.pk}')
+
+
+@receiver([post_save, post_delete], sender=BookPublisher)
+def invalidate_book_publisher(sender, instance, **kwargs):
+    invalidate_on_commit('book', f'book:{instance.book_id}')
+
+
+@receiver([post_save, post_delete], sender=Author)
+def invalidate_author(sender, instance, using, **kwargs):
+    # Book details depend on their own book rather than on every author, so
+    # an edit only reaches the entries of this author's books.
+    book_ids = Book.objects.using(using).filter(author_id=instance.pk).values_list('id', flat=True)
+    invalidate_on_commit('author', *(f'book:{book_id}' for book_id in book_ids))
+
+
+@receiver([post_save, post_delete], sender=Genre)
+@receiver([post_save, post_delete], sender=Publisher)
+def invalidate_dimension(sender, instance, **kwargs):
+    invalidate_on_commit(sender._meta.model_name)
+
+
+@receiver(books_created, sender=Book)
+def invalidate_imported_books(sender, books, **kwargs):
+    # Bulk imports also bulk-create authors, genres and publishers.
+    invalidate_on_commit('book', 'author', 'genre', 'publisher')
+
+
+@receiver(post_migrate)
+def restore_fulltext_triggers(sender, using, **kwargs):
+    fulltext.ensure_triggers(using)
@@ -0,0 +1,1246 @@
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import zlib
+from datetime import timedelta
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.db import OperationalError, connection, connections
+from django.core.management import call_command, CommandError
+from django.core.management.sql import emit_post_migrate_signal
+from django.db.models.signals import pre_save
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from .models import Author, Genre, Publisher, Book, BookPublisher, Chapter, ChapterBlock, User, UserBehavior, History, FavoriteBook, SavedBook, HourlyBookActivity, DailyBookActivity, DailyUserBehavior, ImportCheckpoint, JobLock
+from .activity import activity_buffer, history_buffer, recompute_ratings
+from .cache import stats
+from .db import ReadReplicaRouter, acquire_lock, release_lock
+from .chapters import BLOCK_SIZE, content_hash
+from .covers import cover_pool, variant_name
+from .recommendations import recommendation_index
+from .search import BookSearchIndex, book_index
+from . import fulltext, recommendations, retention, trending
+from .api.fastpath import book_list
+from .api.querysets import book_queryset
+from .api.serializers import BookSerializer
+from .autocomplete import autocomplete_index
+from .metrics import registry
+from .api.throttling import search_limiter
+from .management.commands import import_catalog
+
+
+def create_catalog(count, genre_name='Fantasy'):
+    genre, _ = Genre.objects.get_or_create(name=genre_name)
+    publishers = [Publisher.objects.get_or_create(name=f'Publisher {i}')[0] for i in range(2)]
+    books = []
+    start = Book.objects.count()
+    for i in range(start, start + count):
+        author = Author.objects.create(name=f'Author {i}')
+        book = Book.objects.create(
+            title=f'Chronicle {i}', author=author, genre=genre, synopsis='A synopsis.',
+            book_cover='book_covers/cover.jpg', rating='4.50', views=i,
+        )
+        for publisher in publishers:
+            BookPublisher.objects.create(book=book, publisher=publisher, edition='First')
+        books.append(book)
+    return books
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class BookQueryCountTests(TestCase):
+    """
+    Serializing a list of books must not fan out into per-row queries for the
+    author, genre or publishers.
+    """
+
+    def setUp(self):
+        book_index.reset()
+        create_catalog(10)
+        self.addCleanup(activity_buffer.clear)
+
+    def assert_constant_queries(self, url, expected):
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        create_catalog(10)
+        book_index.reset()
+        book_index.build()
+        with self.assertNumQueries(expected):
+            self.client.get(url)
+
+    def test_books_by_genre(self):
+        url = reverse('books-by-genre', args=['Fantasy'])
+        self.assert_constant_queries(url, 3)
+
+    def test_search(self):
+        book_index.build()
+        url = reverse('search-books') + '?q=chronicle'
+        self.assert_constant_queries(url, 2)
+
+    def test_get_book(self):
+        book = Book.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('get-book', args=[book.pk]))
+        self.assertEqual(len(response.json()['publishers']), 2)
+
+
+class FastPathTests(TestCase):
+    def test_matches_book_serializer(self):
+        books = create_catalog(3)
+        BookPublisher.objects.filter(book=books[0]).update(translation=True, edition='Second')
+        Book.objects.filter(pk=books[1].pk).update(rating='3.00', book_cover='')
+        BookPublisher.objects.filter(book=books[2]).delete()
+
+        expected = json.loads(json.dumps(BookSerializer(book_queryset().order_by('id'), many=True).data))
+        with self.assertNumQueries(2):
+            self.assertEqual(book_list(Book.objects.order_by('id')), expected)
+        response = self.client.get(reverse('get-book', args=[books[0].pk]))
+        self.assertEqual(response.content, json.dumps(expected[0], separators=(',', ':')).encode())
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.books = create_catalog(3)
+
+    def test_fields_select_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('get-all-books'), {'fields': 'title,book_cover'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title', 'book_cover'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('synopsis', queries[0]['sql'])
+        self.assertNotIn('base_author', queries[0]['sql'])
+
+        response = self.client.get(reverse('get-all-books'), {'fields': 'title', 'sort': '-views', 'page_size': 2})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title', 'views'})
+        response = self.client.get(reverse('get-all-books'), {'fields': 'title', 'sort': '-views', 'cursor': response.json()['next']})
+        self.assertEqual([book['id'] for book in response.json()['results']], [self.books[0].pk])
+
+    def test_expand_publishers(self):
+        url = reverse('books-by-genre', args=['Fantasy'])
+        with self.assertNumQueries(2):
+            books = self.client.get(url, {'fields': 'title'}).json()['results']
+        self.assertEqual(books[0], {'title': 'Chronicle 0'})
+        with self.assertNumQueries(3):
+            books = self.client.get(url, {'fields': 'title', 'expand': 'publishers'}).json()['results']
+        self.assertEqual(len(books[0]['publishers']), 2)
+
+        book = self.client.get(reverse('get-book', args=[self.books[1].pk]), {'fields': 'rating,author'}).json()
+        self.assertEqual(book, {'author': {'id': self.books[1].author_id, 'name': 'Author 1'}, 'rating': '4.50'})
+        self.assertEqual(len(self.client.get(reverse('get-book', args=[self.books[1].pk])).json()), 9)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.get(reverse('search-books'), {'q': 'chronicle', 'fields': 'title,price'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse('get-all-books'), {'fields': 'title', 'expand': 'author'})
+        self.assertEqual(response.status_code, 400)
+
+
+class GetAllBooksPaginationTests(TestCase):
+    def setUp(self):
+        create_catalog(7)
+
+    def collect(self, **params):
+        url, ids = reverse('get-all-books'), []
+        while True:
+            data = self.client.get(url, {'page_size': 3, **params}).json()
+            ids.extend(book['id'] for book in data['results'])
+            if not data['next']:
+                return ids
+            params['cursor'] = data['next']
+
+    def test_pages_by_id(self):
+        self.assertEqual(self.collect(), list(Book.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_pages_by_views_descending(self):
+        Book.objects.update(views=5)
+        expected = list(Book.objects.order_by('-views', '-id').values_list('id', flat=True))
+        self.assertEqual(self.collect(sort='-views'), expected)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('get-all-books'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_streams_all_books(self):
+        response = self.client.get(reverse('get-all-books'), {'export': 'true'})
+        self.assertTrue(response.streaming)
+        books = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(books), 7)
+        self.assertEqual(books[0]['rating'], '4.50')
+
+
+class ChapterContentTests(TestCase):
+    def setUp(self):
+        book = create_catalog(1)[0]
+        self.text = ''.join(chr(ord('a') + i % 26) for i in range(BLOCK_SIZE * 2 + 100))
+        self.chapter = Chapter.objects.create(
+            book=book, publisher=Publisher.objects.first(), title='One', content=self.text
+        )
+
+    def test_chapters_are_numbered_and_compressed(self):
+        second = Chapter.objects.create(
+            book=self.chapter.book, publisher=self.chapter.publisher, title='Two', content='short'
+        )
+        self.assertEqual((self.chapter.chapter_number, second.chapter_number), (1, 2))
+        self.assertEqual(ChapterBlock.objects.filter(chapter=self.chapter).count(), 3)
+
+    def test_unchanged_text_keeps_its_blocks(self):
+        chapter = Chapter.objects.get(pk=self.chapter.pk)
+        with mock.patch('base.signals.store_chapter_body') as store:
+            chapter.title = 'Renamed'
+            chapter.save()
+        store.assert_not_called()
+        chapter.content = 'rewritten'
+        chapter.save()
+        self.assertEqual(ChapterBlock.objects.filter(chapter=chapter).count(), 1)
+        self.assertEqual(chapter.content_hash, content_hash('rewritten'))
+
+    def test_concurrent_chapters_get_distinct_numbers(self):
+        book, publisher = self.chapter.book, self.chapter.publisher
+        pending = Chapter(book=book, publisher=publisher, title='Two', content='short')
+        # Another writer adds a chapter after this one was numbered but
+        # before it was inserted.
+        pre_save.send(Chapter, instance=pending, raw=False, using='default', update_fields=None)
+        other = Chapter.objects.create(book=book, publisher=publisher, title='Three', content='short')
+        pending.save()
+        self.assertEqual((other.chapter_number, pending.chapter_number), (2, 3))
+
+    def test_character_range_reads_only_covering_blocks(self):
+        url = reverse('chapter-content', args=[self.chapter.pk])
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {'start': BLOCK_SIZE - 5, 'end': BLOCK_SIZE + 5}).json()
+        self.assertEqual(data['content'], self.text[BLOCK_SIZE - 5:BLOCK_SIZE + 5])
+
+    def test_page_read(self):
+        data = self.client.get(reverse('chapter-content', args=[self.chapter.pk]), {'page': 2}).json()
+        self.assertEqual(data['pages'], 3)
+        self.assertEqual(data['content'], self.text[BLOCK_SIZE * 2:])
+
+    def test_chapter_etag(self):
+        url = reverse('get-chapter', args=[self.chapter.pk])
+        response = self.client.get(url)
+        self.assertEqual(response.json()['content'], self.text)
+        self.assertIn('max-age=3600', response['Cache-Control'])
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_chapter_index_etag_changes_with_titles(self):
+        url = reverse('book-chapters', args=[self.chapter.book_id])
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Chapter.objects.filter(pk=self.chapter.pk).update(title='Renamed')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['title'], 'Renamed')
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class ChapterBundleTests(TestCase):
+    def setUp(self):
+        self.addCleanup(history_buffer.clear)
+        book = create_catalog(1)[0]
+        self.texts = [f'Chapter {i} ' * (BLOCK_SIZE // 4) for i in range(4)]
+        publisher = Publisher.objects.first()
+        self.chapters = [
+            Chapter.objects.create(book=book, publisher=publisher, title=str(i), content=text)
+            for i, text in enumerate(self.texts)
+        ]
+        # Another edition of the same book is not part of the bundle.
+        Chapter.objects.create(book=book, publisher=Publisher.objects.last(), title='Other', content='text')
+        self.user = User.objects.create(firstname='U', lastname='B', email='bundle@example.com')
+
+    def test_bundle_prefetches_next_chapters_and_records_position(self):
+        url = reverse('chapter-bundle', args=[self.chapters[1].pk])
+        # The user check, the chapter, the edition's index and the blocks.
+        with self.assertNumQueries(4):
+            response = self.client.get(url, {'ahead': 1, 'user': self.user.pk})
+        data = response.json()
+        self.assertEqual(data['chapter']['content'], self.texts[1])
+        self.assertEqual(data['previous'], self.chapters[0].pk)
+        self.assertEqual([entry['chapter_number'] for entry in data['index']], [1, 2, 3, 4])
+        [following] = data['next']
+        self.assertEqual(following['id'], self.chapters[2].pk)
+        text = ''.join(zlib.decompress(base64.b64decode(block)).decode('utf-8') for block in following['blocks'])
+        self.assertEqual(text, self.texts[2])
+        self.assertEqual(history_buffer.last_chapter(self.user.pk, self.chapters[1].book_id), self.chapters[1].pk)
+
+        self.assertIn('private', response['Cache-Control'])
+
+        # A revalidated bundle is not recorded as a read.
+        response = self.client.get(
+            reverse('chapter-bundle', args=[self.chapters[3].pk]), {'user': self.user.pk}
+        )
+        self.assertEqual(response.json()['next'], [])
+        self.assertEqual(history_buffer.last_chapter(self.user.pk, self.chapters[1].book_id), self.chapters[3].pk)
+        response = self.client.get(url, {'ahead': 1, 'user': self.user.pk}, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        history_buffer.record(self.user.pk, self.chapters[1].book_id, self.chapters[3].pk)
+        response = self.client.get(url, {'ahead': 1, 'user': self.user.pk}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(history_buffer.last_chapter(self.user.pk, self.chapters[1].book_id), self.chapters[3].pk)
+
+    def test_bundle_validates_parameters(self):
+        url = reverse('chapter-bundle', args=[self.chapters[0].pk])
+        self.assertEqual(self.client.get(url, {'ahead': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'user': 999}).status_code, 404)
+        self.assertEqual(len(self.client.get(url, {'ahead': 50}).json()['next']), 3)
+
+
+class AddBookTests(TestCase):
+    def payload(self, count):
+        return [{
+            'title': f'Imported {i}',
+            'author': {'name': f'Writer {i % 3}'},
+            'genre': {'name': 'Mystery'},
+            'synopsis': 'A synopsis.',
+            'publishers': [
+                {'publisher': {'name': 'Gramedia'}, 'translation': False, 'edition': 'First'},
+                {'publisher': {'name': f'Press {i % 2}'}, 'translation': True, 'edition': 'Second'},
+            ],
+            'book_cover': 'book_covers/cover.jpg',
+            'rating': '4.10',
+            'views': i,
+        } for i in range(count)]
+
+    def test_bulk_insert_uses_batched_queries(self):
+        Author.objects.create(name='Writer 0')
+        # Per dimension: one IN query, one insert of the missing names and one
+        # query fetching them back. Then the batched book and link inserts and
+        # the transaction savepoint pair.
+        with self.assertNumQueries(13):
+            response = self.client.post(reverse('add-book'), self.payload(50), content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.json()['accepted_books']), 50)
+        self.assertEqual(response.json()['accepted_books'][0]['publishers'][0]['publisher']['name'], 'Gramedia')
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(BookPublisher.objects.count(), 100)
+
+    def test_invalid_item_rejects_batch(self):
+        payload = self.payload(3)
+        del payload[1]['title']
+        response = self.client.post(reverse('add-book'), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('title', response.json()['rejected_books'][1])
+        self.assertFalse(Book.objects.exists())
+
+
+class ImportCatalogTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_catalog(self, count):
+        path = os.path.join(self.directory, 'catalog.jsonl')
+        with open(path, 'w') as f:
+            for i in range(count):
+                f.write(json.dumps({
+                    'title': f'Imported {i}', 'author': {'name': 'Writer'}, 'genre': {'name': 'Mystery'},
+                    'synopsis': 'A synopsis.', 'rating': '3.00', 'views': 0,
+                    'publishers': [{'publisher': {'name': 'Gramedia'}, 'edition': 'First'}],
+                    'chapters': [{'publisher': 'Gramedia', 'title': 'One', 'content': 'Once upon a time.'}],
+                }) + '\n')
+            f.write('{not json}\n')
+        return path
+
+    def write_csv(self, count):
+        path = os.path.join(self.directory, 'catalog.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['title', 'author', 'genre', 'synopsis', 'rating', 'views', 'publisher', 'edition'])
+            for i in range(count):
+                writer.writerow([f'Imported {i}', 'Writer', 'Mystery', 'A synopsis,\nover two lines.', '3.00', 0, 'Gramedia', 'First'])
+        return path
+
+    def test_import_with_chapters(self):
+        path = self.write_catalog(5)
+        call_command('import_catalog', path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertEqual(Chapter.objects.filter(chapter_number=1, content_length=17).count(), 5)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_resume_from_checkpoint(self):
+        path = self.write_catalog(5)
+        with open(path, 'rb') as f:
+            offset = len(f.readline()) + len(f.readline())
+        ImportCheckpoint.objects.create(source=os.path.abspath(path), records=2, offset=offset, accepted=2)
+        out = io.StringIO()
+        call_command('import_catalog', path, stdout=out, stderr=io.StringIO())
+        self.assertEqual(list(Book.objects.values_list('title', flat=True)), ['Imported 2', 'Imported 3', 'Imported 4'])
+        self.assertIn('Imported 5 books, rejected 1', out.getvalue())
+
+    def test_failed_batch_keeps_previous_checkpoint(self):
+        path = self.write_catalog(5)
+        resolve_names = import_catalog.resolve_names
+        calls = []
+
+        def fail_third(*args):
+            calls.append(args)
+            if len(calls) == 3:
+                raise RuntimeError('disk full')
+            return resolve_names(*args)
+
+        with mock.patch.object(import_catalog, 'resolve_names', side_effect=fail_third):
+            with self.assertRaises(RuntimeError):
+                call_command('import_catalog', path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Book.objects.count(), 4)
+        self.assertEqual(ImportCheckpoint.objects.get().records, 4)
+
+        call_command('import_catalog', path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(Book.objects.count(), 5)
+
+    def test_csv_resumes_from_offset(self):
+        path = self.write_csv(5)
+        with mock.patch.object(import_catalog, 'resolve_names', side_effect=[{}, RuntimeError('disk full')]):
+            with self.assertRaises(RuntimeError):
+                call_command('import_catalog', path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertEqual(ImportCheckpoint.objects.get().records, 2)
+        self.assertEqual(Book.objects.count(), 2)
+
+        with mock.patch.object(import_catalog, 'csv_record', wraps=import_catalog.csv_record) as csv_record:
+            call_command('import_catalog', path, batch_size=2, stdout=io.StringIO(), stderr=io.StringIO())
+        # Only the rows after the checkpoint are parsed again.
+        self.assertEqual(csv_record.call_count, 3)
+        self.assertEqual(Book.objects.count(), 5)
+        self.assertEqual(Book.objects.get(title='Imported 4').synopsis, 'A synopsis,\nover two lines.')
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class ActivityTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.book = create_catalog(1)[0]
+        self.users = [User.objects.create(firstname='U', lastname=str(i), email=f'u{i}@example.com') for i in range(2)]
+
+    def rate(self, user, value):
+        return self.client.post(
+            reverse('book-activity', args=[self.book.pk]),
+            {'user': user.pk, 'action_type': 'rate', 'value': value}, content_type='application/json',
+        )
+
+    def test_views_are_buffered_until_flush(self):
+        url = reverse('get-book', args=[self.book.pk])
+        for _ in range(3):
+            self.client.get(url)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.views, 0)
+        # One UPDATE, the genre lookup and an upsert into each trending
+        # rollup, inside a savepoint pair.
+        with self.assertNumQueries(6):
+            activity_buffer.flush()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.views, 3)
+        self.assertEqual(self.client.get(url).json()['views'], 3)
+
+    def test_failed_flush_keeps_the_batch(self):
+        self.client.get(reverse('get-book', args=[self.book.pk]))
+        self.rate(self.users[0], 4)
+        failure = OperationalError('database is locked')
+        with mock.patch.object(UserBehavior.objects, 'bulk_create', side_effect=failure):
+            with self.assertRaises(OperationalError):
+                activity_buffer.flush()
+        self.assertFalse(UserBehavior.objects.exists())
+        activity_buffer.flush()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.views, 1)
+        self.assertEqual(UserBehavior.objects.get().value, 4)
+
+    def test_flush_drops_events_for_deleted_users(self):
+        self.rate(self.users[0], 4)
+        self.rate(self.users[1], 2)
+        User.objects.filter(pk=self.users[1].pk).delete()
+        # SQLite defers foreign key checks to the outer commit, which a
+        # TestCase never reaches, so the violation is simulated.
+        real_bulk_create = UserBehavior.objects.bulk_create
+        calls = []
+
+        def fail_first(events, **kwargs):
+            calls.append([event.user_id for event in events])
+            if len(calls) == 1:
+                raise OperationalError('FOREIGN KEY constraint failed')
+            return real_bulk_create(events, **kwargs)
+
+        with mock.patch.object(UserBehavior.objects, 'bulk_create', side_effect=fail_first):
+            activity_buffer.flush()
+        self.assertEqual(calls[1], [self.users[0].pk])
+        self.assertEqual(UserBehavior.objects.get().user_id, self.users[0].pk)
+
+    @override_settings(ACTIVITY_FLUSH_INTERVAL=60, ACTIVITY_MAX_PENDING=2)
+    def test_full_buffer_wakes_the_flusher(self):
+        other = create_catalog(1)[0]
+        # Stand in for the flush thread, so nothing runs in the background.
+        with mock.patch.object(activity_buffer, '_thread', object()):
+            self.addCleanup(activity_buffer._wake.clear)
+            for book in (self.book, other):
+                self.client.get(reverse('get-book', args=[book.pk]))
+            self.assertTrue(activity_buffer._wake.is_set())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.views, 0)
+
+    def test_ratings_use_latest_event_per_user(self):
+        self.assertEqual(self.rate(self.users[0], 1).status_code, 202)
+        self.rate(self.users[0], 5)
+        self.rate(self.users[1], 2)
+        self.assertEqual(self.rate(self.users[1], 9).status_code, 400)
+        call_command('recompute_ratings', stdout=io.StringIO())
+        self.assertEqual(UserBehavior.objects.count(), 3)
+        self.book.refresh_from_db()
+        self.assertEqual(str(self.book.rating), '3.50')
+
+    def test_recomputed_ratings_reach_cached_details(self):
+        url = reverse('get-book', args=[self.book.pk])
+        self.rate(self.users[0], 2)
+        activity_buffer.flush()
+        self.assertEqual(self.client.get(url).json()['rating'], '4.50')
+        # Drop the view just recorded, whose flush would invalidate the entry too.
+        activity_buffer.clear()
+        recompute_ratings()
+        self.assertEqual(self.client.get(url).json()['rating'], '2.00')
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class ReadingHistoryTests(TestCase):
+    def setUp(self):
+        self.addCleanup(history_buffer.clear)
+        book = create_catalog(1)[0]
+        self.chapters = [
+            Chapter.objects.create(book=book, publisher=Publisher.objects.first(), title=str(i), content='text')
+            for i in range(3)
+        ]
+        self.user = User.objects.create(firstname='U', lastname='R', email='reader@example.com')
+        self.url = reverse('reading-history', args=[self.user.pk])
+
+    def test_page_turns_coalesce_into_one_row(self):
+        for chapter in self.chapters:
+            response = self.client.post(self.url, {'chapter': chapter.pk}, content_type='application/json')
+            self.assertEqual(response.status_code, 202)
+        self.assertFalse(History.objects.exists())
+        self.assertEqual(self.client.get(self.url).json()['results'][0]['last_chapter_read'], self.chapters[2].pk)
+
+        history_buffer.flush()
+        history_buffer.record(self.user.pk, self.chapters[0].book_id, self.chapters[1].pk)
+        history_buffer.flush()
+        self.assertEqual(History.objects.get().last_chapter_read_id, self.chapters[1].pk)
+        self.assertEqual(self.client.get(self.url).json()['results'][0]['last_chapter_read'], self.chapters[1].pk)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        self.books = create_catalog(5)
+        users = [User.objects.create(firstname='U', lastname=str(i), email=f'r{i}@example.com') for i in range(3)]
+        for user in users[:2]:
+            for book in self.books[:3]:
+                FavoriteBook.objects.create(user=user, book=book)
+        SavedBook.objects.create(user=users[2], book=self.books[0])
+        SavedBook.objects.create(user=users[2], book=self.books[4])
+        self.reader = users[2]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'recommendations')
+        self.enterContext(override_settings(RECOMMENDATIONS_PATH=path))
+        call_command('build_recommendations', stdout=io.StringIO())
+
+    def test_similar_books(self):
+        results = self.client.get(reverse('similar-books', args=[self.books[1].pk])).json()['results']
+        self.assertEqual(results[0]['book']['id'], self.books[2].pk)
+        self.assertNotIn(self.books[1].pk, [result['book']['id'] for result in results])
+
+    def test_user_recommendations_exclude_read_books(self):
+        results = self.client.get(reverse('user-recommendations', args=[self.reader.pk])).json()['results']
+        self.assertEqual({result['book']['id'] for result in results}, {self.books[1].pk, self.books[2].pk})
+
+    def test_behavior_is_weighted_in_the_database(self):
+        FavoriteBook.objects.all().delete()
+        SavedBook.objects.all().delete()
+        book = self.books[0]
+        for action_type, value in (('rate', 5), ('rate', 1), ('view', None), ('unknown', None)):
+            UserBehavior.objects.create(user=self.reader, book=book, action_type=action_type, value=value)
+        DailyUserBehavior.objects.create(user=self.reader, book=book, action_type='rate', day='2026-01-01', count=2, value_sum=8)
+        DailyUserBehavior.objects.create(user=self.reader, book=book, action_type='read', day='2026-01-01', count=3)
+        user_ids, book_ids, weights = recommendations.interactions()
+        self.assertEqual(set(user_ids), {self.reader.pk})
+        self.assertEqual(set(book_ids), {book.pk})
+        self.assertEqual(list(weights), [3.0, 1.0, 4.0, 6.0])
+
+    def test_rebuild_swaps_the_index_in_one_step(self):
+        path = django_settings.RECOMMENDATIONS_PATH
+        first = os.path.realpath(path)
+        self.assertTrue(os.path.islink(path))
+        self.assertTrue(recommendation_index.available)
+
+        call_command('build_recommendations', stdout=io.StringIO())
+        call_command('build_recommendations', stdout=io.StringIO())
+        versions = [entry for entry in os.listdir(os.path.dirname(path)) if entry != 'recommendations']
+        # The current version and the one it replaced.
+        self.assertEqual(len(versions), 2)
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(recommendation_index.available)
+        self.assertEqual(recommendation_index._version, os.path.realpath(path))
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.book = create_catalog(2)[0]
+        stats.reset()
+
+    def test_repeat_requests_skip_the_database(self):
+        url = reverse('get-book', args=[self.book.pk])
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response.json()['title'], 'Chronicle 0')
+
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, 401)
+        from django.contrib.auth.models import User as AuthUser
+        from rest_framework_simplejwt.tokens import RefreshToken
+        staff = AuthUser.objects.create_user('ops', password='secret', is_staff=True)
+        auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(staff).access_token}'}
+        self.assertEqual(self.client.get(reverse('cache-stats'), **auth).json()['hit'], 1)
+
+    def test_author_edits_only_invalidate_their_books(self):
+        other = Book.objects.exclude(pk=self.book.pk).get()
+        for book in (self.book, other):
+            self.client.get(reverse('get-book', args=[book.pk]))
+
+        author = self.book.author
+        author.name = 'Renamed'
+        author.save()
+        with self.assertNumQueries(0):
+            self.client.get(reverse('get-book', args=[other.pk]))
+        self.assertEqual(self.client.get(reverse('get-book', args=[self.book.pk])).json()['author']['name'], 'Renamed')
+
+    def test_saves_invalidate_dependent_entries(self):
+        book_url = reverse('get-book', args=[self.book.pk])
+        genre_url = reverse('books-by-genre', args=['Fantasy'])
+        self.client.get(book_url)
+        self.client.get(genre_url)
+
+        self.book.title = 'Renamed'
+        self.book.save()
+        self.assertEqual(self.client.get(book_url).json()['title'], 'Renamed')
+        self.assertEqual(self.client.get(genre_url).json()['results'][0]['title'], 'Renamed')
+
+        Genre.objects.create(name='Horror')
+        self.assertEqual(len(self.client.get(reverse('get-all-genres')).json()['results']), 2)
+        Publisher.objects.filter(pk=Publisher.objects.first().pk).update(name='Untracked')
+        BookPublisher.objects.filter(book=self.book).first().save()
+        self.assertEqual(self.client.get(book_url).json()['publishers'][0]['publisher']['name'], 'Untracked')
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.addCleanup(book_index.reset)
+        self.books = create_catalog(3)
+        book_index.build()
+
+    async def test_async_views_match_sync_views(self):
+        pk = self.books[0].pk
+        for name, args in [
+            ('get-all-books', []),
+            ('get-book', [pk]),
+            ('get-all-genres', []),
+            ('get-all-authors', []),
+        ]:
+            sync_response = await self.async_client.get(reverse(name, args=args))
+            async_response = await self.async_client.get(reverse(f'async-{name}', args=args))
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(async_response.json(), sync_response.json())
+
+    async def test_async_views_share_parameters_and_export(self):
+        async def body(response):
+            if not response.streaming:
+                return response.content
+            if response.is_async:
+                return b''.join([chunk async for chunk in response.streaming_content])
+            return await sync_to_async(b''.join)(response.streaming_content)
+
+        pk = self.books[0].pk
+        for name, args, params in [
+            ('get-all-books', [], {'fields': 'title', 'sort': '-views', 'page_size': 2}),
+            ('get-all-books', [], {'export': 'true', 'fields': 'title,publishers'}),
+            ('get-book', [pk], {'fields': 'title', 'expand': 'publishers'}),
+            ('search-books', [], {'q': 'Chronicle 2', 'fields': 'title,rating'}),
+        ]:
+            sync_response = await self.async_client.get(reverse(name, args=args), params)
+            async_response = await self.async_client.get(reverse(f'async-{name}', args=args), params)
+            self.assertEqual(async_response.status_code, 200)
+            self.assertEqual(json.loads(await body(async_response)), json.loads(await body(sync_response)))
+        response = await self.async_client.get(reverse('async-get-book', args=[pk]), {'fields': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_async_search_uses_search_throttle(self):
+        await cache.aclear()
+        self.addCleanup(cache.clear)
+        rates = {**django_settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'search': '2/min', 'ingest': '30/min'}}
+        url = reverse('async-search-books')
+        with override_settings(REST_FRAMEWORK=rates):
+            # The sync and async endpoints draw from the same bucket.
+            self.assertEqual((await self.async_client.get(reverse('search-books'), {'q': 'Chronicle'})).status_code, 200)
+            self.assertEqual((await self.async_client.get(url, {'q': 'Chronicle'})).status_code, 200)
+            response = await self.async_client.get(url, {'q': 'Chronicle'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    async def test_async_search_and_missing_book(self):
+        response = await self.async_client.get(reverse('async-search-books'), {'q': 'Chronicle 1'})
+        self.assertEqual(response.json()['results'][0]['book']['title'], 'Chronicle 1')
+        response = await self.async_client.get(reverse('async-get-book', args=[0]))
+        self.assertEqual(response.status_code, 404)
+
+
+class SearchIndexTests(TestCase):
+    def test_author_renamed_by_a_new_book(self):
+        index = BookSearchIndex()
+        index.load([(1, 'Harbor Lights', 7, 'Miriam Tolland')])
+        # A later book carries the author's new name; the earlier book must
+        # drop its postings for the old one.
+        index.add(2, 'Winter Tides', 7, 'Miriam Castell')
+        index.remove(1)
+        for query in ('Miriam Tolland', 'Miriam Castell', 'Harbor Lights'):
+            self.assertNotIn(1, [book_id for book_id, _ in index.search(query)])
+        self.assertEqual(index.search('Miriam Castell')[0], (2, 100))
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        self.addCleanup(autocomplete_index.reset)
+        self.books = create_catalog(3)
+        self.url = reverse('autocomplete')
+
+    def test_prefixes_match_titles_authors_and_genres_by_word(self):
+        autocomplete_index.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[0].title = 'The Lord of the Rings'
+            self.books[0].save()
+        # Lookups serve the previous snapshot until the background refresh lands.
+        autocomplete_index.refresh()
+        response = self.client.get(self.url, {'q': 'Ri'}).json()
+        self.assertEqual(response['books'], [{'id': self.books[0].pk, 'label': 'The Lord of the Rings'}])
+        response = self.client.get(self.url, {'q': 'fant'}).json()
+        self.assertEqual([genre['label'] for genre in response['genres']], ['Fantasy'])
+        response = self.client.get(self.url, {'q': 'author'}).json()
+        self.assertEqual([author['label'] for author in response['authors']], ['Author 2', 'Author 1', 'Author 0'])
+
+    def test_ranking_follows_views_and_saves(self):
+        autocomplete_index.build()
+        response = self.client.get(self.url, {'q': 'chron', 'limit': 2}).json()
+        self.assertEqual([book['id'] for book in response['books']], [self.books[2].pk, self.books[1].pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.books[0].views = 100
+            self.books[0].save()
+            Author.objects.filter(pk=self.books[2].author_id).delete()
+        autocomplete_index.refresh()
+        response = self.client.get(self.url, {'q': 'chron'}).json()
+        self.assertEqual([book['id'] for book in response['books']], [self.books[0].pk, self.books[1].pk])
+        self.assertEqual(response['authors'], [])
+        response = self.client.get(self.url, {'q': 'author'}).json()
+        self.assertEqual([author['label'] for author in response['authors']], ['Author 0', 'Author 1'])
+
+    @override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+    def test_bulk_view_and_rating_updates_rerank(self):
+        self.addCleanup(activity_buffer.clear)
+        autocomplete_index.build()
+        user = User.objects.create(firstname='U', lastname='A', email='typeahead@example.com')
+        # Flushed views and recomputed ratings are queryset updates, which
+        # send no signals. Books start with 0, 1 and 2 views.
+        for book, count in ((self.books[0], 5), (self.books[1], 1)):
+            for _ in range(count):
+                activity_buffer.record_view(book.pk)
+        activity_buffer.flush()
+        autocomplete_index.refresh()
+        response = self.client.get(self.url, {'q': 'chron'}).json()
+        # The last two tie on views and rating, so the lower id goes first.
+        self.assertEqual([book['id'] for book in response['books']], [book.pk for book in self.books[:3]])
+        response = self.client.get(self.url, {'q': 'author'}).json()
+        self.assertEqual(response['authors'][0]['label'], 'Author 0')
+
+        activity_buffer.record(self.books[1].pk, 'rate', user_id=user.pk, value=1)
+        activity_buffer.flush()
+        recompute_ratings()
+        autocomplete_index.refresh()
+        response = self.client.get(self.url, {'q': 'chron'}).json()
+        self.assertEqual([book['id'] for book in response['books']], [self.books[0].pk, self.books[2].pk, self.books[1].pk])
+
+    def test_lookups_before_the_build_start_it(self):
+        with mock.patch.object(autocomplete_index, 'build') as build:
+            response = self.client.get(self.url, {'q': 'chron'}).json()
+            autocomplete_index.start_build().join()
+        self.assertEqual(response, {'books': [], 'authors': [], 'genres': []})
+        build.assert_called()
+        autocomplete_index.build()
+        self.assertEqual(len(self.client.get(self.url, {'q': 'chron'}).json()['books']), 3)
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.books = create_catalog(3)
+        self.url = reverse('fulltext-search')
+        Book.objects.filter(pk=self.books[0].pk).update(synopsis='A lighthouse keeper guards the northern coast.')
+        self.chapter = Chapter.objects.create(
+            book=self.books[1], publisher=Publisher.objects.first(), title='Arrival',
+            content='The ship reached the lighthouse at dawn, long after the storm.',
+        )
+
+    def test_ranks_synopses_and_chapters_with_snippets(self):
+        results = self.client.get(self.url, {'q': 'lighthouse'}).json()['results']
+        self.assertEqual({(r['type'], r['book_id'], r['chapter_id']) for r in results}, {
+            ('book', self.books[0].pk, None), ('chapter', self.books[1].pk, self.chapter.pk),
+        })
+        self.assertTrue(all('<mark>lighthouse</mark>' in r['snippet'] for r in results))
+
+        results = self.client.get(self.url, {'q': 'lighth', 'type': 'chapter'}).json()['results']
+        self.assertEqual([r['chapter_id'] for r in results], [self.chapter.pk])
+
+    def test_index_follows_updates_and_deletes(self):
+        self.chapter.content = 'A quiet harbour.'
+        self.chapter.save()
+        results = self.client.get(self.url, {'q': 'harbour'}).json()['results']
+        self.assertEqual([r['chapter_id'] for r in results], [self.chapter.pk])
+        self.assertEqual(self.client.get(self.url, {'q': 'storm'}).json()['results'], [])
+
+        self.books[0].delete()
+        self.assertEqual(self.client.get(self.url, {'q': 'lighthouse'}).json()['results'], [])
+
+    def test_snippets_escape_indexed_text(self):
+        Book.objects.filter(pk=self.books[2].pk).update(synopsis='<script>alert(1)</script> beacon & bell')
+        [result] = self.client.get(self.url, {'q': 'beacon'}).json()['results']
+        self.assertIn('&lt;script&gt;', result['snippet'])
+        self.assertIn('<mark>beacon</mark> &amp; bell', result['snippet'])
+
+    def test_triggers_exist_after_migrate(self):
+        names = {f'{fts}_{suffix}' for fts, _, _ in fulltext.INDEXES for suffix in ('ai', 'ad', 'au')}
+
+        def triggers():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+                return {name for name, in cursor.fetchall()} & names
+
+        self.assertEqual(triggers(), names)
+        # A migration that rebuilds an indexed table drops its triggers;
+        # the next migrate puts them back.
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER base_chapter_fts_au')
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(triggers(), names)
+
+    def test_pagination_and_operator_input(self):
+        response = self.client.get(self.url, {'q': 'synopsis', 'page_size': 1}).json()
+        self.assertEqual((len(response['results']), response['next']), (1, 2))
+        response = self.client.get(self.url, {'q': 'synopsis', 'page_size': 1, 'page': 2}).json()
+        self.assertEqual((len(response['results']), response['next']), (1, None))
+        self.assertEqual(self.client.get(self.url, {'q': 'synopsis" OR NEAR('}).status_code, 200)
+        self.assertEqual(self.client.get(self.url, {'q': '!!'}).status_code, 400)
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class QueryPlanTests(TestCase):
+    """
+    Runs every read endpoint and checks SQLite's EXPLAIN QUERY PLAN for each
+    query it issues: lookups must be index searches, never table scans.
+    """
+    # Endpoints that intentionally read a whole table, in an order SQLite
+    # can take straight from the rowid.
+    full_reads = {
+        'get-all-genres': {'base_genre'},
+        'get-all-authors': {'base_author'},
+        'get-all-books': {'base_book'},
+    }
+
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.addCleanup(history_buffer.clear)
+        cache.clear()
+        book_index.reset()
+        books = create_catalog(3)
+        book_index.build()
+        self.book = books[0]
+        self.chapter = Chapter.objects.create(
+            book=self.book, publisher=Publisher.objects.first(), title='One', content='x' * (BLOCK_SIZE * 2)
+        )
+        self.user = User.objects.create(firstname='U', lastname='P', email='plan@example.com')
+
+    def endpoints(self):
+        book, chapter = self.book.pk, self.chapter.pk
+        return [
+            ('get-all-books', [], {}),
+            ('get-all-books', [], {'sort': '-rating', 'page_size': 1}),
+            ('get-all-books', [], {'sort': 'views', 'page_size': 1}),
+            ('get-book', [book], {}),
+            ('search-books', [], {'q': 'chronicle'}),
+            ('books-by-genre', ['Fantasy'], {}),
+            ('get-all-genres', [], {}),
+            ('get-all-authors', [], {}),
+            ('book-chapters', [book], {}),
+            ('get-chapter', [chapter], {}),
+            ('chapter-content', [chapter], {'page': 1}),
+            ('reading-history', [self.user.pk], {}),
+        ]
+
+    def query_plan(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def test_endpoints_use_indexes(self):
+        for name, args, params in self.endpoints():
+            with self.subTest(endpoint=name, params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(reverse(name, args=args), params)
+                self.assertEqual(response.status_code, 200)
+                selects = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('SELECT')]
+                self.assertTrue(selects)
+                for sql in selects:
+                    for detail in self.query_plan(sql):
+                        table = detail.split()[1] if detail.startswith('SCAN ') else None
+                        if table and table not in self.full_reads.get(name, ()):
+                            self.fail(f'{name} scans {table}: {detail}\n{sql}')
+
+    def test_paginated_pages_search_the_sort_index(self):
+        for sort in ('-rating', 'views'):
+            with self.subTest(sort=sort):
+                first = self.client.get(reverse('get-all-books'), {'sort': sort, 'page_size': 1}).json()
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse('get-all-books'), {'sort': sort, 'page_size': 1, 'cursor': first['next']})
+                plan = ' '.join(self.query_plan(queries.captured_queries[0]['sql']))
+                self.assertIn('USING INDEX', plan)
+
+
+class DatabaseConfigurationTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def pragma(self, alias, name):
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_pragmas(self):
+        self.assertEqual(self.pragma('default', 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma('default', 'synchronous'), 1)
+        self.assertEqual(self.pragma('default', 'query_only'), 0)
+        self.assertEqual(self.pragma('replica', 'query_only'), 1)
+
+    def test_reads_inside_a_transaction_stay_on_the_primary(self):
+        router = ReadReplicaRouter()
+        self.assertEqual(router.db_for_write(Book), 'default')
+        # TestCase wraps each test in a transaction on the primary.
+        self.assertEqual(router.db_for_read(Book), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'base'))
+
+
+class CoverTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media, COVER_WORKERS=0)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.addCleanup(activity_buffer.clear)
+        from PIL import Image
+        for name, color in (('red', (200, 30, 30)), ('blue', (30, 30, 200))):
+            os.makedirs(os.path.join(media, 'book_covers'), exist_ok=True)
+            Image.new('RGB', (800, 1200), color).save(os.path.join(media, 'book_covers', f'{name}.png'))
+
+    def test_upload_generates_variants_served_with_long_cache_headers(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = create_catalog(1)[0]
+            book.book_cover = 'book_covers/red.png'
+            book.save()
+        book.refresh_from_db()
+        self.assertEqual(len(book.cover_hash), 40)
+        self.assertTrue(default_storage.exists(variant_name(book.cover_hash, 160, 'webp')))
+
+        data = self.client.get(reverse('get-book', args=[book.pk])).json()
+        sources = data['srcset']['webp'].split(', ')
+        self.assertEqual([source.split()[1] for source in sources], ['160w', '320w', '640w'])
+        response = self.client.get(sources[0].split()[0])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+    def test_saves_that_keep_the_cover_skip_processing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            book = create_catalog(1)[0]
+            book.book_cover = 'book_covers/red.png'
+            book.save()
+        book.refresh_from_db()
+        with mock.patch('base.signals.schedule_covers') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                book.views += 1
+                book.save()
+            schedule.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                book.book_cover = 'book_covers/blue.png'
+                book.save()
+            schedule.assert_called_once_with([(book.pk, 'book_covers/blue.png')])
+
+    def test_backfill_command(self):
+        books = create_catalog(3)
+        Book.objects.filter(pk=books[0].pk).update(book_cover='book_covers/red.png')
+        Book.objects.filter(pk=books[1].pk).update(book_cover='book_covers/blue.png')
+        out = io.StringIO()
+        with self.assertLogs('base.covers', 'WARNING'):
+            call_command('process_covers', workers=2, stdout=out)
+        self.assertIn('Processed covers for 2 books', out.getvalue())
+        hashes = dict(Book.objects.values_list('id', 'cover_hash'))
+        self.assertEqual(hashes[books[2].pk], '')
+        for book in books[:2]:
+            self.assertTrue(default_storage.exists(variant_name(hashes[book.pk], 640, 'jpeg')))
+        # Batches share one pool rather than each starting its own.
+        self.assertIs(cover_pool(2), cover_pool(2))
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.addCleanup(registry.reset)
+        registry.reset()
+        create_catalog(3)
+        from django.contrib.auth.models import User as AuthUser
+        from rest_framework_simplejwt.tokens import RefreshToken
+        self.staff = AuthUser.objects.create_user('ops', password='secret', is_staff=True)
+        self.auth = {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(self.staff).access_token}'}
+
+    def test_requests_are_recorded_per_endpoint(self):
+        self.client.get(reverse('get-all-books'))
+        self.client.get(reverse('get-all-books'))
+        response = self.client.get(reverse('metrics'), **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn('http_requests_total{endpoint="get-all-books",method="GET",status="200"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{endpoint="get-all-books"} 2', body)
+        self.assertIn('http_request_db_queries_bucket{endpoint="get-all-books",le="0"} 0', body)
+        self.assertIn('http_response_size_bytes_count{endpoint="get-all-books"} 2', body)
+        serializer = [line for line in body.splitlines() if line.startswith('http_request_serializer_seconds_total{endpoint="get-all-books"}')]
+        self.assertGreater(float(serializer[0].split()[-1]), 0)
+
+    async def test_asgi_requests_count_queries(self):
+        await self.async_client.get(reverse('get-all-books'))
+        await self.async_client.get(reverse('async-get-all-books'))
+        body = registry.render()
+        for endpoint in ('get-all-books', 'async-get-all-books'):
+            self.assertIn(f'http_request_db_queries_bucket{{endpoint="{endpoint}",le="0"}} 0', body)
+            self.assertIn(f'http_request_db_queries_count{{endpoint="{endpoint}"}} 1', body)
+
+    def test_metrics_require_staff(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+
+    def test_profile_header(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(METRICS_PROFILE_TOKEN='letmein', METRICS_PROFILE_DIR=directory):
+            self.assertNotIn('X-Profile-File', self.client.get(reverse('get-all-books'), HTTP_X_PROFILE='wrong'))
+            response = self.client.get(reverse('get-all-books'), HTTP_X_PROFILE='letmein')
+        self.assertEqual(os.listdir(directory), [response['X-Profile-File']])
+        self.assertTrue(response['X-Profile-File'].startswith('get-all-books-'))
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class ThrottlingTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.addCleanup(cache.clear)
+        cache.clear()
+        create_catalog(3)
+        book_index.reset()
+        book_index.build()
+        self.addCleanup(book_index.reset)
+
+    def test_token_bucket_per_client(self):
+        rates = {**django_settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'search': '2/min', 'ingest': '30/min'}}
+        url = reverse('search-books') + '?q=Chronicle'
+        with override_settings(REST_FRAMEWORK=rates):
+            self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertEqual(self.client.get(url).status_code, 200)
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 429)
+            self.assertEqual(response['Retry-After'], '30')
+            # Buckets are per client.
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    @override_settings(ADD_BOOK_MAX_BATCH=2, ADD_BOOK_MAX_BODY_SIZE=4096)
+    def test_add_book_size_limits(self):
+        book = {'title': 'Capped', 'author': {'name': 'Writer'}, 'genre': {'name': 'Mystery'}}
+        response = self.client.post(reverse('add-book'), [book] * 3, content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        response = self.client.post(reverse('add-book'), {**book, 'synopsis': 'x' * 5000}, content_type='application/json')
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(Book.objects.filter(title='Capped').exists())
+
+    def test_search_sheds_load_when_saturated(self):
+        url = reverse('search-books') + '?q=Chronicle'
+        held = 0
+        try:
+            while search_limiter.acquire():
+                held += 1
+            response = self.client.get(url)
+        finally:
+            for _ in range(held):
+                search_limiter.release()
+        self.assertEqual(held, search_limiter.limit)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_search_unavailable_until_index_built(self):
+        book_index.reset()
+        url = reverse('search-books') + '?q=Chronicle'
+        # Searches never build the index themselves; they start a background
+        # build and turn the request away.
+        with mock.patch.object(book_index, 'build') as build:
+            response = self.client.get(url)
+            book_index.start_build().join()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+        build.assert_called()
+        book_index.build()
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.books = create_catalog(3)
+        self.other = create_catalog(1, genre_name='Horror')[0]
+        self.user = User.objects.create(firstname='U', lastname='T', email='trend@example.com')
+
+    def test_flush_updates_rollups_incrementally(self):
+        for book in (self.books[0], self.books[1], self.books[1], self.other):
+            activity_buffer.record_view(book.pk)
+        activity_buffer.record(self.books[0].pk, 'favorite', user_id=self.user.pk)
+        activity_buffer.flush()
+        activity_buffer.record_view(self.books[1].pk)
+        activity_buffer.flush()
+        self.assertEqual(HourlyBookActivity.objects.count(), 3)
+        row = DailyBookActivity.objects.get(book=self.books[1])
+        self.assertEqual((row.views, row.activity), (3, 3.0))
+        self.assertEqual(DailyBookActivity.objects.get(book=self.books[0]).activity, 6.0)
+
+        # The leaderboard from the rollup, then the books.
+        with self.assertNumQueries(2):
+            data = self.client.get(reverse('trending-books'), {'fields': 'title'}).json()
+        self.assertEqual([entry['book']['title'] for entry in data['results']], ['Chronicle 0', 'Chronicle 1', 'Chronicle 3'])
+        data = self.client.get(reverse('trending-books'), {'genre': 'Horror', 'window': 'day'}).json()
+        self.assertEqual([entry['book']['title'] for entry in data['results']], ['Chronicle 3'])
+        self.assertEqual(self.client.get(reverse('trending-books'), {'window': 'year'}).status_code, 400)
+
+    def test_older_activity_decays(self):
+        now = timezone.now()
+        trending.record_activity({self.books[0].pk: 10}, [], now=now - timedelta(days=4))
+        trending.record_activity({self.books[1].pk: 4}, [], now=now)
+        self.assertEqual([book_id for book_id, _ in trending.trending('week', now=now)], [self.books[1].pk, self.books[0].pk])
+        self.assertEqual([book_id for book_id, _ in trending.trending('day', now=now)], [self.books[1].pk])
+
+    def test_rebuild_from_behavior_log(self):
+        UserBehavior.objects.bulk_create([
+            UserBehavior(user=self.user, book=self.books[2], action_type=action) for action in ('view', 'read', 'save')
+        ])
+        out = io.StringIO()
+        call_command('rebuild_trending', days=1, stdout=out)
+        self.assertIn('Replayed 3 events', out.getvalue())
+        row = HourlyBookActivity.objects.get()
+        self.assertEqual((row.book_id, row.views, row.activity), (self.books[2].pk, 1, 8.0))
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.addCleanup(history_buffer.clear)
+        self.book = create_catalog(1)[0]
+        self.users = [User.objects.create(firstname='U', lastname=str(i), email=f'k{i}@example.com') for i in range(2)]
+        chapter = Chapter.objects.create(book=self.book, publisher=Publisher.objects.first(), title='1', content='text')
+        History.objects.create(user=self.users[0], book=self.book, last_chapter_read=chapter)
+        History.objects.create(user=self.users[1], book=self.book, last_chapter_read=chapter)
+
+        old = timezone.now() - timedelta(days=60)
+        events = [('view', None)] * 3 + [('rate', 2), ('rate', 4)]
+        UserBehavior.objects.bulk_create([
+            UserBehavior(user=self.users[0], book=self.book, action_type=action, value=value) for action, value in events
+        ] + [UserBehavior(user=self.users[1], book=self.book, action_type='view')])
+        UserBehavior.objects.exclude(user=self.users[1]).update(action_date=old)
+        History.objects.filter(user=self.users[0]).update(last_read_date=old)
+
+    def test_compacts_old_events_in_batches(self):
+        archive = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, archive)
+        out = io.StringIO()
+        call_command('compact_activity', days=30, history_days=30, batch_size=2, archive_dir=archive, stdout=out)
+        self.assertIn('Compacted 4 events into 2 daily rows, deleted 1 history entries', out.getvalue())
+        self.assertIn('Reclaimed', out.getvalue())
+
+        # The recent view and the latest rating stay raw.
+        self.assertEqual(
+            sorted(UserBehavior.objects.values_list('action_type', 'value')), [('rate', 4), ('view', None)]
+        )
+        summaries = {row.action_type: (row.count, row.value_sum) for row in DailyUserBehavior.objects.all()}
+        self.assertEqual(summaries, {'view': (3, 0), 'rate': (1, 2)})
+        self.assertEqual(list(History.objects.values_list('user', flat=True)), [self.users[1].pk])
+
+        archived = {}
+        for name in os.listdir(archive):
+            with gzip.open(os.path.join(archive, name), 'rt') as f:
+                archived[name.split('-')[0]] = [json.loads(line) for line in f]
+        self.assertEqual(len(archived['user_behavior']), 4)
+        self.assertEqual(archived['history'][0]['user_id'], self.users[0].pk)
+
+        # A second run has nothing left to do.
+        out = io.StringIO()
+        call_command('compact_activity', days=30, stdout=out)
+        self.assertIn('Compacted 0 events', out.getvalue())
+
+    def test_runs_do_not_overlap(self):
+        holder = acquire_lock(retention.LOCK_NAME, timeout=60)
+        with self.assertRaises(CommandError):
+            call_command('compact_activity', stdout=io.StringIO())
+        self.assertEqual(UserBehavior.objects.count(), 6)
+
+        # An expired lock is taken over, and only its new holder releases it.
+        JobLock.objects.update(expires=timezone.now() - timedelta(seconds=1))
+        self.assertIsNotNone(acquire_lock(retention.LOCK_NAME, timeout=60))
+        release_lock(retention.LOCK_NAME, holder)
+        self.assertIsNone(acquire_lock(retention.LOCK_NAME, timeout=60))
+
+
+@override_settings(ACTIVITY_FLUSH_INTERVAL=0)
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        self.addCleanup(activity_buffer.clear)
+        self.addCleanup(book_index.reset)
+
+    def test_benchmark_writes_results_and_rolls_back(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, 'results.json')
+        call_command(
+            'benchmark_api', books=40, authors=10, users=5, behaviors=100, requests=5, warmup=1,
+            output=output, stdout=io.StringIO(), stderr=io.StringIO(),
+        )
+        with open(output) as f:
+            results = json.load(f)
+        self.assertEqual(set(results['workloads']), {'books', 'book-detail', 'search', 'books-by-genre', 'add-book'})
+        added = results['workloads']['add-book']
+        self.assertEqual((added['requests'], added['statuses']), (5, {'201': 5}))
+        self.assertLessEqual(added['latency_ms']['p50'], added['latency_ms']['p99'])
+        self.assertGreater(results['workloads']['books']['queries']['p50'], 0)
+        self.assertFalse(Book.objects.exists())
+        self.assertFalse(UserBehavior.objects.exists())
@@ -0,0 +1,146 @@
+from datetime import timedelta
+from django.db import connections, router
+from django.db.models import Case, F, FloatField, Sum, Value, When
+from django.utils import timezone
+from .models import Book, DailyBookActivity, HourlyBookActivity, UserBehavior
+
+# Leaderboards read hourly and daily rollups of book activity instead of
+# grouping UserBehavior. The activity buffer adds each flush's counts to the
+# current buckets, so a leaderboard query touches at most one row per book
+# per bucket in its window.
+
+# Activity credited per event. Views are counted for anonymous readers too;
+# the other behaviors only exist for signed-in users.
+VIEW_WEIGHT = 1.0
+ACTION_WEIGHTS = {'read': 3.0, 'rate': 2.0, 'favorite': 5.0, 'save': 4.0}
+
+# window: (rollup, bucket length, buckets in the window, half-life). Older
+# buckets count for less, halving every half-life, so a book that is busy
+# now outranks one that was busy at the start of the window.
+WINDOWS = {
+    'day': (HourlyBookActivity, timedelta(hours=1), 24, timedelta(hours=6)),
+    'week': (DailyBookActivity, timedelta(days=1), 7, timedelta(days=2)),
+    'month': (DailyBookActivity, timedelta(days=1), 30, timedelta(days=7)),
+}
+DEFAULT_WINDOW = 'week'
+ROLLUPS = (HourlyBookActivity, DailyBookActivity)
+
+
+def bucket_start(moment, model):
+    moment = moment.replace(minute=0, second=0, microsecond=0)
+    if model is DailyBookActivity:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def upsert_add(model, columns, unique, increments, rows):
+    """
+    Insert ``rows`` (tuples in ``columns`` order) into ``model``'s table. A
+    row that collides with an existing one on the ``unique`` columns adds its
+    ``increments`` columns to the stored values instead, in the same
+    statement, so concurrent writers never lose counts.
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(column) for column in columns]
+    sql = (
+        f"INSERT INTO {table} ({', '.join(map(quote, columns))}) VALUES ({', '.join(['%s'] * len(columns))}) "
+        f"ON CONFLICT ({', '.join(map(quote, unique))}) DO UPDATE SET "
+        + ', '.join(f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}' for column in increments)
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [
+            [field.get_db_prep_save(value, connection) for field, value in zip(fields, row)]
+            for row in rows
+        ])
+
+
+def record_activity(views, events, now=None):
+    """
+    Fold a batch of activity into the rollups: ``views`` maps book ids to
+    view counts, ``events`` are UserBehavior rows. View events are already
+    in ``views`` and are not counted again. Two statements per rollup plus
+    one genre lookup, whatever the batch size.
+    """
+    totals = {}
+    for book_id, count in views.items():
+        totals[book_id] = [count, count * VIEW_WEIGHT]
+    for event in events:
+        weight = ACTION_WEIGHTS.get(event.action_type)
+        if weight:
+            totals.setdefault(event.book_id, [0, 0.0])[1] += weight
+    if not totals:
+        return
+    genres = dict(Book.objects.filter(pk__in=totals).values_list('id', 'genre_id'))
+    now = now or timezone.now()
+    for model in ROLLUPS:
+        bucket = bucket_start(now, model)
+        upsert_add(model, ('book_id', 'genre_id', 'bucket', 'views', 'activity'), ('book_id', 'bucket'), ('views', 'activity'), [
+            (book_id, genres[book_id], bucket, count, activity)
+            for book_id, (count, activity) in totals.items() if book_id in genres
+        ])
+
+
+def rebuild(since, now=None):
+    """
+    Recompute the rollups from UserBehavior events since the start of the
+    day containing ``since``. Only logged events can be replayed, so
+    anonymous views are lost. Returns the number of events read.
+    """
+    now = now or timezone.now()
+    # Replay whole days so the first daily bucket is not left partial.
+    since = bucket_start(since, DailyBookActivity)
+    for model in ROLLUPS:
+        model.objects.filter(bucket__gte=since).delete()
+    count, batch, batch_hour = 0, [], None
+
+    def fold():
+        views = {}
+        for event in batch:
+            if event.action_type == 'view':
+                views[event.book_id] = views.get(event.book_id, 0) + 1
+        record_activity(views, batch, now=batch_hour)
+
+    events = UserBehavior.objects.filter(action_date__gte=since, action_date__lte=now).only(
+        'book', 'action_type', 'action_date'
+    ).order_by('action_date')
+    for event in events.iterator(chunk_size=2000):
+        hour = bucket_start(event.action_date, HourlyBookActivity)
+        if hour != batch_hour and batch:
+            fold()
+            batch = []
+        batch_hour = hour
+        batch.append(event)
+        count += 1
+    if batch:
+        fold()
+    return count
+
+
+def trending(window=DEFAULT_WINDOW, genre=None, limit=10, now=None):
+    """
+    ``[(book_id, score), ...]`` for the ``limit`` books with the most decayed
+    activity in ``window``, optionally within the genre named ``genre``.
+    Bucket weights are computed here and passed in as a CASE, so the query
+    is a single indexed range scan and GROUP BY over the rollup.
+    """
+    model, length, count, half_life = WINDOWS[window]
+    now = now or timezone.now()
+    current = bucket_start(now, model)
+    buckets = [current - length * age for age in range(count)]
+    # A bucket's age is measured from its midpoint, or from now for the
+    # bucket still filling.
+    weights = [
+        When(bucket=bucket, then=Value(0.5 ** (max(now - bucket - length / 2, timedelta()) / half_life)))
+        for bucket in buckets
+    ]
+    rows = model.objects.filter(bucket__gte=buckets[-1], bucket__lte=current)
+    if genre is not None:
+        rows = rows.filter(genre__name=genre)
+    rows = rows.values('book').annotate(
+        score=Sum(F('activity') * Case(*weights, default=Value(0.0), output_field=FloatField()))
+    ).order_by('-score', 'book')[:limit]
+    return [(row['book'], row['score']) for row in rows]